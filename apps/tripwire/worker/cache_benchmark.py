@@ -0,0 +1,175 @@
+"""Benchmark of the detection cache of the object detection module.
+
+The benchmark runs the motion detection and the object detection modules over
+a synthetic clip, in which bright squares walk over a noisy background and a
+second square enters halfway, with several cache intervals and propagation
+methods. It reports the time per frame of the object detection, the ratio of
+frames that skip the inference, and the accuracy impact of the cache: the
+recall, which is the ratio of objects detected with IoU >= 0.5, and the mean
+IoU of the detected boxes with the ones detected on every frame.
+
+The stub detector of `crop_benchmark` is used without a model, otherwise the
+real SSD model is run.
+
+Usage (from the tripwire worker directory, with the framework installed):
+
+    python3 cache_benchmark.py --intervals 1,2,3,5,8
+    python3 cache_benchmark.py --ckpt_path frozen_inference_graph.pb
+"""
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from jagereye.streaming import Blob
+
+from crop_benchmark import _StubObjectDetectionModule
+from crop_benchmark import _iou
+from modules import MotionDetectionModule
+from modules import ObjectDetectionModule
+
+
+def _gen_clip(width, height, object_size, num_frames, analysis_size, seed=0):
+    """Generate a clip with walking squares and their ground truth boxes."""
+    rng = np.random.RandomState(seed)
+    background = cv2.GaussianBlur(
+        rng.randint(0, 100, (height, width, 3)).astype(np.uint8), (5, 5), 0)
+    step = max(1, (width - object_size) // num_frames)
+    clip = []
+    for i in range(num_frames):
+        noise = rng.randint(-4, 5, background.shape)
+        image = np.clip(background + noise, 0, 255).astype(np.uint8)
+        # The first square walks right, and the second one enters halfway
+        # and walks left.
+        positions = [(i * step, height // 4)]
+        if i >= num_frames // 2:
+            positions.append((width - object_size -
+                              2 * step * (i - num_frames // 2),
+                              height // 2))
+        truths = []
+        for x, y in positions:
+            image[y:y + object_size, x:x + object_size] = 255
+            truths.append([y / height, x / width, (y + object_size) / height,
+                           (x + object_size) / width])
+        analysis_image = cv2.resize(image,
+                                    analysis_size,
+                                    interpolation=cv2.INTER_AREA)
+        clip.append((image, analysis_image, truths))
+    return clip
+
+
+def run(detector, clip):
+    """Run the motion detection and a detector over a clip.
+
+    Args:
+      detector (`ObjectDetectionModule`): The detector.
+      clip (list of tuple): The frames.
+
+    Returns:
+      tuple: The time (in milliseconds) of the detector per frame, and the
+        list of detected boxes of each frame.
+    """
+    motion_detector = MotionDetectionModule(
+        sensitivity=99, model=MotionDetectionModule.MODEL_BACKGROUND)
+    motion_detector.prepare()
+    detector.prepare()
+    elapsed = 0.0
+    results = []
+    for image, analysis_image, _ in clip:
+        blob = Blob()
+        blob.feed('image', image)
+        blob.feed('analysis_image', analysis_image)
+        motion_detector.execute([blob])
+        start = time.perf_counter()
+        detector.execute([blob])
+        elapsed += time.perf_counter() - start
+        num = int(blob.fetch('num_detections')[0])
+        boxes = blob.fetch('detection_boxes')
+        scores = blob.fetch('detection_scores')
+        results.append([box for box, score in zip(boxes[0, :num],
+                                                  scores[0, :num])
+                        if score >= 0.25])
+    detector.destroy()
+    motion_detector.destroy()
+    return elapsed * 1000.0 / len(clip), results
+
+
+def _evaluate(clip, results, references):
+    """Evaluate the recall and the mean IoU with the reference boxes."""
+    found = 0
+    total = 0
+    ious = []
+    for (_, _, truths), boxes, reference_boxes in zip(clip,
+                                                      results,
+                                                      references):
+        for truth in truths:
+            total += 1
+            if any(_iou(box, truth) >= 0.5 for box in boxes):
+                found += 1
+        for reference_box in reference_boxes:
+            ious.append(max([_iou(box, reference_box) for box in boxes] +
+                            [0.0]))
+    recall = found / total if total else 0.0
+    return recall, float(np.mean(ious)) if ious else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--ckpt_path', default=None,
+                        help='path to the frozen model, or use the stub '
+                             'detector if not given')
+    parser.add_argument('--width', type=int, default=1280,
+                        help='frame width')
+    parser.add_argument('--height', type=int, default=720,
+                        help='frame height')
+    parser.add_argument('--analysis_size', default='480x360',
+                        help='size of the analysis image')
+    parser.add_argument('--object_size', type=int, default=64,
+                        help='object size in pixels')
+    parser.add_argument('--frames', type=int, default=300,
+                        help='number of frames')
+    parser.add_argument('--intervals', default='1,2,3,5,8',
+                        help='comma separated cache intervals')
+    parser.add_argument('--energy_threshold', type=float, default=1.0,
+                        help='motion energy change to detect again')
+    args = parser.parse_args()
+
+    analysis_size = tuple(int(v) for v in args.analysis_size.split('x'))
+    clip = _gen_clip(args.width,
+                     args.height,
+                     args.object_size,
+                     args.frames,
+                     analysis_size)
+
+    def create_detector(cache_interval, cache_propagation):
+        if args.ckpt_path is None:
+            return _StubObjectDetectionModule(
+                None,
+                cache_interval=cache_interval,
+                cache_energy_threshold=args.energy_threshold,
+                cache_propagation=cache_propagation)
+        return ObjectDetectionModule(
+            args.ckpt_path,
+            cache_interval=cache_interval,
+            cache_energy_threshold=args.energy_threshold,
+            cache_propagation=cache_propagation)
+
+    _, references = run(
+        create_detector(1, ObjectDetectionModule.PROPAGATE_REUSE), clip)
+    print('{:>10}{:>8}{:>12}{:>14}{:>10}{:>10}'.format(
+        'interval', 'method', 'ms/frame', 'infer_skip', 'recall', 'iou'))
+    for interval in args.intervals.split(','):
+        for propagation in [ObjectDetectionModule.PROPAGATE_REUSE,
+                            ObjectDetectionModule.PROPAGATE_SHIFT]:
+            detector = create_detector(int(interval), propagation)
+            ms, results = run(detector, clip)
+            recall, iou = _evaluate(clip, results, references)
+            print('{:>10}{:>8}{:>12.3f}{:>14.2%}{:>10.2%}{:>10.3f}'.format(
+                interval, propagation, ms, detector.inference_skip_ratio,
+                recall, iou))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+"""Benchmark of the crop modes of the object detection module.
+
+The benchmark detects a small bright square on synthetic frames with every
+crop mode, and reports the time per detection and the recall, which is the
+ratio of frames whose object is detected with IoU >= 0.5. The motion box
+given to the "motion" mode is the object box with some jitter, like the
+output of the motion detection.
+
+Without a model, a stub detector simulates the input resizing of the model:
+it resizes every image to 300x300 and detects the blobs of at least 2x2
+pixels that stay bright there, so small objects blurred away by resizing are
+lost like in the real model. With a model, the real SSD model is run.
+
+Usage (from the tripwire worker directory, with the framework installed):
+
+    python3 crop_benchmark.py --width 1280 --height 720
+    python3 crop_benchmark.py --ckpt_path frozen_inference_graph.pb
+"""
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from jagereye.streaming import Blob
+
+from modules import ObjectDetectionModule
+
+MODEL_SIZE = 300
+MIN_AREA = 4
+
+
+class _StubObjectDetectionModule(ObjectDetectionModule):
+    """Object detection module that detects the bright blobs after resizing
+    the image to the model input size."""
+
+    def prepare(self):
+        self._batcher.start()
+
+    def _detect(self, images):
+        results = []
+        for image in images:
+            resized = cv2.resize(image,
+                                 (MODEL_SIZE, MODEL_SIZE),
+                                 interpolation=cv2.INTER_AREA)
+            mask = (resized[:, :, 0] > 200).astype(np.uint8)
+            count, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+            boxes = np.zeros((1, 10, 4))
+            scores = np.zeros((1, 10))
+            classes = np.zeros((1, 10))
+            num = 0
+            for label in range(1, min(count, 11)):
+                x, y, w, h, area = stats[label]
+                if area < MIN_AREA:
+                    continue
+                boxes[0, num] = [y / MODEL_SIZE, x / MODEL_SIZE,
+                                 (y + h) / MODEL_SIZE, (x + w) / MODEL_SIZE]
+                scores[0, num] = 0.9
+                classes[0, num] = 1
+                num += 1
+            results.append((boxes, scores, classes, np.array([float(num)])))
+        return results
+
+
+def _iou(box_a, box_b):
+    """Compute the IoU of two [ymin, xmin, ymax, xmax] boxes."""
+    height = max(0.0, min(box_a[2], box_b[2]) - max(box_a[0], box_b[0]))
+    width = max(0.0, min(box_a[3], box_b[3]) - max(box_a[1], box_b[1]))
+    intersection = height * width
+    union = (box_a[2] - box_a[0]) * (box_a[3] - box_a[1]) + \
+            (box_b[2] - box_b[0]) * (box_b[3] - box_b[1]) - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def _gen_frames(width, height, object_size, num_frames, analysis_size, seed=0):
+    """Generate frames with a bright square and its ground truth box."""
+    rng = np.random.RandomState(seed)
+    background = cv2.GaussianBlur(
+        rng.randint(0, 100, (height, width, 3)).astype(np.uint8), (5, 5), 0)
+    frames = []
+    for _ in range(num_frames):
+        x = rng.randint(0, width - object_size)
+        y = rng.randint(0, height - object_size)
+        image = background.copy()
+        image[y:y + object_size, x:x + object_size] = 255
+        truth = np.array([y / height, x / width, (y + object_size) / height,
+                          (x + object_size) / width])
+        # The motion box is a bit larger than the object with jitter.
+        jitter = rng.uniform(-0.5, 1.5, 4) * object_size
+        motion_box = np.clip([(y - jitter[0]) / height,
+                              (x - jitter[1]) / width,
+                              (y + object_size + jitter[2]) / height,
+                              (x + object_size + jitter[3]) / width], 0, 1)
+        analysis_image = cv2.resize(image,
+                                    analysis_size,
+                                    interpolation=cv2.INTER_AREA)
+        frames.append((image, analysis_image, motion_box, truth))
+    return frames
+
+
+def run(detector, frames):
+    """Run a detector over the frames.
+
+    Args:
+      detector (`ObjectDetectionModule`): The detector.
+      frames (list of tuple): The frames.
+
+    Returns:
+      tuple: The time (in milliseconds) per detection and the recall.
+    """
+    detector.prepare()
+    found = 0
+    elapsed = 0.0
+    for image, analysis_image, motion_box, truth in frames:
+        blob = Blob()
+        blob.feed('image', image)
+        blob.feed('analysis_image', analysis_image)
+        blob.feed('motion_box', motion_box)
+        blob.feed('moved', np.array(True))
+        start = time.perf_counter()
+        detector.execute([blob])
+        elapsed += time.perf_counter() - start
+        boxes = blob.fetch('detection_boxes')[0]
+        scores = blob.fetch('detection_scores')[0]
+        if any(score >= 0.25 and _iou(box, truth) >= 0.5
+               for box, score in zip(boxes, scores)):
+            found += 1
+    detector.destroy()
+    return elapsed * 1000.0 / len(frames), found / len(frames)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--ckpt_path', default=None,
+                        help='path to the frozen model, or use the stub '
+                             'detector if not given')
+    parser.add_argument('--width', type=int, default=1280,
+                        help='frame width')
+    parser.add_argument('--height', type=int, default=720,
+                        help='frame height')
+    parser.add_argument('--analysis_size', default='480x360',
+                        help='size of the analysis image')
+    parser.add_argument('--object_sizes', default='8,16,32,64',
+                        help='comma separated object sizes in pixels')
+    parser.add_argument('--frames', type=int, default=50,
+                        help='number of frames per case')
+    parser.add_argument('--crop_size', type=int, default=300,
+                        help='size of crops')
+    args = parser.parse_args()
+
+    analysis_size = tuple(int(v) for v in args.analysis_size.split('x'))
+    print('{:>8}{:>10}{:>14}{:>10}'.format('size', 'crop', 'ms/detect',
+                                          'recall'))
+    for object_size in args.object_sizes.split(','):
+        frames = _gen_frames(args.width,
+                             args.height,
+                             int(object_size),
+                             args.frames,
+                             analysis_size)
+        for crop_mode in [ObjectDetectionModule.CROP_NONE,
+                          ObjectDetectionModule.CROP_MOTION]:
+            if args.ckpt_path is None:
+                detector = _StubObjectDetectionModule(
+                    None, crop_mode=crop_mode, crop_size=args.crop_size)
+            else:
+                detector = ObjectDetectionModule(args.ckpt_path,
+                                                 crop_mode=crop_mode,
+                                                 crop_size=args.crop_size)
+            ms, recall = run(detector, frames)
+            print('{:>8}{:>10}{:>14.3f}{:>10.2%}'.format(
+                object_size, crop_mode, ms, recall))
+
+
+if __name__ == '__main__':
+    main()
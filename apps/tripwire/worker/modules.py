@@ -1,6 +1,7 @@
 """The modules used by tripwire worker."""
 
 import json
+import math
 import threading
 import os
 from queue import Queue
@@ -10,7 +11,12 @@ import numpy as np
 import tensorflow as tf
 
 from jagereye.streaming import IModule
+from jagereye.streaming import get_analysis_image
+from jagereye.streaming import get_source_id
 from jagereye.util import logging
+from jagereye.util.batcher import DynamicBatcher
+from jagereye.util.motion import BackgroundMotionEngine
+from jagereye.util.motion import MotionEngine
 
 
 class _ModeEnum(object):
@@ -25,18 +31,102 @@ _MODE = _ModeEnum()
 
 class MotionDetectionModule(IModule):
     # TODO(JiaKuan Su): Please fill the detailed docstring.
-    """The module for motion detection."""
+    """The module for motion detection.
+
+    The motion is detected on the analysis image of each blob, which is the
+    downscaled "analysis_image" tensor if it exists, or the "image" tensor
+    otherwise. See `MotionEngine` for the scale and the block size.
+
+    The motion is detected by one of the models:
+    1. "difference": Compare every frame with the last frame. See
+       `MotionEngine`.
+    2. "background": Compare every frame with a running average background,
+       which is robust to lighting flicker and compression artifacts. See
+       `BackgroundMotionEngine` for the learning rate and the update
+       interval.
+
+    Each output blob is fed a "moved" tensor, a "motion_energy" tensor which
+    is the percentage of the moving area (0 for the first frame), and a
+    "motion_box" tensor which is the normalized bounding box [ymin, xmin,
+    ymax, xmax] of the moving area, like the "detection_boxes", or an empty
+    array if nothing moves. A "res" tensor, which is the inverted binary mask
+    of the moving area in the analysis image, or in the crop if a region is
+    given, with black moving pixels, is also fed except for the first frame.
+
+    If a region is given, such as the tripwire region, the motion is only
+    detected in the crop of the region with a margin, and the sensitivity
+    applies to the percentage of the moving area in the crop. Motion outside
+    the crop, such as trees or traffic, is ignored, so it neither costs the
+    motion detection nor triggers the object detection.
+    """
+
+    MODEL_DIFFERENCE = 'difference'
+    MODEL_BACKGROUND = 'background'
 
-    def __init__(self, sensitivity=80):
+    def __init__(self,
+                 sensitivity=80,
+                 scale=1,
+                 block_size=0,
+                 region=None,
+                 region_margin=0.0,
+                 model=MODEL_DIFFERENCE,
+                 learning_rate=0.05,
+                 update_interval=1):
         """Create a new `MotionDetectionModule`
 
         Args:
           sensitivity (int): The sensitivity of motion detection, range from 1
             to 100. Defaults to 80.
+          scale (int): The factor to downscale the image before motion
+            detection. Defaults to 1.
+          block_size (int): The size of blocks to average the difference. If
+            block_size <= 0, the difference is filtered per pixel. Defaults
+            to 0.
+          region (tuple): Range of the region to detect motion, in pixels of
+            the "image" tensor. If None, the motion is detected in the whole
+            image. Defaults to None. The tuple contains:
+            xmin (int): The left position.
+            ymin (int): The top position.
+            xmax (int): The right position.
+            ymax (int): The bottom position.
+          region_margin (float): The margin to extend each side of the region,
+            as a ratio of the region width and height. Defaults to 0.0.
+          model (string): The motion model, it can be "difference" or
+            "background". Defaults to "difference".
+          learning_rate (float): The learning rate of the "background" model.
+            Defaults to 0.05.
+          update_interval (int): The interval (in frames) to update the
+            "background" model. Defaults to 1.
+
+        Raises:
+          ValueError: If the model is not supported.
         """
+        if model not in (self.MODEL_DIFFERENCE, self.MODEL_BACKGROUND):
+            raise ValueError('Unsupported motion model: {}'.format(model))
         sensitivity_clamp = max(1, min(sensitivity, 100))
         self._threshold = (100 - sensitivity_clamp) * 0.05
-        self._last_gray_image = None
+        self._scale = scale
+        self._block_size = block_size
+        self._region = region
+        self._region_margin = region_margin
+        self._model = model
+        self._learning_rate = learning_rate
+        self._update_interval = update_interval
+        # The motion engines, indexed by source IDs.
+        self._engines = dict()
+        # The number of detected and moved frames.
+        self._frame_count = 0
+        self._moved_count = 0
+
+    @property
+    def frame_count(self):
+        """int: The number of frames that motion is detected on."""
+        return self._frame_count
+
+    @property
+    def moved_count(self):
+        """int: The number of moved frames."""
+        return self._moved_count
 
     def prepare(self):
         """The routine of module preparation."""
@@ -49,61 +139,313 @@ class MotionDetectionModule(IModule):
         Raises:
             RuntimeError: If the input tensor is not 3-dimensional.
         """
-        # TODO(JiaKuan Su): Currently, I only handle the case for batch_size=1,
-        # please help complete the case for batch_size>1.
-        blob = blobs[0]
-        image = blob.fetch('image')
-        if image.ndim != 3:
-            raise RuntimeError('The input "image" tensor is not 3-dimensional.')
-
-        cur_gray_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        moved = False
-
-        if not self._last_gray_image is None:
-            # Get the difference of two grayscale images.
-            res = cv2.absdiff(self._last_gray_image, cur_gray_image)
-            # Remove the noise and do the threshold.
-            res = cv2.blur(res, (5, 5))
-            res = cv2.morphologyEx(res, cv2.MORPH_OPEN, None)
-            res = cv2.morphologyEx(res, cv2.MORPH_CLOSE, None)
-            ret, res = cv2.threshold(res, 10, 255, cv2.THRESH_BINARY_INV) #pylint: disable=unused-variable
-            # Count the number of black pixels.
-            num_black = np.count_nonzero(res == 0)
-            # Calculate the image size.
-            im_size = image.shape[1] * image.shape[0]
-            # Calculate the average of black pixel in the image.
-            avg_black = (num_black * 100.0) / im_size
-            # Detect moving by testing whether the average of black exceeds the
-            # threshold or not.
-            moved = avg_black >= self._threshold
-            blob.feed('res', res)
+        for blob in blobs:
+            source_id = get_source_id(blob)
+            image = get_analysis_image(blob)
+            if image.ndim != 3:
+                raise RuntimeError('The input "image" tensor is not '
+                                   '3-dimensional.')
 
-        self._last_gray_image = cur_gray_image
-        blob.feed('moved', np.array(moved))
+            engine = self._engines.get(source_id)
+            if engine is None:
+                engine = self._create_engine()
+                self._engines[source_id] = engine
+            crop, left, top = self._crop_region(blob, image)
+            # The percentage of the moving area, or None for the first frame.
+            percentage = engine.update(crop)
+            # Detect moving by testing whether the percentage exceeds the
+            # threshold or not.
+            moved = not percentage is None and percentage >= self._threshold
+            blob.feed('moved', np.array(moved))
+            blob.feed('motion_energy',
+                      np.array(0.0 if percentage is None else percentage))
+            blob.feed('motion_box', self._normalize_box(engine.foreground_box,
+                                                        left,
+                                                        top,
+                                                        image))
+            if not percentage is None:
+                blob.feed('res', self._inverted_mask(engine, crop))
+            self._frame_count += 1
+            self._moved_count += int(moved)
 
         return blobs
 
+    def _create_engine(self):
+        """Create a motion engine of the model.
+
+        Returns:
+          `MotionEngine`: The motion engine.
+        """
+        if self._model == self.MODEL_BACKGROUND:
+            return BackgroundMotionEngine(scale=self._scale,
+                                          block_size=self._block_size,
+                                          learning_rate=self._learning_rate,
+                                          update_interval=self._update_interval)
+        return MotionEngine(scale=self._scale, block_size=self._block_size)
+
+    @staticmethod
+    def _inverted_mask(engine, crop):
+        """Get the inverted mask of the moving area in the size of a crop.
+
+        Args:
+          engine (`MotionEngine`): The motion engine updated with the crop.
+          crop (numpy `ndarray`): The crop.
+
+        Returns:
+          numpy `ndarray`: The mask, whose moving pixels are 0 and others are
+            255.
+        """
+        res = cv2.bitwise_not(engine.mask)
+        if res.shape != crop.shape[:2]:
+            res = cv2.resize(res,
+                             (crop.shape[1], crop.shape[0]),
+                             interpolation=cv2.INTER_NEAREST)
+        return res
+
+    @staticmethod
+    def _normalize_box(box, left, top, image):
+        """Normalize a box in a crop by the analysis image size.
+
+        Args:
+          box (tuple): The box (xmin, ymin, xmax, ymax) in pixels of the crop,
+            or None.
+          left (int): The left position of the crop.
+          top (int): The top position of the crop.
+          image (numpy `ndarray`): The analysis image.
+
+        Returns:
+          numpy `ndarray`: The normalized box [ymin, xmin, ymax, xmax], or an
+            empty array if the box is None.
+        """
+        if box is None:
+            return np.array([])
+        height, width = image.shape[0], image.shape[1]
+        return np.array([(top + box[1]) / height,
+                         (left + box[0]) / width,
+                         (top + box[3]) / height,
+                         (left + box[2]) / width])
+
+    def _crop_region(self, blob, image):
+        """Crop the region with the margin from the analysis image.
+
+        Args:
+          blob (`Blob`): The blob that contains the "image" tensor.
+          image (numpy `ndarray`): The analysis image.
+
+        Returns:
+          tuple: The crop, which is a view of the analysis image, or the
+            analysis image itself if no region is given, and the left and top
+            position of the crop.
+        """
+        if self._region is None:
+            return image, 0, 0
+        full_image = blob.fetch('image')
+        height, width = image.shape[0], image.shape[1]
+        x_ratio = width / full_image.shape[1]
+        y_ratio = height / full_image.shape[0]
+        (xmin, ymin, xmax, ymax) = self._region
+        x_margin = (xmax - xmin) * self._region_margin
+        y_margin = (ymax - ymin) * self._region_margin
+        left = min(max(0, int((xmin - x_margin) * x_ratio)), width - 1)
+        top = min(max(0, int((ymin - y_margin) * y_ratio)), height - 1)
+        right = max(min(width, int(math.ceil((xmax + x_margin) * x_ratio))),
+                    left + 1)
+        bottom = max(min(height, int(math.ceil((ymax + y_margin) * y_ratio))),
+                     top + 1)
+        return image[top:bottom, left:right], left, top
+
     def destroy(self):
         """The routine of module destruction."""
         pass
 
 
+def _map_boxes(boxes, window):
+    """Map normalized boxes in a crop to the normalized coordinates of the
+    whole image.
+
+    Args:
+      boxes (numpy `ndarray`): The boxes in the crop, whose last dimension is
+        [ymin, xmin, ymax, xmax].
+      window (tuple): The window of the crop (ymin, xmin, height, width),
+        normalized by the image size.
+
+    Returns:
+      numpy `ndarray`: The boxes in the whole image, which are clipped to the
+        image.
+    """
+    (top, left, height, width) = window
+    mapped = np.empty(boxes.shape, dtype=np.float64)
+    mapped[..., 0] = top + boxes[..., 0] * height
+    mapped[..., 1] = left + boxes[..., 1] * width
+    mapped[..., 2] = top + boxes[..., 2] * height
+    mapped[..., 3] = left + boxes[..., 3] * width
+    return np.clip(mapped, 0.0, 1.0)
+
+
 class ObjectDetectionModule(IModule):
     # TODO(JiaKuan Su): Please fill the detailed docstring.
-    """The module for object detection."""
+    """The module for object detection.
+
+    The objects are detected on the analysis image of each blob, which is the
+    downscaled "analysis_image" tensor if it exists, or the "image" tensor
+    otherwise. The "detection_boxes" are normalized, so they are also valid
+    on the full resolution "image" tensor.
+
+    The module can also detect objects on a crop of the full resolution
+    "image" tensor around the part of interest, so small distant objects are
+    not lost when the model resizes the whole frame to its input size. The
+    crop mode can be:
+    1. "none": Detect on the whole analysis image.
+    2. "motion": Crop around the "motion_box" tensor from the motion
+       detection. If the blob has no motion box, the whole frame is cropped.
+    3. "region": Crop around a fixed region, such as the tripwire region.
+
+    The crop is extended by the margin, expanded to a square so the model
+    does not distort it, padded with black where it is out of the frame, and
+    resized to the crop size. The "detection_boxes" are mapped back to the
+    normalized coordinates of the whole frame.
+
+    Consecutive frames rarely change much, so the module can also cache the
+    detection result of each source and reuse it for the following moved
+    frames. The objects are detected again when the cached result is as old
+    as the cache interval, or when the "motion_energy" tensor from the motion
+    detection changes by more than the energy threshold since the cached
+    detection, such as an object enters or leaves. A frame without motion
+    clears the cache. The cached boxes are propagated by one of the methods:
+    1. "reuse": Reuse the cached boxes as they are.
+    2. "shift": Shift the cached boxes by the displacement of the center of
+       the "motion_box" tensor since the cached detection, which follows a
+       single moving object at no cost. With several moving objects, the
+       motion box covers all of them and the shift is less accurate.
+    """
 
-    def __init__(self, ckpt_path):
+    CROP_NONE = 'none'
+    CROP_MOTION = 'motion'
+    CROP_REGION = 'region'
+    PROPAGATE_REUSE = 'reuse'
+    PROPAGATE_SHIFT = 'shift'
+
+    def __init__(self,
+                 ckpt_path,
+                 max_batch_size=8,
+                 max_wait=0,
+                 crop_mode=CROP_NONE,
+                 crop_region=None,
+                 crop_margin=0.2,
+                 crop_size=300,
+                 cache_interval=1,
+                 cache_energy_threshold=1.0,
+                 cache_propagation=PROPAGATE_SHIFT):
         """Create a new `ObjectDetectionModule`
 
         Args:
           ckpt_path (string): The path to the TensorFlow model file (.pb file).
+          max_batch_size (int): The maximum number of images to detect in one
+            session run. Defaults to 8.
+          max_wait (float): The maximum time (in milliseconds) to wait for
+            more images before a session run. It is useful when the module is
+            shared by several pipelines. Defaults to 0.
+          crop_mode (string): The crop mode, it can be "none", "motion" or
+            "region". Defaults to "none".
+          crop_region (tuple): Range of the region to crop in the "region"
+            mode, in pixels of the "image" tensor. Defaults to None. The tuple
+            contains:
+            xmin (int): The left position.
+            ymin (int): The top position.
+            xmax (int): The right position.
+            ymax (int): The bottom position.
+          crop_margin (float): The margin to extend each side of the crop, as
+            a ratio of the crop width and height. Defaults to 0.2.
+          crop_size (int): The width and height (in pixels) to resize the
+            crops. Defaults to 300.
+          cache_interval (int): The maximum number of moved frames (of a
+            source) per detection. If cache_interval <= 1, every moved frame
+            is detected. Defaults to 1.
+          cache_energy_threshold (float): The change of the motion energy
+            (percentage of the moving area) to detect again. Defaults to 1.0.
+          cache_propagation (string): The method to propagate the cached
+            boxes, it can be "reuse" or "shift". Defaults to "shift".
+
+        Raises:
+          ValueError: If the crop mode or the cache propagation is not
+            supported, or no crop region is given in the "region" mode.
         """
+        if crop_mode not in (self.CROP_NONE,
+                             self.CROP_MOTION,
+                             self.CROP_REGION):
+            raise ValueError('Unsupported crop mode: {}'.format(crop_mode))
+        if crop_mode == self.CROP_REGION and crop_region is None:
+            raise ValueError('Crop region is required in the region mode.')
+        if cache_propagation not in (self.PROPAGATE_REUSE,
+                                     self.PROPAGATE_SHIFT):
+            raise ValueError('Unsupported cache propagation: {}'
+                             .format(cache_propagation))
+        self._crop_mode = crop_mode
+        self._crop_region = crop_region
+        self._crop_margin = crop_margin
+        self._crop_size = crop_size
+        self._cache_interval = max(1, int(cache_interval))
+        self._cache_energy_threshold = cache_energy_threshold
+        self._cache_propagation = cache_propagation
+        # The cache entries of the latest detection, indexed by source IDs.
+        self._caches = dict()
         # Path to frozen detection graph.
         self._ckpt_path = ckpt_path
         # The TensorFlow graph.
         self._detection_graph = None
         # The TensorFlow session.
         self._sess = None
+        # The batcher to stack images from blobs into one session run.
+        self._batcher = DynamicBatcher(self._detect,
+                                       max_batch_size=max_batch_size,
+                                       max_wait=max_wait)
+        # The number of images detected, skipped for no motion and answered
+        # by the cache.
+        self._detected_count = 0
+        self._skipped_count = 0
+        self._cached_count = 0
+
+    @property
+    def detected_count(self):
+        """int: The number of detected images."""
+        return self._detected_count
+
+    @property
+    def skipped_count(self):
+        """int: The number of images skipped for no motion."""
+        return self._skipped_count
+
+    @property
+    def cached_count(self):
+        """int: The number of moved images answered by the cache."""
+        return self._cached_count
+
+    @property
+    def skip_ratio(self):
+        """float: The ratio of images skipped for no motion, or 0 if there is
+        no image."""
+        total = self._detected_count + self._skipped_count + self._cached_count
+        return self._skipped_count / total if total else 0.0
+
+    @property
+    def inference_skip_ratio(self):
+        """float: The ratio of images that are not detected, either for no
+        motion or answered by the cache, or 0 if there is no image."""
+        total = self._detected_count + self._skipped_count + self._cached_count
+        return (self._skipped_count + self._cached_count) / total \
+               if total else 0.0
+
+    @property
+    def batch_size_histogram(self):
+        """`Histogram`: The histogram of the number of images per session
+        run."""
+        return self._batcher.batch_size_histogram
+
+    @property
+    def wait_time_histogram(self):
+        """`Histogram`: The histogram of image wait time (in milliseconds)
+        before a session run."""
+        return self._batcher.wait_time_histogram
 
     def prepare(self):
         """The routine of object detection module preparation to create a
@@ -118,58 +460,246 @@ class ObjectDetectionModule(IModule):
                 tf.import_graph_def(od_graph_def, name='')
             with tf.Session(graph=self._detection_graph) as sess:
                 self._sess = sess
+        self._batcher.start()
 
     def execute(self, blobs):
         # TODO(JiaKuan Su): Please fill the detailed docstring.
         """The routine of object detection module execution to execute.
 
+        The images of moved blobs that miss the cache are stacked and
+        detected together.
+
         Raises:
             RuntimeError: If the input tensor is not 3-dimensional.
         """
-        # Definite input and output Tensors for detection_graph
-        image_tensor = self._get_tensor('image_tensor:0')
-        # Each box represents a part of the image where a particular object was
-        # detected.
-        detection_boxes = self._get_tensor('detection_boxes:0')
-        # Each score represent how level of confidence for each of the objects.
-        # Score is shown on the result image, together with the class label.
-        detection_scores = self._get_tensor('detection_scores:0')
-        detection_classes = self._get_tensor('detection_classes:0')
-        num_detections = self._get_tensor('num_detections:0')
+        moved_blobs = []
+        # The blobs and their cache entries in order. An entry is created by
+        # the detection of its blob, and reused by the following blobs.
+        entries = []
         for blob in blobs:
-            image = blob.fetch('image')
+            image = get_analysis_image(blob)
             if image.ndim != 3:
                 raise RuntimeError('The input "image" tensor is not '
                                    '3-dimensional.')
-            moved = bool(blob.fetch('moved'))
-
-            if not moved:
-                boxes = np.array([[]])
-                scores = np.array([[]])
-                classes = np.array([[]])
-                num = np.array([0.0])
+            source_id = get_source_id(blob)
+            if not bool(blob.fetch('moved')):
+                self._caches.pop(source_id, None)
+                blob.feed('detection_boxes', np.array([[]]))
+                blob.feed('detection_scores', np.array([[]]))
+                blob.feed('detection_classes', np.array([[]]))
+                blob.feed('num_detections', np.array([0.0]))
+                self._skipped_count += 1
+                continue
+            energy = float(blob.fetch('motion_energy')) \
+                     if blob.has('motion_energy') else 0.0
+            entry = self._caches.get(source_id)
+            if entry is None or \
+               entry['age'] + 1 >= self._cache_interval or \
+               abs(energy - entry['energy']) > self._cache_energy_threshold:
+                entry = {
+                    'age': 0,
+                    'energy': energy,
+                    'motion_box': self._get_motion_box(blob),
+                    'result': None,
+                }
+                self._caches[source_id] = entry
+                moved_blobs.append(blob)
+                entries.append((blob, entry, True))
+                self._detected_count += 1
             else:
-                # Expand dimensions since the model expects images to have
-                # shape: [1, None, None, 3]
-                image_expanded = np.expand_dims(image, axis=0)
-                # Actual detection.
-                fetches = [detection_boxes,
-                           detection_scores,
-                           detection_classes,
-                           num_detections]
-                feed_dict = {image_tensor: image_expanded}
-                (boxes, scores, classes, num) = \
-                    self._sess.run(fetches, feed_dict=feed_dict)
+                entry['age'] += 1
+                entries.append((blob, entry, False))
+                self._cached_count += 1
+
+        if self._crop_mode == self.CROP_NONE:
+            images = [get_analysis_image(blob) for blob in moved_blobs]
+            windows = [None] * len(moved_blobs)
+        else:
+            crops = [self._crop(blob) for blob in moved_blobs]
+            images = [crop for crop, _ in crops]
+            windows = [window for _, window in crops]
+        results = self._batcher.run(images)
+        for blob, window, (boxes, scores, classes, num) in zip(moved_blobs,
+                                                               windows,
+                                                               results):
+            if not window is None:
+                boxes = _map_boxes(boxes, window)
             blob.feed('detection_boxes', boxes)
             blob.feed('detection_scores', scores)
             blob.feed('detection_classes', classes)
             blob.feed('num_detections', num)
 
+        for blob, entry, detected in entries:
+            if detected:
+                entry['result'] = (blob.fetch('detection_boxes'),
+                                   blob.fetch('detection_scores'),
+                                   blob.fetch('detection_classes'),
+                                   blob.fetch('num_detections'))
+            else:
+                (boxes, scores, classes, num) = entry['result']
+                blob.feed('detection_boxes', self._propagate(blob, entry))
+                blob.feed('detection_scores', scores)
+                blob.feed('detection_classes', classes)
+                blob.feed('num_detections', num)
+
         return blobs
 
     def destroy(self):
         """The routine of object detection module destruction."""
-        pass
+        self._batcher.stop()
+        logging.info('Object detection batch size: {}, wait time (ms): {}'
+                     .format(self.batch_size_histogram.snapshot(),
+                             self.wait_time_histogram.snapshot()))
+        logging.info('Object detection detected: {}, skipped: {} ({:.1%}), '
+                     'cached: {}, inference skipped: {:.1%}'
+                     .format(self.detected_count,
+                             self.skipped_count,
+                             self.skip_ratio,
+                             self.cached_count,
+                             self.inference_skip_ratio))
+
+    @staticmethod
+    def _get_motion_box(blob):
+        """Get the motion box of a blob.
+
+        Args:
+          blob (`Blob`): The blob.
+
+        Returns:
+          numpy `ndarray`: The "motion_box" tensor, or an empty array if the
+            blob has no motion box.
+        """
+        return blob.fetch('motion_box') if blob.has('motion_box') \
+               else np.array([])
+
+    def _propagate(self, blob, entry):
+        """Propagate the cached boxes to a blob.
+
+        Args:
+          blob (`Blob`): The blob to propagate to.
+          entry (dict): The cache entry.
+
+        Returns:
+          numpy `ndarray`: The propagated "detection_boxes".
+        """
+        boxes = entry['result'][0]
+        if self._cache_propagation == self.PROPAGATE_REUSE:
+            return boxes
+        cached_box = entry['motion_box']
+        motion_box = self._get_motion_box(blob)
+        if cached_box.size == 0 or motion_box.size == 0:
+            return boxes
+        # Displacement of the center of the motion box.
+        dy = (motion_box[0] + motion_box[2] - cached_box[0] - cached_box[2]) / 2
+        dx = (motion_box[1] + motion_box[3] - cached_box[1] - cached_box[3]) / 2
+        num = int(entry['result'][3][0])
+        shifted = np.array(boxes, dtype=np.float64)
+        shifted[:, :num] += [dy, dx, dy, dx]
+        return np.clip(shifted, 0.0, 1.0)
+
+    def _crop(self, blob):
+        """Crop the part of interest from the image of a blob.
+
+        Args:
+          blob (`Blob`): The blob that contains the "image" tensor.
+
+        Returns:
+          tuple: The crop resized to the crop size, and the window of the
+            crop (ymin, xmin, height, width), normalized by the image size.
+        """
+        image = blob.fetch('image')
+        height, width = image.shape[0], image.shape[1]
+        if self._crop_mode == self.CROP_REGION:
+            (xmin, ymin, xmax, ymax) = self._crop_region
+        else:
+            box = self._get_motion_box(blob)
+            if box.size == 0:
+                box = np.array([0.0, 0.0, 1.0, 1.0])
+            (ymin, xmin, ymax, xmax) = (box[0] * height,
+                                        box[1] * width,
+                                        box[2] * height,
+                                        box[3] * width)
+        # Extend the box by the margin, and expand it to a square.
+        side = max((xmax - xmin) * (1.0 + 2.0 * self._crop_margin),
+                   (ymax - ymin) * (1.0 + 2.0 * self._crop_margin),
+                   1.0)
+        side = int(math.ceil(side))
+        top = int(round((ymin + ymax - side) / 2.0))
+        left = int(round((xmin + xmax - side) / 2.0))
+
+        crop = image[max(0, top):max(0, min(height, top + side)),
+                     max(0, left):max(0, min(width, left + side))]
+        if crop.shape[0] != side or crop.shape[1] != side:
+            if crop.size == 0:
+                crop = np.zeros((side, side, image.shape[2]),
+                                dtype=image.dtype)
+            else:
+                crop = cv2.copyMakeBorder(crop,
+                                          max(0, -top),
+                                          max(0, top + side - height),
+                                          max(0, -left),
+                                          max(0, left + side - width),
+                                          cv2.BORDER_CONSTANT,
+                                          value=0)
+        interpolation = cv2.INTER_AREA if side > self._crop_size \
+                        else cv2.INTER_LINEAR
+        crop = cv2.resize(crop,
+                          (self._crop_size, self._crop_size),
+                          interpolation=interpolation)
+
+        window = (top / height, left / width, side / height, side / width)
+        return crop, window
+
+    def _detect(self, images):
+        """Detect objects in a batch of images.
+
+        Images of the same shape are stacked into one session run.
+
+        Args:
+          images (list of numpy `ndarray`): The images to detect.
+
+        Returns:
+          list of tuple: The detection result of each image. The tuple
+            contains the "detection_boxes", "detection_scores",
+            "detection_classes" and "num_detections" of the image, each keeps
+            a batch dimension of size 1.
+        """
+        # Definite input and output Tensors for detection_graph
+        image_tensor = self._get_tensor('image_tensor:0')
+        # Each box represents a part of the image where a particular object was
+        # detected.
+        detection_boxes = self._get_tensor('detection_boxes:0')
+        # Each score represent how level of confidence for each of the objects.
+        # Score is shown on the result image, together with the class label.
+        detection_scores = self._get_tensor('detection_scores:0')
+        detection_classes = self._get_tensor('detection_classes:0')
+        num_detections = self._get_tensor('num_detections:0')
+        fetches = [detection_boxes,
+                   detection_scores,
+                   detection_classes,
+                   num_detections]
+
+        # Group the images by shape, since only images of the same shape can
+        # be stacked.
+        groups = dict()
+        for index, image in enumerate(images):
+            groups.setdefault(image.shape, []).append(index)
+
+        results = [None] * len(images)
+        for indexes in groups.values():
+            # The model expects images to have shape: [N, None, None, 3]
+            stacked_images = np.stack([images[i] for i in indexes])
+            feed_dict = {image_tensor: stacked_images}
+            (boxes, scores, classes, num) = \
+                self._sess.run(fetches, feed_dict=feed_dict)
+            # Scatter the results back.
+            for k, index in enumerate(indexes):
+                results[index] = (boxes[k:k + 1],
+                                  scores[k:k + 1],
+                                  classes[k:k + 1],
+                                  num[k:k + 1])
+
+        return results
 
     def _get_tensor(self, name):
         """Get a tensor from the graph.
@@ -331,38 +861,42 @@ class TripwireModeModule(IModule):
 
     def __init__(self, reserved_count):
         self._reserved_count = reserved_count
-        self._not_detected_counter = 0
-        self._mode = _MODE.NORMAL
+        # The modes and counters of not detected frames, indexed by source IDs.
+        self._modes = dict()
+        self._not_detected_counters = dict()
 
     def prepare(self):
         pass
 
     def execute(self, blobs):
-        # TODO(JiaKuan Su): Currently, I only handle the case for batch_size=1,
-        # please help complete the case for batch_size>1.
-        blob = blobs[0]
-        in_region_labels = blob.fetch('labels')
-
-        # Mode switch.
-        if self._mode == _MODE.NORMAL:
-            if in_region_labels.shape[0] > 0:
-                self._mode = _MODE.ALERT_START
-                blob.feed('to_save', np.array(True))
-                blob.feed('to_draw', np.array(True))
-        elif self._mode == _MODE.ALERT_START:
-            self._mode = _MODE.ALERTING
-            self._not_detected_counter = 0
-        elif self._mode == _MODE.ALERTING:
-            if in_region_labels.shape[0] > 0:
-                self._not_detected_counter = 0
-            else:
-                self._not_detected_counter += 1
-            if self._not_detected_counter == self._reserved_count:
-                self._mode = _MODE.ALERT_END
-        elif self._mode == _MODE.ALERT_END:
-            self._mode = _MODE.NORMAL
+        for blob in blobs:
+            source_id = get_source_id(blob)
+            in_region_labels = blob.fetch('labels')
+            mode = self._modes.get(source_id, _MODE.NORMAL)
+            not_detected_counter = self._not_detected_counters.get(source_id, 0)
 
-        blob.feed('mode', np.array(self._mode))
+            # Mode switch.
+            if mode == _MODE.NORMAL:
+                if in_region_labels.shape[0] > 0:
+                    mode = _MODE.ALERT_START
+                    blob.feed('to_save', np.array(True))
+                    blob.feed('to_draw', np.array(True))
+            elif mode == _MODE.ALERT_START:
+                mode = _MODE.ALERTING
+                not_detected_counter = 0
+            elif mode == _MODE.ALERTING:
+                if in_region_labels.shape[0] > 0:
+                    not_detected_counter = 0
+                else:
+                    not_detected_counter += 1
+                if not_detected_counter == self._reserved_count:
+                    mode = _MODE.ALERT_END
+            elif mode == _MODE.ALERT_END:
+                mode = _MODE.NORMAL
+
+            self._modes[source_id] = mode
+            self._not_detected_counters[source_id] = not_detected_counter
+            blob.feed('mode', np.array(mode))
 
         return blobs
 
@@ -484,9 +1018,11 @@ class VideoRecordModule(IModule):
         self._metadata_frame_names = metadata_frame_names
         self._metadata_custom_names = metadata_custom_names
         self._metadata = None
-        self._reserved_blobs = []
-        self._video_recorder = None
-        self._queue = None
+        # The reserved blobs, video recorders and the task queues of the
+        # recorders, indexed by source IDs.
+        self._reserved_blobs = dict()
+        self._video_recorders = dict()
+        self._queues = dict()
 
     def _abs_file_name(self, file_name):
         """Get absolute file name for a given file name.
@@ -505,96 +1041,102 @@ class VideoRecordModule(IModule):
     def execute(self, blobs):
         # TODO(JiaKuan Su): Please fill the detailed docstring.
         """The routine of module execution."""
-        # TODO(JiaKuan Su): Currently, I only handle the case for batch_size=1,
-        # please help complete the case for batch_size>1.
-        blob = blobs[0]
-        image = blob.fetch(self._image_name)
-        im_width = image.shape[1]
-        im_height = image.shape[0]
-        timestamp = float(blob.fetch('timestamp'))
-        mode = int(blob.fetch('mode'))
-
-        # Check the dimension of image tensor.
-        if image.ndim != 3:
-            raise RuntimeError('The input "image" tensor is not 3-dimensional.')
-
-        # Handle alert mode.
-        if mode == _MODE.ALERT_START:
-            if not os.path.exists(self._files_dir['abs']):
-                os.makedirs(self._files_dir['abs'])
-
-            if self._save_metadata:
-                # Construct the metadata file name.
-                metadata_file = '{}.json'.format(timestamp)
-                abs_metadata_name = self._abs_file_name(metadata_file)
-                relative_metadata_name = self._relative_file_name(metadata_file)
-                # Feed the metadata file name to blob.
-                blob.feed('metadata_name', np.array(relative_metadata_name))
-                # Construct the customized names and values to store in metadata.
-                metadata_custom_obj = dict()
-                for name in self._metadata_custom_names:
-                    metadata_custom_obj[name] = blob.fetch(name).tolist()
-
-            video_file = '{}.{}'.format(timestamp, self._video_format)
-            abs_video_name = self._abs_file_name(video_file)
-            relative_video_name = self._relative_file_name(video_file)
-            video_size = (im_width, im_height)
-            self._queue = Queue()
-            args = (abs_video_name,
-                    self._fps,
-                    video_size,
-                    self._save_metadata,
-                    abs_metadata_name if self._save_metadata else None,
-                    self._metadata_frame_names,
-                    metadata_custom_obj if self._save_metadata else None,
-                    self._queue,)
-            self._video_recorder = threading.Thread(target=_record_video,
-                                                    args=args)
-            self._video_recorder.setDaemon(True)
-            self._video_recorder.start()
-
-            # Record reserved images.
-            for reserved_blob in self._reserved_blobs:
-                self._queue.put({
+        for blob in blobs:
+            source_id = get_source_id(blob)
+            reserved_blobs = self._reserved_blobs.setdefault(source_id, [])
+            image = blob.fetch(self._image_name)
+            im_width = image.shape[1]
+            im_height = image.shape[0]
+            timestamp = float(blob.fetch('timestamp'))
+            mode = int(blob.fetch('mode'))
+
+            # Check the dimension of image tensor.
+            if image.ndim != 3:
+                raise RuntimeError('The input "image" tensor is not '
+                                   '3-dimensional.')
+
+            # Handle alert mode.
+            if mode == _MODE.ALERT_START:
+                if not os.path.exists(self._files_dir['abs']):
+                    os.makedirs(self._files_dir['abs'])
+
+                if self._save_metadata:
+                    # Construct the metadata file name.
+                    metadata_file = '{}.json'.format(timestamp)
+                    abs_metadata_name = self._abs_file_name(metadata_file)
+                    relative_metadata_name = \
+                        self._relative_file_name(metadata_file)
+                    # Feed the metadata file name to blob.
+                    blob.feed('metadata_name', np.array(relative_metadata_name))
+                    # Construct the customized names and values to store in
+                    # metadata.
+                    metadata_custom_obj = dict()
+                    for name in self._metadata_custom_names:
+                        metadata_custom_obj[name] = blob.fetch(name).tolist()
+
+                video_file = '{}.{}'.format(timestamp, self._video_format)
+                abs_video_name = self._abs_file_name(video_file)
+                relative_video_name = self._relative_file_name(video_file)
+                video_size = (im_width, im_height)
+                queue = Queue()
+                args = (abs_video_name,
+                        self._fps,
+                        video_size,
+                        self._save_metadata,
+                        abs_metadata_name if self._save_metadata else None,
+                        self._metadata_frame_names,
+                        metadata_custom_obj if self._save_metadata else None,
+                        queue,)
+                video_recorder = threading.Thread(target=_record_video,
+                                                  args=args)
+                video_recorder.setDaemon(True)
+                video_recorder.start()
+                self._queues[source_id] = queue
+                self._video_recorders[source_id] = video_recorder
+
+                # Record reserved images.
+                for reserved_blob in reserved_blobs:
+                    queue.put({
+                        'command': 'RECORD',
+                        'blob': reserved_blob
+                    })
+                # Record current image.
+                queue.put({
                     'command': 'RECORD',
-                    'blob': reserved_blob
+                    'blob': blob
                 })
-            # Record current image.
-            self._queue.put({
-                'command': 'RECORD',
-                'blob': blob
-            })
 
-            blob.feed('video_name', np.array(relative_video_name))
-        elif mode == _MODE.ALERTING:
-            self._queue.put({
-                'command': 'RECORD',
-                'blob': blob
-            })
-        elif mode == _MODE.ALERT_END:
-            self._queue.put({
-                'command': 'END'
-            })
-            self._video_recorder = None
-            self._queue = None
+                blob.feed('video_name', np.array(relative_video_name))
+            elif mode == _MODE.ALERTING:
+                self._queues[source_id].put({
+                    'command': 'RECORD',
+                    'blob': blob
+                })
+            elif mode == _MODE.ALERT_END:
+                self._queues.pop(source_id).put({
+                    'command': 'END'
+                })
+                del self._video_recorders[source_id]
 
-        # Insert the newest blob to reserved buffer.
-        self._reserved_blobs.append(blob)
-        # Remove the oldest blob from the reserved buffer if necessary.
-        if len(self._reserved_blobs) > self._reserved_count:
-            self._reserved_blobs.pop(0)
+            # Insert the newest blob to reserved buffer.
+            reserved_blobs.append(blob)
+            # Remove the oldest blob from the reserved buffer if necessary.
+            if len(reserved_blobs) > self._reserved_count:
+                reserved_blobs.pop(0)
 
         return blobs
 
     def destroy(self):
         """The routine of module destruction."""
-        if not self._video_recorder is None:
+        for source_id, video_recorder in self._video_recorders.items():
             logging.warn('Video recorder has not finished yet, '
                          'stop it elegantly')
-            self._queue.put({
+            self._queues[source_id].put({
                 'command': 'END'
             })
-            self._video_recorder.join()
+            video_recorder.join()
+        self._video_recorders = dict()
+        self._queues = dict()
 
 
 class OutputModule(IModule):
@@ -679,21 +1221,19 @@ class DrawTripwireModule(IModule):
     def execute(self, blobs):
         # TODO(JiaKuan Su): Please fill the detailed docstring.
         """The routine of module execution."""
-        # TODO(JiaKuan Su): Currently, I only handle the case for batch_size=1,
-        # please help complete the case for batch_size>1.
-        blob = blobs[0]
-        to_draw = self._always_draw or \
-                  (blob.has('to_draw') and blob.fetch('to_draw').tolist())
-
-        if to_draw:
-            image = blob.fetch('image')
-            mode = blob.fetch('mode').tolist()
-            if mode == _MODE.NORMAL:
-                color = self._normal_color
-            else:
-                color = self._alert_color
-            drawn_image = self._draw_tripwire(image, color)
-            blob.feed('drawn_image', drawn_image)
+        for blob in blobs:
+            to_draw = self._always_draw or \
+                      (blob.has('to_draw') and blob.fetch('to_draw').tolist())
+
+            if to_draw:
+                image = blob.fetch('image')
+                mode = blob.fetch('mode').tolist()
+                if mode == _MODE.NORMAL:
+                    color = self._normal_color
+                else:
+                    color = self._alert_color
+                drawn_image = self._draw_tripwire(image, color)
+                blob.feed('drawn_image', drawn_image)
 
         return blobs
 
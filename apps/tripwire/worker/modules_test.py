@@ -0,0 +1,428 @@
+"""Tests for the tripwire modules."""
+
+import cv2
+import numpy as np
+import pytest
+
+pytest.importorskip('tensorflow')
+
+from jagereye.streaming import Blob
+from jagereye.streaming import ImageSaveModule
+
+from modules import DrawTripwireModule
+from modules import InRegionDetectionModule
+from modules import MotionDetectionModule
+from modules import ObjectDetectionModule
+from modules import OutputModule
+from modules import TripwireModeModule
+from modules import VideoRecordModule
+from modules import _map_boxes
+
+
+CATEGORY_INDEX = {1: 'person'}
+REGION = (100, 0, 160, 100)
+RESERVED_COUNT = 5
+CLIP_LENGTH = 90
+MAX_DETECTIONS = 10
+
+
+class _BrightObjectDetectionModule(ObjectDetectionModule):
+    """Object detection module that detects the bright pixels as a person
+    without loading a TensorFlow model. Like the real model, it always outputs
+    a fixed number of detections."""
+
+    def __init__(self, **kwargs):
+        ObjectDetectionModule.__init__(self, ckpt_path=None, **kwargs)
+
+    def prepare(self):
+        self._batcher.start()
+
+    def _detect(self, images):
+        results = []
+        for image in images:
+            boxes = np.zeros((1, MAX_DETECTIONS, 4))
+            scores = np.zeros((1, MAX_DETECTIONS))
+            classes = np.zeros((1, MAX_DETECTIONS))
+            num = np.array([0.0])
+            ys, xs = np.nonzero(image[:, :, 0] > 128)
+            if ys.size > 0:
+                height, width = image.shape[0], image.shape[1]
+                boxes[0, 0] = [ys.min() / height, xs.min() / width,
+                               (ys.max() + 1) / height, (xs.max() + 1) / width]
+                scores[0, 0] = 0.9
+                classes[0, 0] = 1
+                num[0] = 1
+            results.append((boxes, scores, classes, num))
+        return results
+
+
+def _gen_clip():
+    """Generate a clip in which a bright square walks into the region,
+    disappears, and then walks into the region again."""
+    clip = []
+    for i in range(CLIP_LENGTH):
+        image = np.zeros((100, 160, 3), dtype=np.uint8)
+        if i < 25:
+            x = 6 * i
+            image[40:60, x:x + 20] = 255
+        elif i >= 60:
+            x = 6 * (i - 60)
+            image[40:60, x:x + 20] = 255
+        clip.append(image)
+    return clip
+
+
+def _run_chain(clip,
+               batch_size,
+               files_dir,
+               analysis_size=None,
+               motion_block_size=0,
+               motion_model=MotionDetectionModule.MODEL_DIFFERENCE,
+               crop_mode=ObjectDetectionModule.CROP_NONE,
+               cache_interval=1,
+               cache_propagation=ObjectDetectionModule.PROPAGATE_SHIFT):
+    """Run the tripwire chain over a clip with a batch size and return the
+    sent events. If analysis_size is given, blobs are also fed a downscaled
+    "analysis_image" tensor."""
+    events = []
+
+    def send_event(event_type, timestamp, content):
+        events.append((event_type, timestamp, content))
+
+    modules = [
+        MotionDetectionModule(block_size=motion_block_size,
+                              model=motion_model),
+        _BrightObjectDetectionModule(crop_mode=crop_mode,
+                                     crop_region=REGION,
+                                     cache_interval=cache_interval,
+                                     cache_propagation=cache_propagation),
+        InRegionDetectionModule(CATEGORY_INDEX, REGION, ['person']),
+        TripwireModeModule(reserved_count=RESERVED_COUNT),
+        DrawTripwireModule(REGION, (1, 0, 0), (0, 0, 1)),
+        ImageSaveModule(files_dir, image_name='drawn_image'),
+        VideoRecordModule(files_dir,
+                          RESERVED_COUNT,
+                          15,
+                          save_metadata=True,
+                          metadata_frame_names=['mode', 'labels'],
+                          metadata_custom_names=['region']),
+        OutputModule(send_event)
+    ]
+    for module in modules:
+        module.prepare()
+
+    modes = []
+    boxes = []
+    for start in range(0, len(clip), batch_size):
+        blobs = []
+        for index in range(start, min(start + batch_size, len(clip))):
+            blob = Blob()
+            blob.feed('image', clip[index].copy())
+            blob.feed('timestamp', np.array(1000.0 + index))
+            if not analysis_size is None:
+                blob.feed('analysis_image',
+                          cv2.resize(clip[index],
+                                     analysis_size,
+                                     interpolation=cv2.INTER_AREA))
+            blobs.append(blob)
+        for module in modules:
+            blobs = module.execute(blobs)
+        modes.extend(int(blob.fetch('mode')) for blob in blobs)
+        boxes.extend(blob.fetch('boxes') for blob in blobs)
+
+    for module in modules:
+        module.destroy()
+
+    return events, modes, boxes
+
+
+@pytest.mark.parametrize('batch_size', [4, 8])
+def test_chain_with_batches(tmpdir, batch_size):
+    clip = _gen_clip()
+
+    def files_dir(name):
+        return {
+            'abs': str(tmpdir.mkdir(name)),
+            'relative': 'tripwire/test'
+        }
+
+    expected_events, expected_modes, _ = \
+        _run_chain(clip, 1, files_dir('single'))
+    events, modes, _ = _run_chain(clip, batch_size, files_dir('batch'))
+
+    # The object walks into the region twice.
+    assert len(expected_events) == 2
+    assert events == expected_events
+    assert modes == expected_modes
+
+
+def test_chain_with_analysis_image(tmpdir):
+    clip = _gen_clip()
+
+    expected_events, expected_modes, expected_boxes = \
+        _run_chain(clip, 1, {'abs': str(tmpdir.mkdir('full')),
+                             'relative': 'tripwire/test'})
+    events, modes, boxes = \
+        _run_chain(clip, 1, {'abs': str(tmpdir.mkdir('analysis')),
+                             'relative': 'tripwire/test'},
+                   analysis_size=(80, 50))
+
+    # Detections on the half size images map back to the same boxes.
+    assert len(events) == len(expected_events) == 2
+    assert modes == expected_modes
+    for box, expected_box in zip(boxes, expected_boxes):
+        np.testing.assert_allclose(box, expected_box)
+
+
+def test_chain_with_block_motion(tmpdir):
+    clip = _gen_clip()
+
+    expected_events, expected_modes, _ = \
+        _run_chain(clip, 1, {'abs': str(tmpdir.mkdir('pixel')),
+                             'relative': 'tripwire/test'})
+    events, modes, _ = \
+        _run_chain(clip, 1, {'abs': str(tmpdir.mkdir('block')),
+                             'relative': 'tripwire/test'},
+                   motion_block_size=4)
+
+    assert events == expected_events
+    assert modes == expected_modes
+
+
+def _gen_outside_motion_clip():
+    """Generate a clip in which a bright square moves outside the region."""
+    clip = []
+    for i in range(10):
+        image = np.zeros((100, 160, 3), dtype=np.uint8)
+        image[40:60, 3 * i:3 * i + 20] = 255
+        clip.append(image)
+    return clip
+
+
+def _detect_motion(module, clip, analysis_size=None):
+    """Run the motion detection module over a clip and return the "moved"
+    results."""
+    moved = []
+    for image in clip:
+        blob = Blob()
+        blob.feed('image', image)
+        if not analysis_size is None:
+            blob.feed('analysis_image',
+                      cv2.resize(image,
+                                 analysis_size,
+                                 interpolation=cv2.INTER_AREA))
+        module.execute([blob])
+        moved.append(bool(blob.fetch('moved')))
+    return moved
+
+
+def test_motion_in_region():
+    clip = _gen_outside_motion_clip()
+    assert any(_detect_motion(MotionDetectionModule(), clip))
+    for analysis_size in [None, (80, 50)]:
+        module = MotionDetectionModule(region=REGION, region_margin=0.2)
+        assert not any(_detect_motion(module, clip, analysis_size))
+        assert module.frame_count == len(clip)
+        assert module.moved_count == 0
+        # The square walks into the margin of the region.
+        module = MotionDetectionModule(region=REGION, region_margin=1.5)
+        assert any(_detect_motion(module, clip, analysis_size))
+
+
+def test_object_detection_skip_count():
+    detector = _BrightObjectDetectionModule()
+    detector.prepare()
+    blobs = []
+    for moved in [False, True, False, False]:
+        blob = Blob()
+        blob.feed('image', np.zeros((100, 160, 3), dtype=np.uint8))
+        blob.feed('moved', np.array(moved))
+        blobs.append(blob)
+    detector.execute(blobs)
+    detector.destroy()
+    assert detector.detected_count == 1
+    assert detector.skipped_count == 3
+    assert detector.skip_ratio == 0.75
+
+
+def test_chain_with_background_motion(tmpdir):
+    clip = _gen_clip()
+
+    events, _, _ = \
+        _run_chain(clip, 1, {'abs': str(tmpdir.mkdir('background')),
+                             'relative': 'tripwire/test'},
+                   motion_model=MotionDetectionModule.MODEL_BACKGROUND)
+
+    # The object walks into the region twice.
+    assert len(events) == 2
+
+
+def test_unsupported_motion_model():
+    with pytest.raises(ValueError):
+        MotionDetectionModule(model='unsupported')
+
+
+def test_motion_box():
+    background = np.zeros((100, 160, 3), dtype=np.uint8)
+    image = background.copy()
+    image[40:60, 120:140] = 255
+    for model in [MotionDetectionModule.MODEL_DIFFERENCE,
+                  MotionDetectionModule.MODEL_BACKGROUND]:
+        for region in [None, REGION]:
+            module = MotionDetectionModule(region=region, model=model)
+            blobs = [Blob(), Blob()]
+            blobs[0].feed('image', background)
+            blobs[1].feed('image', image)
+            module.execute(blobs)
+            assert blobs[0].fetch('motion_box').size == 0
+            ymin, xmin, ymax, xmax = blobs[1].fetch('motion_box')
+            assert 0.3 <= ymin <= 0.4 and 0.6 <= ymax <= 0.7
+            assert 0.7 <= xmin <= 0.75 and 0.875 <= xmax <= 0.925
+
+
+def test_motion_res():
+    background = np.zeros((100, 160, 3), dtype=np.uint8)
+    image = background.copy()
+    image[40:60, 120:140] = 255
+    for block_size in [0, 4]:
+        module = MotionDetectionModule(block_size=block_size)
+        blobs = [Blob(), Blob()]
+        blobs[0].feed('image', background)
+        blobs[1].feed('image', image)
+        module.execute(blobs)
+        assert not blobs[0].has('res')
+        res = blobs[1].fetch('res')
+        assert res.shape == (100, 160)
+        # The moving pixels are black.
+        assert res[50, 130] == 0
+        assert res[10, 10] == 255
+
+
+@pytest.mark.parametrize('crop_mode', [ObjectDetectionModule.CROP_MOTION,
+                                       ObjectDetectionModule.CROP_REGION])
+def test_chain_with_crop(tmpdir, crop_mode):
+    clip = _gen_clip()
+
+    expected_events, expected_modes, expected_boxes = \
+        _run_chain(clip, 1, {'abs': str(tmpdir.mkdir('full')),
+                             'relative': 'tripwire/test'})
+    events, modes, boxes = \
+        _run_chain(clip, 1, {'abs': str(tmpdir.mkdir('crop')),
+                             'relative': 'tripwire/test'},
+                   crop_mode=crop_mode)
+
+    assert len(events) == len(expected_events) == 2
+    assert modes == expected_modes
+    for box, expected_box in zip(boxes, expected_boxes):
+        np.testing.assert_allclose(box, expected_box, atol=0.02)
+
+
+def test_map_boxes():
+    boxes = np.array([[[0.0, 0.0, 1.0, 1.0], [0.5, 0.25, 0.75, 0.5]]])
+    mapped = _map_boxes(boxes, (0.2, -0.1, 0.5, 0.4))
+    np.testing.assert_allclose(mapped, [[[0.2, 0.0, 0.7, 0.3],
+                                         [0.45, 0.0, 0.575, 0.1]]])
+
+
+def test_crop_small_object():
+    image = np.zeros((400, 640, 3), dtype=np.uint8)
+    image[100:110, 500:510] = 255
+    # Without a motion box, the whole frame is cropped and the object is lost
+    # when the frame is resized to the crop size.
+    for crop_mode, motion_box, found in [
+            (ObjectDetectionModule.CROP_MOTION, [0.25, 0.78, 0.275, 0.8], True),
+            (ObjectDetectionModule.CROP_REGION, None, True),
+            (ObjectDetectionModule.CROP_MOTION, [], False)]:
+        detector = _BrightObjectDetectionModule(crop_mode=crop_mode,
+                                                crop_region=(480, 80, 640, 130),
+                                                crop_size=64)
+        detector.prepare()
+        blob = Blob()
+        blob.feed('image', image)
+        blob.feed('moved', np.array(True))
+        if not motion_box is None:
+            blob.feed('motion_box', np.array(motion_box))
+        detector.execute([blob])
+        detector.destroy()
+        assert int(blob.fetch('num_detections')[0]) == int(found)
+        if found:
+            box = blob.fetch('detection_boxes')[0, 0]
+            np.testing.assert_allclose(
+                box, [100 / 400, 500 / 640, 110 / 400, 510 / 640], atol=0.03)
+
+
+def test_unsupported_crop_mode():
+    with pytest.raises(ValueError):
+        ObjectDetectionModule(None, crop_mode='unsupported')
+    with pytest.raises(ValueError):
+        ObjectDetectionModule(None, crop_mode=ObjectDetectionModule.CROP_REGION)
+
+
+def _box_iou(box_a, box_b):
+    """Compute the IoU of two [ymin, xmin, ymax, xmax] boxes."""
+    height = max(0.0, min(box_a[2], box_b[2]) - max(box_a[0], box_b[0]))
+    width = max(0.0, min(box_a[3], box_b[3]) - max(box_a[1], box_b[1]))
+    intersection = height * width
+    union = (box_a[2] - box_a[0]) * (box_a[3] - box_a[1]) + \
+            (box_b[2] - box_b[0]) * (box_b[3] - box_b[1]) - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+@pytest.mark.parametrize('cache_propagation, min_agreement, min_iou', [
+    (ObjectDetectionModule.PROPAGATE_REUSE, 0.9, 0.5),
+    (ObjectDetectionModule.PROPAGATE_SHIFT, 1.0, 0.9)])
+def test_chain_with_cache(tmpdir, cache_propagation, min_agreement, min_iou):
+    clip = _gen_clip()
+
+    expected_events, expected_modes, expected_boxes = \
+        _run_chain(clip, 1, {'abs': str(tmpdir.mkdir('full')),
+                             'relative': 'tripwire/test'})
+    events, modes, boxes = \
+        _run_chain(clip, 4, {'abs': str(tmpdir.mkdir('cache')),
+                             'relative': 'tripwire/test'},
+                   cache_interval=3,
+                   cache_propagation=cache_propagation)
+
+    # The accuracy impact of the cache is the agreement of the modes, and the
+    # IoU of the in-region boxes with the ones detected on every frame. The
+    # reused boxes lag behind the walking object, so the object may enter the
+    # region a frame late.
+    assert len(events) == len(expected_events) == 2
+    agreement = np.mean(np.array(modes) == np.array(expected_modes))
+    assert agreement >= min_agreement
+    ious = []
+    for box, expected_box in zip(boxes, expected_boxes):
+        ious.extend(_box_iou(a, b) for a, b in zip(box, expected_box))
+    assert ious and np.mean(ious) >= min_iou
+
+
+def test_detection_cache():
+    detector = _BrightObjectDetectionModule(cache_interval=3)
+    detector.prepare()
+    blobs = []
+    # The energy jumps at the 5th frame, and motion stops at the 7th frame.
+    for moved, energy in [(True, 2.0), (True, 2.5), (True, 2.0), (True, 2.0),
+                          (True, 5.0), (True, 5.0), (False, 0.0), (True, 5.0)]:
+        blob = Blob()
+        image = np.zeros((100, 160, 3), dtype=np.uint8)
+        image[40:60, 10 * len(blobs):10 * len(blobs) + 20] = 255
+        blob.feed('image', image)
+        blob.feed('moved', np.array(moved))
+        blob.feed('motion_energy', np.array(energy))
+        blobs.append(blob)
+    detector.execute(blobs)
+    detector.destroy()
+    # Detected: 1st, 4th (interval), 5th (energy), 8th (cache cleared).
+    assert detector.detected_count == 4
+    assert detector.cached_count == 3
+    assert detector.skipped_count == 1
+    assert detector.inference_skip_ratio == 0.5
+    # Without motion boxes, the cached boxes are reused.
+    np.testing.assert_array_equal(blobs[1].fetch('detection_boxes'),
+                                  blobs[0].fetch('detection_boxes'))
+    assert int(blobs[1].fetch('num_detections')[0]) == 1
+
+
+def test_unsupported_cache_propagation():
+    with pytest.raises(ValueError):
+        ObjectDetectionModule(None, cache_propagation='unsupported')
@@ -1,6 +1,7 @@
 """The tripwire worker."""
 
 import argparse
+import json
 import os
 import sys
 
@@ -9,6 +10,7 @@ from jagereye.streaming import ImageSaveModule
 from jagereye.streaming import VideoStreamCapturer
 from jagereye.streaming import DisplayModule
 from jagereye.streaming import Pipeline
+from jagereye.util.metrics import PeriodicReporter
 from jagereye.worker import Worker
 
 from modules import DrawTripwireModule
@@ -25,9 +27,40 @@ MODEL_NAME = 'ssd_mobilenet_v1_coco_11_06_2017'
 LABELS_PATH = 'coco.labels'
 FPS = 15
 RESERVED_SECONDS = 3
+# The (width, height) of images for motion and object detection, the height is
+# derived from the aspect ratio of the stream. The object detection model
+# resizes its input to 300x300 anyway.
+ANALYSIS_SIZE = (480, None)
+# The size of blocks (in pixels of the analysis image) to detect motion.
+MOTION_BLOCK_SIZE = 4
+# The motion model. The background model is more robust to lighting flicker
+# and compression artifacts, but it is not measured on tripwire footage yet,
+# so the frame difference model is kept. The background model updates every
+# 2 frames at the learning rate if it is enabled.
+MOTION_MODEL = MotionDetectionModule.MODEL_DIFFERENCE
+MOTION_LEARNING_RATE = 0.05
+MOTION_UPDATE_INTERVAL = 2
+# The margin around the tripwire region to detect motion, as a ratio of the
+# region size.
+MOTION_REGION_MARGIN = 0.2
+# The crop mode of the object detection. Cropping the full resolution image
+# around the motion keeps small distant objects from being lost in the
+# resizing of the model input, but it is only measured on synthetic frames
+# (see crop_benchmark.py), so the whole frame is detected.
+DETECTION_CROP_MODE = ObjectDetectionModule.CROP_NONE
+DETECTION_CROP_MARGIN = 0.2
+# The maximum number of moved frames per object detection. Caching the
+# detection reuses boxes across frames, and its accuracy impact is only
+# measured on synthetic clips (see cache_benchmark.py), so every moved frame
+# is detected.
+DETECTION_CACHE_INTERVAL = 1
+# Run the modules in stages on separated threads or not.
+STAGED = False
 VISUALIZE = False
 NORMAL_COLOR = (226, 137, 59)
 ALERT_COLOR = (66, 194, 244)
+# The interval (in seconds) to publish the capture metrics.
+METRICS_INTERVAL = 60
 
 
 def create_category_index(labels_path):
@@ -56,6 +89,35 @@ def normalize_color(color):
     return (norms[0], norms[1], norms[2])
 
 
+def summarize_capture_metrics(pipeline, capturer, detector):
+    """Summarize the capture and execution metrics of the pipeline, the
+    capturer and the object detector."""
+    capture = pipeline.capture_metrics[0].snapshot()
+    decode = capturer.metrics.snapshot()
+    execution = pipeline.metrics_snapshot()
+    return {
+        'decode_latency_p50_ms': decode['latency']['p50'],
+        'decode_latency_p99_ms': decode['latency']['p99'],
+        'capture_latency_p99_ms': capture['latency']['p99'],
+        'jitter_p50_ms': capture['jitter']['p50'],
+        'jitter_p99_ms': capture['jitter']['p99'],
+        'effective_fps': capture['effective_fps'],
+        'dropped_fps': capture['dropped_fps'] + decode['dropped_fps'],
+        'retries': capture['retries'],
+        'frame_latency_p50_ms': execution['latency']['p50'],
+        'frame_latency_p99_ms': execution['latency']['p99'],
+        'breakdown': execution['breakdown'],
+        'detector_skip_ratio': detector.skip_ratio,
+        'detector_inference_skip_ratio': detector.inference_skip_ratio,
+    }
+
+
+def report_capture_metrics(summary):
+    """Publish the summary of capture metrics."""
+    logging.info('Capture metrics: {}'.format(json.dumps(summary,
+                                                         sort_keys=True)))
+
+
 def worker_fn(params, files_dir, send_event):
     """The main worker function"""
     config = params['pipelines'][0]['params']
@@ -78,35 +140,74 @@ def worker_fn(params, files_dir, send_event):
     metadata_frame_names = ['mode', 'labels', 'boxes', 'scores']
     metadata_custom_names = ['region']
 
-    pipeline = Pipeline(cap_interval=cap_interval)
+    # Set STAGED to run the analysis and the output modules on separated
+    # threads, so disk writes of images and videos do not stall the object
+    # detection.
+    pipeline = Pipeline(cap_interval=cap_interval, staged=STAGED)
 
-    pipeline.source(VideoStreamCapturer(src)) \
-            .pipe(MotionDetectionModule()) \
-            .pipe(ObjectDetectionModule(ckpt_path)) \
+    # Only decode frames at the pipeline rate, and skip the frames that pile
+    # up in the stream buffer of live sources.
+    capturer = VideoStreamCapturer(src,
+                                   decimate_interval=cap_interval,
+                                   analysis_size=ANALYSIS_SIZE)
+
+    # Only detect motion around the tripwire region, so motion elsewhere does
+    # not trigger the object detection.
+    motion_detector = MotionDetectionModule(
+        block_size=MOTION_BLOCK_SIZE,
+        region=region_tuple,
+        region_margin=MOTION_REGION_MARGIN,
+        model=MOTION_MODEL,
+        learning_rate=MOTION_LEARNING_RATE,
+        update_interval=MOTION_UPDATE_INTERVAL)
+    object_detector = ObjectDetectionModule(
+        ckpt_path,
+        crop_mode=DETECTION_CROP_MODE,
+        crop_margin=DETECTION_CROP_MARGIN,
+        cache_interval=DETECTION_CACHE_INTERVAL)
+
+    pipeline.source(capturer) \
+            .pipe(motion_detector, stage='analysis') \
+            .pipe(object_detector, stage='analysis') \
             .pipe(InRegionDetectionModule(category_index,
                                           region_tuple,
-                                          triggers)) \
-            .pipe(TripwireModeModule(reserved_count=reserved_count)) \
+                                          triggers),
+                  stage='analysis') \
+            .pipe(TripwireModeModule(reserved_count=reserved_count),
+                  stage='analysis') \
             .pipe(DrawTripwireModule(region_tuple,
                                      normal_color,
                                      alert_color,
-                                     always_draw=VISUALIZE)) \
+                                     always_draw=VISUALIZE),
+                  stage='output') \
             .pipe(ImageSaveModule(files_dir,
                                   max_width=300,
-                                  image_name='drawn_image')) \
-            .pipe(VideoRecordModule(files_dir,
-                                    reserved_count,
-                                    FPS,
-                                    save_metadata=True,
-                                    metadata_frame_names=metadata_frame_names,
-                                    metadata_custom_names=metadata_custom_names)) \
-            .pipe(OutputModule(send_event))
+                                  image_name='drawn_image'),
+                  stage='output') \
+            .pipe(VideoRecordModule(
+                      files_dir,
+                      reserved_count,
+                      FPS,
+                      save_metadata=True,
+                      metadata_frame_names=metadata_frame_names,
+                      metadata_custom_names=metadata_custom_names),
+                  stage='output') \
+            .pipe(OutputModule(send_event), stage='output')
 
     if VISUALIZE:
-        pipeline.pipe(DisplayModule(image_name='drawn_image'))
+        pipeline.pipe(DisplayModule(image_name='drawn_image'), stage='output')
 
     pipeline.start()
-    pipeline.await_termination()
+
+    reporter = PeriodicReporter(METRICS_INTERVAL,
+                                lambda: summarize_capture_metrics(
+                                    pipeline, capturer, object_detector),
+                                report_capture_metrics)
+    reporter.start()
+    try:
+        pipeline.await_termination()
+    finally:
+        reporter.stop()
 
 
 def _send_event(event_type, timestamp, content):
@@ -0,0 +1,108 @@
+"""Micro-benchmark of blob feeding and fetching throughput.
+
+The benchmark compares the current `Blob` with the previous implementation,
+which validated the name on every call, looked up a tensor twice in `fetch`
+and kept a per-instance `__dict__`. A frame is simulated by creating a blob
+and doing the tensor accesses of a typical module chain.
+
+Usage (from the framework directory):
+
+    python3 -m benchmarks.blob_access
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import timeit
+
+import numpy as np
+from six import string_types
+
+from jagereye.streaming.blob import Blob
+
+
+class _LegacyBlob(object):
+    """The previous implementation of `Blob`, kept for comparison."""
+
+    def __init__(self):
+        self._data = dict()
+
+    def feed(self, name, tensor):
+        if not isinstance(name, string_types):
+            raise TypeError('Tensor name must be a string.')
+        if not isinstance(tensor, np.ndarray):
+            raise TypeError('Only numpy ndarray is supported for feeding.')
+        if tensor.dtype.kind not in 'biufU':
+            raise TypeError('Only float-like types (bool, int, unsigned int and'
+                            ' float) or string are supported for tensor.')
+        self._data[name] = tensor
+        return tensor
+
+    def has(self, name):
+        if not isinstance(name, string_types):
+            raise TypeError('Tensor name must be a string.')
+        return name in self._data
+
+    def fetch(self, name):
+        if not isinstance(name, string_types):
+            raise TypeError('Tensor name must be a string.')
+        if not self.has(name):
+            raise RuntimeError("Can't find tensor: {}".format(name))
+        return self._data[name]
+
+
+# The names of tensors fed by a typical module chain.
+NAMES = ['image', 'timestamp', 'moved', 'detection_boxes', 'detection_scores',
+         'detection_classes', 'num_detections', 'labels', 'boxes', 'scores',
+         'mode']
+
+TENSOR = np.zeros((2, 2))
+
+
+def _frame(blob_class):
+    """Simulate the tensor accesses of a frame."""
+    blob = blob_class()
+    for name in NAMES:
+        blob.feed(name, TENSOR)
+    for _ in range(2):
+        for name in NAMES:
+            blob.fetch(name)
+    blob.has('to_save')
+    blob.has('to_draw')
+
+
+def _frame_unchecked():
+    """Simulate the tensor accesses of a frame with the unchecked fast
+    path."""
+    blob = Blob()
+    for name in NAMES:
+        blob.feed_unchecked(name, TENSOR)
+    for _ in range(2):
+        for name in NAMES:
+            blob.fetch(name)
+    blob.has('to_save')
+    blob.has('to_draw')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--number', type=int, default=20000,
+                        help='number of simulated frames')
+    args = parser.parse_args()
+
+    cases = [
+        ('legacy', lambda: _frame(_LegacyBlob)),
+        ('blob', lambda: _frame(Blob)),
+        ('unchecked', _frame_unchecked),
+    ]
+    print('{:<12}{:>12}{:>16}'.format('class', 'us/frame', 'frames/s'))
+    for name, func in cases:
+        sec = timeit.timeit(func, number=args.number)
+        print('{:<12}{:>12.2f}{:>16.0f}'.format(
+            name, sec / args.number * 1e6, args.number / sec))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Micro-benchmark of blob copying cost versus frame size.
+
+The benchmark compares the copy-on-write copy with the deep copy of a blob
+that contains an "image" tensor and a "timestamp" tensor.
+
+Usage (from the framework directory):
+
+    python3 -m benchmarks.blob_copy
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import functools
+import timeit
+
+import numpy as np
+
+from jagereye.streaming.blob import Blob
+
+
+# The frame sizes to benchmark, in (name, height, width).
+FRAME_SIZES = [
+    ('240p', 240, 320),
+    ('480p', 480, 640),
+    ('720p', 720, 1280),
+    ('1080p', 1080, 1920),
+]
+
+
+def _create_blob(height, width):
+    """Create a blob that contains a frame."""
+    blob = Blob()
+    blob.feed('image', np.zeros((height, width, 3), dtype=np.uint8))
+    blob.feed('timestamp', np.array(0.0))
+    return blob
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--number', type=int, default=200,
+                        help='number of copies per measurement')
+    args = parser.parse_args()
+
+    print('{:<8}{:>10}{:>14}{:>14}'.format(
+        'frame', 'size_mb', 'deep_us', 'cow_us'))
+    for name, height, width in FRAME_SIZES:
+        blob = _create_blob(height, width)
+        deep_sec = timeit.timeit(functools.partial(blob.copy, deep=True),
+                                 number=args.number)
+        cow_sec = timeit.timeit(blob.copy, number=args.number)
+        size_mb = height * width * 3 / (1024.0 * 1024.0)
+        print('{:<8}{:>10.2f}{:>14.2f}{:>14.2f}'.format(
+            name,
+            size_mb,
+            deep_sec / args.number * 1e6,
+            cow_sec / args.number * 1e6))
+
+
+if __name__ == '__main__':
+    main()
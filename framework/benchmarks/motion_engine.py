@@ -0,0 +1,99 @@
+"""Benchmark of the motion engine methods.
+
+The benchmark measures the time per frame of the pixel method and the block
+method with several scales and block sizes over synthetic clips, and their
+agreement with the pixel method on the moving percentage and the motion
+decision.
+
+Usage (from the framework directory):
+
+    python3 -m benchmarks.motion_engine --width 480 --height 360
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.pipeline_suite import gen_clip
+from jagereye.util.motion import MotionEngine
+
+CONFIGS = [(1, 0), (2, 0), (1, 4), (2, 2), (2, 4), (1, 8)]
+
+
+def run(clips, scale, block_size, repeat):
+    """Run the motion engine over clips.
+
+    Args:
+      clips (list of list of `numpy.ndarray`): The clips.
+      scale (int): The factor to downscale.
+      block_size (int): The size of blocks.
+      repeat (int): The number of times to run every clip.
+
+    Returns:
+      tuple: The time (in milliseconds) per frame, and the list of moving
+        percentages of every clip.
+    """
+    percentages = []
+    num_frames = 0
+    start = time.perf_counter()
+    for clip in clips:
+        for _ in range(repeat):
+            engine = MotionEngine(scale=scale, block_size=block_size)
+            result = [engine.update(image) for image in clip]
+            num_frames += len(clip)
+        percentages.append(result[1:])
+    elapsed = time.perf_counter() - start
+    return elapsed * 1000.0 / num_frames, percentages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--width', type=int, default=480,
+                        help='frame width')
+    parser.add_argument('--height', type=int, default=360,
+                        help='frame height')
+    parser.add_argument('--densities', default='0,0.005,0.01,0.02,0.05,0.2',
+                        help='comma separated motion densities')
+    parser.add_argument('--threshold', type=float, default=1.0,
+                        help='percentage threshold of the motion decision')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of times to run every clip')
+    args = parser.parse_args()
+
+    clips = []
+    for density in args.densities.split(','):
+        clip = gen_clip(args.width, args.height, float(density))
+        # Add sensor noise.
+        noise = np.random.RandomState(0).randint(-6, 7, (len(clip),) +
+                                                 clip[0].shape)
+        clips.append(list(np.clip(np.array(clip) + noise, 0, 255)
+                          .astype(np.uint8)))
+
+    _, references = run(clips, 1, 0, 1)
+    print('{:>6}{:>8}{:>12}{:>10}{:>14}{:>10}'.format(
+        'scale', 'block', 'ms/frame', 'speedup', 'max_err_pct', 'agree'))
+    base_ms = None
+    for scale, block_size in CONFIGS:
+        ms, percentages = run(clips, scale, block_size, args.repeat)
+        if base_ms is None:
+            base_ms = ms
+        errors = []
+        agreed = []
+        for clip_percentages, clip_references in zip(percentages, references):
+            for percentage, reference in zip(clip_percentages,
+                                             clip_references):
+                errors.append(abs(percentage - reference))
+                agreed.append((percentage >= args.threshold) ==
+                              (reference >= args.threshold))
+        print('{:>6}{:>8}{:>12.3f}{:>10.2f}{:>14.2f}{:>10.2%}'.format(
+            scale, block_size, ms, base_ms / ms, max(errors),
+            float(np.mean(agreed))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""Benchmark of end-to-end frame latency for the pipeline schedulers.
+
+The benchmark runs the same pipeline with every scheduler. A synthetic
+capturer simulates the read cost of a camera and stamps each blob when the
+read finishes, and a sink module measures how long the blob took to reach the
+end of the module chain.
+
+Usage (from the framework directory):
+
+    python3 -m benchmarks.pipeline_latency --fps 15 --read_ms 40
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import time
+
+import numpy as np
+
+from jagereye.streaming.blob import Blob
+from jagereye.streaming.capturers.base import ICapturer
+from jagereye.streaming.modules.base import IModule
+from jagereye.streaming.pipeline import Pipeline
+
+
+class _SyntheticCapturer(ICapturer):
+    """Capturer that simulates the read cost of a camera."""
+
+    def __init__(self, read_ms):
+        self._read_sec = read_ms / 1000.0
+        self._image = np.zeros((8, 8, 3), dtype=np.uint8)
+
+    def prepare(self):
+        pass
+
+    def capture(self):
+        time.sleep(self._read_sec)
+        blob = Blob()
+        blob.feed('image', self._image)
+        blob.feed('timestamp', np.array(time.monotonic()))
+        return blob
+
+    def destroy(self):
+        pass
+
+
+class _LatencyModule(IModule):
+    """Module that simulates processing and records the frame latency."""
+
+    def __init__(self, work_ms):
+        self._work_sec = work_ms / 1000.0
+        self._latencies = []
+
+    @property
+    def latencies(self):
+        """list of float: The recorded latencies (in seconds)."""
+        return self._latencies
+
+    def prepare(self):
+        pass
+
+    def execute(self, blobs):
+        time.sleep(self._work_sec)
+        end = time.monotonic()
+        for blob in blobs:
+            self._latencies.append(end - float(blob.fetch('timestamp')))
+        return blobs
+
+    def destroy(self):
+        pass
+
+
+def run(scheduler, fps, read_ms, work_ms, batch_size, duration):
+    """Run the pipeline with a scheduler and collect the frame latencies.
+
+    Args:
+      scheduler (string): The pipeline scheduler.
+      fps (int): The target capture FPS.
+      read_ms (float): The simulated read cost (in milliseconds).
+      work_ms (float): The simulated module cost (in milliseconds).
+      batch_size (int): The size of batch.
+      duration (float): The running duration (in seconds).
+
+    Returns:
+      dict: The benchmark result.
+    """
+    sink = _LatencyModule(work_ms)
+    pipeline = Pipeline(cap_interval=1000.0 / fps,
+                        batch_size=batch_size,
+                        scheduler=scheduler)
+    pipeline.source(_SyntheticCapturer(read_ms)).pipe(sink)
+    pipeline.start()
+    time.sleep(duration)
+    pipeline.stop()
+
+    latencies_ms = np.array(sink.latencies) * 1000.0
+    return {
+        'scheduler': scheduler,
+        'frames': len(latencies_ms),
+        'fps': len(latencies_ms) / duration,
+        'mean_ms': float(np.mean(latencies_ms)),
+        'p50_ms': float(np.percentile(latencies_ms, 50)),
+        'p99_ms': float(np.percentile(latencies_ms, 99)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--fps', type=int, default=15,
+                        help='target capture FPS')
+    parser.add_argument('--read_ms', type=float, default=40.0,
+                        help='simulated read cost in milliseconds')
+    parser.add_argument('--work_ms', type=float, default=5.0,
+                        help='simulated module cost in milliseconds')
+    parser.add_argument('--batch_size', type=int, default=1,
+                        help='size of batch')
+    parser.add_argument('--duration', type=float, default=5.0,
+                        help='running duration in seconds per scheduler')
+    args = parser.parse_args()
+
+    print('{:<10}{:>8}{:>8}{:>10}{:>10}{:>10}'.format(
+        'scheduler', 'frames', 'fps', 'mean_ms', 'p50_ms', 'p99_ms'))
+    for scheduler in [Pipeline.SCHEDULER_POLLING, Pipeline.SCHEDULER_EVENT]:
+        result = run(scheduler,
+                     args.fps,
+                     args.read_ms,
+                     args.work_ms,
+                     args.batch_size,
+                     args.duration)
+        print('{scheduler:<10}{frames:>8}{fps:>8.2f}{mean_ms:>10.2f}'
+              '{p50_ms:>10.2f}{p99_ms:>10.2f}'.format(**result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,293 @@
+"""Benchmark suite of pipeline throughput, latency and memory.
+
+The suite runs the pipeline over synthetic videos at several resolutions and
+motion densities, with reference module chains:
+
+1. "grayscale": The built-in `GrayscaleModule`.
+2. "detect": The built-in `GrayscaleModule`, a frame difference motion gate
+   and a stubbed detector that costs a fixed time per batch with motion,
+   which is like the module chain of the tripwire application.
+
+The motion density is the fraction of the frame covered by moving objects.
+Every case runs in a fresh process until all frames are executed, and the
+results are printed as JSON to compare runs, for example:
+
+    python3 -m benchmarks.pipeline_suite --output before.json
+    python3 -m benchmarks.pipeline_suite --output after.json
+
+The FPS is the number of frames over the running time, the frame latency is
+from capturing to the end of the module chain, and the peak RSS is the
+maximum resident set size of the process running the case.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import json
+import multiprocessing
+import platform
+import resource
+import time
+
+import cv2
+import numpy as np
+
+from jagereye.streaming.blob import Blob
+from jagereye.streaming.capturers.base import ICapturer
+from jagereye.streaming.exceptions import EndOfVideoError
+from jagereye.streaming.frame_queue import FrameQueue
+from jagereye.streaming.modules.base import IModule
+from jagereye.streaming.modules.grayscale_modules import GrayscaleModule
+from jagereye.streaming.pipeline import Pipeline
+
+CHAINS = ['grayscale', 'detect']
+
+
+def gen_clip(width, height, density, length=30, seed=0):
+    """Generate a synthetic clip with moving objects on a textured background.
+
+    Args:
+      width (int): The frame width.
+      height (int): The frame height.
+      density (float): The fraction of the frame covered by moving objects,
+        range from 0 to 1.
+      length (int): The number of frames. Defaults to 30.
+      seed (int): The random seed. Defaults to 0.
+
+    Returns:
+      list of `numpy.ndarray`: The BGR frames.
+    """
+    rng = np.random.RandomState(seed)
+    background = cv2.GaussianBlur(
+        rng.randint(0, 256, (height, width, 3)).astype(np.uint8), (5, 5), 0)
+    # Split the moving area into 4 square objects.
+    num_objects = 4
+    side = int(np.sqrt(density * width * height / num_objects))
+    side = min(side, width, height)
+    objects = []
+    for _ in range(num_objects if side > 0 else 0):
+        objects.append({
+            'x': rng.randint(0, width - side + 1),
+            'y': rng.randint(0, height - side + 1),
+            'dx': rng.choice([-1, 1]) * max(1, width // 80),
+            'dy': rng.choice([-1, 1]) * max(1, height // 80),
+            'color': tuple(int(c) for c in rng.randint(0, 256, 3)),
+        })
+
+    clip = []
+    for _ in range(length):
+        frame = background.copy()
+        for obj in objects:
+            frame[obj['y']:obj['y'] + side, obj['x']:obj['x'] + side] = \
+                obj['color']
+            for pos, vel, size in [('x', 'dx', width), ('y', 'dy', height)]:
+                obj[pos] += obj[vel]
+                if obj[pos] < 0 or obj[pos] > size - side:
+                    obj[vel] = -obj[vel]
+                    obj[pos] = min(max(obj[pos], 0), size - side)
+        clip.append(frame)
+    return clip
+
+
+class _SyntheticVideoCapturer(ICapturer):
+    """Capturer that cycles a synthetic clip for a number of frames."""
+
+    def __init__(self, clip, num_frames):
+        self._clip = clip
+        self._num_frames = num_frames
+        self._index = 0
+
+    def prepare(self):
+        self._index = 0
+
+    def capture(self):
+        if self._index >= self._num_frames:
+            raise EndOfVideoError('Synthetic video ends')
+        blob = Blob()
+        blob.feed_unchecked('image', self._clip[self._index % len(self._clip)])
+        blob.feed_unchecked('timestamp', np.array(time.time()))
+        self._index += 1
+        return blob
+
+    def destroy(self):
+        pass
+
+
+class _MotionGateModule(IModule):
+    """Module that detects motion by the difference of consecutive gray
+    images, and feeds a "motion" tensor."""
+
+    def __init__(self, threshold=25, min_ratio=0.001):
+        self._threshold = threshold
+        self._min_ratio = min_ratio
+        self._last_image = None
+
+    def prepare(self):
+        self._last_image = None
+
+    def execute(self, blobs):
+        for blob in blobs:
+            gray_image = blob.fetch('gray_image')
+            moving = False
+            if not self._last_image is None:
+                diff = cv2.absdiff(gray_image, self._last_image)
+                _, mask = cv2.threshold(diff, self._threshold, 255,
+                                        cv2.THRESH_BINARY)
+                moving = cv2.countNonZero(mask) >= \
+                         self._min_ratio * mask.size
+            self._last_image = gray_image
+            blob.feed('motion', np.array(moving))
+        return blobs
+
+    def destroy(self):
+        pass
+
+
+class _StubDetectorModule(IModule):
+    """Module that simulates a detector with a fixed cost per batch with
+    motion, and feeds a "boxes" tensor."""
+
+    def __init__(self, detect_ms):
+        self._detect_sec = detect_ms / 1000.0
+        self._boxes = np.zeros((0, 4), dtype=np.float32)
+
+    def prepare(self):
+        pass
+
+    def execute(self, blobs):
+        if any(bool(blob.fetch('motion')) for blob in blobs):
+            time.sleep(self._detect_sec)
+        for blob in blobs:
+            blob.feed('boxes', self._boxes)
+        return blobs
+
+    def destroy(self):
+        pass
+
+
+def _gen_modules(chain, detect_ms):
+    """Generate the modules of a reference chain."""
+    if chain == 'grayscale':
+        return [GrayscaleModule()]
+    elif chain == 'detect':
+        return [GrayscaleModule(),
+                _MotionGateModule(),
+                _StubDetectorModule(detect_ms)]
+    raise ValueError('Unsupported chain: {}'.format(chain))
+
+
+def run_case(case):
+    """Run a benchmark case.
+
+    Args:
+      case (dict): The case, which contains "chain", "width", "height",
+        "density", "frames", "batch_size", "queue_size" and "detect_ms".
+
+    Returns:
+      dict: The case with the benchmark result, which contains "fps",
+        "latency_p50_ms", "latency_p99_ms", "peak_rss_mb" and "breakdown".
+    """
+    clip = gen_clip(case['width'], case['height'], case['density'])
+    pipeline = Pipeline(cap_interval=0,
+                        batch_size=case['batch_size'],
+                        scheduler=Pipeline.SCHEDULER_EVENT,
+                        queue_size=case['queue_size'],
+                        overflow_policy=FrameQueue.POLICY_BLOCK,
+                        drain_on_end=True)
+    pipeline.source(_SyntheticVideoCapturer(clip, case['frames']))
+    for module in _gen_modules(case['chain'], case['detect_ms']):
+        pipeline.pipe(module)
+
+    start = time.monotonic()
+    pipeline.start()
+    pipeline.await_termination()
+    elapsed = time.monotonic() - start
+
+    snapshot = pipeline.metrics_snapshot()
+    result = dict(case)
+    result.update({
+        'elapsed_sec': elapsed,
+        'fps': snapshot['latency']['count'] / elapsed,
+        'latency_p50_ms': snapshot['latency']['p50'],
+        'latency_p99_ms': snapshot['latency']['p99'],
+        # The maximum resident set size is in kilobytes on Linux.
+        'peak_rss_mb': resource.getrusage(
+            resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+        'breakdown': snapshot['breakdown'],
+    })
+    return result
+
+
+def _parse_resolution(resolution):
+    """Parse a resolution string such as "640x480" to (width, height)."""
+    width, height = resolution.lower().split('x')
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--resolutions', default='320x240,640x480,1280x720',
+                        help='comma separated resolutions to run')
+    parser.add_argument('--densities', default='0,0.05,0.25',
+                        help='comma separated motion densities to run')
+    parser.add_argument('--chains', default=','.join(CHAINS),
+                        help='comma separated module chains to run, from '
+                             '{}'.format(', '.join(CHAINS)))
+    parser.add_argument('--frames', type=int, default=300,
+                        help='number of frames per case')
+    parser.add_argument('--batch_size', type=int, default=1,
+                        help='size of batch')
+    parser.add_argument('--queue_size', type=int, default=8,
+                        help='size of the frame queue')
+    parser.add_argument('--detect_ms', type=float, default=20.0,
+                        help='simulated detector cost in milliseconds')
+    parser.add_argument('--output', default=None,
+                        help='file to write the JSON results, or stdout if '
+                             'not given')
+    args = parser.parse_args()
+
+    cases = []
+    for chain in args.chains.split(','):
+        for resolution in args.resolutions.split(','):
+            width, height = _parse_resolution(resolution)
+            for density in args.densities.split(','):
+                cases.append({
+                    'chain': chain,
+                    'width': width,
+                    'height': height,
+                    'density': float(density),
+                    'frames': args.frames,
+                    'batch_size': args.batch_size,
+                    'queue_size': args.queue_size,
+                    'detect_ms': args.detect_ms,
+                })
+
+    # Run every case in a fresh process to measure its own peak RSS.
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for case in cases:
+        with context.Pool(1) as pool:
+            results.append(pool.apply(run_case, (case,)))
+
+    report = {
+        'platform': {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'cpu_count': multiprocessing.cpu_count(),
+            'opencv': cv2.__version__,
+            'numpy': np.__version__,
+        },
+        'results': results,
+    }
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
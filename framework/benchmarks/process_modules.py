@@ -0,0 +1,104 @@
+"""Benchmark of frames per second per core of process modules.
+
+The benchmark runs a CPU-bound module on synthetic frames, either in the
+calling thread or in worker processes by `ProcessModule`, and reports the
+throughput in frames per second and frames per second per core.
+
+Usage (from the framework directory):
+
+    python3 -m benchmarks.process_modules
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import multiprocessing
+import time
+
+import cv2
+import numpy as np
+
+from jagereye.streaming.blob import Blob
+from jagereye.streaming.modules.base import IModule
+from jagereye.streaming.modules.process_modules import ProcessModule
+
+
+class _BlurModule(IModule):
+    """CPU-bound module that blurs images and computes their edges."""
+
+    def prepare(self):
+        pass
+
+    def execute(self, blobs):
+        for blob in blobs:
+            image = blob.fetch('image')
+            blurred = cv2.GaussianBlur(image, (21, 21), 0)
+            gray = cv2.cvtColor(blurred, cv2.COLOR_BGR2GRAY)
+            blob.feed('edges', cv2.Canny(gray, 50, 150))
+        return blobs
+
+    def destroy(self):
+        pass
+
+
+def _create_blobs(batch_size, height, width):
+    """Create a batch of blobs that contain random frames."""
+    blobs = []
+    for _ in range(batch_size):
+        blob = Blob()
+        blob.feed('image', np.random.randint(0, 256, (height, width, 3),
+                                             dtype=np.uint8))
+        blob.feed('timestamp', np.array(time.time()))
+        blobs.append(blob)
+    return blobs
+
+
+def _measure(module, blobs, duration):
+    """Measure the frames per second of a module."""
+    module.prepare()
+    try:
+        # Warm up.
+        module.execute(blobs)
+        count = 0
+        start = time.monotonic()
+        while time.monotonic() - start < duration:
+            module.execute(blobs)
+            count += len(blobs)
+        return count / (time.monotonic() - start)
+    finally:
+        module.destroy()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--height', type=int, default=720,
+                        help='frame height')
+    parser.add_argument('--width', type=int, default=1280,
+                        help='frame width')
+    parser.add_argument('--batch_size', type=int, default=8,
+                        help='number of frames per batch')
+    parser.add_argument('--duration', type=float, default=3.0,
+                        help='seconds per measurement')
+    parser.add_argument('--max_processes', type=int,
+                        default=multiprocessing.cpu_count(),
+                        help='maximum number of worker processes')
+    args = parser.parse_args()
+
+    cv2.setNumThreads(1)
+    blobs = _create_blobs(args.batch_size, args.height, args.width)
+
+    print('{:<14}{:>8}{:>10}{:>14}'.format('mode', 'cores', 'fps',
+                                          'fps_per_core'))
+    fps = _measure(_BlurModule(), blobs, args.duration)
+    print('{:<14}{:>8}{:>10.1f}{:>14.1f}'.format('thread', 1, fps, fps))
+    for num_processes in range(1, args.max_processes + 1):
+        module = ProcessModule(_BlurModule, num_processes=num_processes)
+        fps = _measure(module, blobs, args.duration)
+        print('{:<14}{:>8}{:>10.1f}{:>14.1f}'.format(
+            'process', num_processes, fps, fps / num_processes))
+
+
+if __name__ == '__main__':
+    main()
@@ -6,32 +6,73 @@ from __future__ import print_function
 
 # Blob
 from jagereye.streaming.blob import Blob
+from jagereye.streaming.blob import ANALYSIS_IMAGE_NAME
+from jagereye.streaming.blob import SOURCE_ID_NAME
+from jagereye.streaming.blob import get_analysis_image
+from jagereye.streaming.blob import get_source_id
 
 # Modules
 from jagereye.streaming.modules.base import IModule
 from jagereye.streaming.modules.grayscale_modules import GrayscaleModule
 from jagereye.streaming.modules.display_modules import DisplayModule
 from jagereye.streaming.modules.io_modules import ImageSaveModule
+from jagereye.streaming.modules.process_modules import ProcessModule
 
 # Capturers
 from jagereye.streaming.capturers.base import ICapturer
+from jagereye.streaming.capturers.file_capturers import ImageDirectoryCapturer
+from jagereye.streaming.capturers.file_capturers import RawFrameCapturer
+from jagereye.streaming.capturers.file_capturers import VideoReplayCapturer
+from jagereye.streaming.capturers.reconnect import ReconnectManager
+from jagereye.streaming.capturers.stream_capturers import LiveStreamCapturer
 from jagereye.streaming.capturers.stream_capturers import VideoStreamCapturer
 
+# Hooks
+from jagereye.streaming.hooks.base import IExecuteHook
+from jagereye.streaming.hooks.profile_hooks import AllocationHook
+from jagereye.streaming.hooks.profile_hooks import CpuTimeHook
+from jagereye.streaming.hooks.profile_hooks import SlowFrameHook
+
 # Pipeline
+from jagereye.streaming.capture_metrics import CaptureMetrics
+from jagereye.streaming.frame_buffer import FrameRingBuffer
+from jagereye.streaming.frame_queue import FrameQueue
+from jagereye.streaming.module_metrics import ModuleMetrics
+from jagereye.streaming.pipeline import MultiSourcePipeline
 from jagereye.streaming.pipeline import Pipeline
 
 
 __all__ = [
     # Blob
     'Blob',
+    'ANALYSIS_IMAGE_NAME',
+    'SOURCE_ID_NAME',
+    'get_analysis_image',
+    'get_source_id',
     # Modules
     'IModule',
     'GrayscaleModule',
     'DisplayModule',
     'ImageSaveModule',
+    'ProcessModule',
     # Capturers
     'ICapturer',
+    'ImageDirectoryCapturer',
+    'LiveStreamCapturer',
+    'RawFrameCapturer',
+    'ReconnectManager',
+    'VideoReplayCapturer',
     'VideoStreamCapturer',
+    # Hooks
+    'IExecuteHook',
+    'AllocationHook',
+    'CpuTimeHook',
+    'SlowFrameHook',
     # Pipeline
+    'CaptureMetrics',
+    'FrameRingBuffer',
+    'FrameQueue',
+    'ModuleMetrics',
+    'MultiSourcePipeline',
     'Pipeline'
 ]
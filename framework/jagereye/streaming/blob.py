@@ -9,17 +9,89 @@ from six import string_types
 import numpy as np
 
 
+# The name of tensor that stores the source ID of a blob.
+SOURCE_ID_NAME = 'source_id'
+# The name of tensor that stores the downscaled image for analysis.
+ANALYSIS_IMAGE_NAME = 'analysis_image'
+
+
+def _check_name(name):
+    """Check whether a tensor name is a string or not.
+
+    Args:
+      name (string): The name of the tensor.
+
+    Raises:
+      TypeError: if `name` is not a string.
+    """
+    if not isinstance(name, string_types):
+        raise TypeError('Tensor name must be a string.')
+
+
+def get_source_id(blob):
+    """Get the source ID of a blob.
+
+    The source ID is fed by `MultiSourcePipeline` to tell which capturer a
+    blob comes from. Stateful modules can use it as the key of per-source
+    states.
+
+    Args:
+      blob (`Blob`): The blob.
+
+    Returns:
+      string: The source ID, or None if the blob has no source ID.
+    """
+    if not blob.has(SOURCE_ID_NAME):
+        return None
+    return str(blob.fetch(SOURCE_ID_NAME))
+
+
+def get_analysis_image(blob):
+    """Get the image of a blob for analysis.
+
+    The analysis image is a downscaled copy of the "image" tensor fed by
+    capturers, so that analysis modules such as motion and object detection
+    run on fewer pixels while output modules keep the full resolution. Since
+    both images cover the same field of view, normalized coordinates on the
+    analysis image, such as detection boxes, are also valid on the full
+    image.
+
+    Args:
+      blob (`Blob`): The blob.
+
+    Returns:
+      numpy `ndarray`: The "analysis_image" tensor, or the "image" tensor if
+        the blob has no analysis image.
+    """
+    if blob.has(ANALYSIS_IMAGE_NAME):
+        return blob.fetch(ANALYSIS_IMAGE_NAME)
+    return blob.fetch('image')
+
+
 class Blob(object):
     """The basic data unit for streaming.
 
     Blob is the basic data unit for streaming. A blob can contain zero, one or
     more float-like tensors (that is, numpy `ndarrays` which are float-like
     types) or string tensors.
+
+    Copying a blob is copy-on-write: the copied blob and the original blob
+    share read-only views of the same tensors. A shared tensor is materialized
+    into a private copy only when it is fetched for writing (see `fetch`). A
+    tensor that is fed again simply replaces the shared view.
+
+    Blob is designed to be lean for high frame rates. It has no per-instance
+    `__dict__`, and names are only validated when a lookup misses. Trusted
+    producers can also skip the validation of feeding with `feed_unchecked`.
     """
 
+    __slots__ = ('_data', '_shared')
+
     def __init__(self):
         """Create a new `Blob`."""
         self._data = dict()
+        # The names of tensors that are shared with other blobs.
+        self._shared = set()
 
     def feed(self, name, tensor):
         """Feed a tensor into the blob.
@@ -37,8 +109,7 @@ class Blob(object):
           TypeError: if `name` is not a string or `tensor` is not a float-like
             tensor.
         """
-        if not isinstance(name, string_types):
-            raise TypeError('Tensor name must be a string.')
+        _check_name(name)
         if not isinstance(tensor, np.ndarray):
             raise TypeError('Only numpy ndarray is supported for feeding.')
         if tensor.dtype.kind not in 'biufU':
@@ -46,7 +117,28 @@ class Blob(object):
                             ' float) or string are supported for tensor.')
 
         self._data[name] = tensor
+        self._shared.discard(name)
+
+        return tensor
+
+    def feed_unchecked(self, name, tensor):
+        """Feed a tensor into the blob without validation.
+
+        It is the fast path of `feed` for trusted producers, such as
+        capturers. The caller must make sure that `name` is a string and
+        `tensor` is a supported numpy `ndarray`.
 
+        Args:
+          name (string): The name of the tensor.
+          tensor (numpy `ndarray`): A numpy `ndarray` object to fed into the
+            blob.
+
+        Returns:
+          Fed tensor (numpy `ndarray`).
+        """
+        self._data[name] = tensor
+        if self._shared:
+            self._shared.discard(name)
         return tensor
 
     def has(self, name):
@@ -61,16 +153,21 @@ class Blob(object):
         Raises:
           TypeError: if `name` is not a string.
         """
-        if not isinstance(name, string_types):
-            raise TypeError('Tensor name must be a string.')
-
-        return name in self._data
+        if name in self._data:
+            return True
+        _check_name(name)
+        return False
 
-    def fetch(self, name):
+    def fetch(self, name, writable=False):
         """Fetch a tensor from the blob.
 
         Args:
           name (string): The name of the tensor.
+          writable (bool): Fetch the tensor for writing or not. If the tensor
+            is shared with other blobs by copy-on-write, or it is read-only
+            (such as a view of a read-only memory map), it is materialized
+            into a private writable copy first. Otherwise, a shared tensor is
+            a read-only view. Defaults to False.
 
         Returns:
           Fetched tensor (numpy `ndarray`) if successful.
@@ -79,12 +176,19 @@ class Blob(object):
           TypeError: if `name` is not a string.
           RuntimeError: if the tensor does not exist in the blob.
         """
-        if not isinstance(name, string_types):
-            raise TypeError('Tensor name must be a string.')
-        if not self.has(name):
+        try:
+            tensor = self._data[name]
+        except KeyError:
+            _check_name(name)
             raise RuntimeError("Can't find tensor: {}".format(name))
 
-        return self._data[name]
+        if writable and (name in self._shared or
+                         not tensor.flags.writeable):
+            tensor = np.copy(tensor)
+            self._data[name] = tensor
+            self._shared.discard(name)
+
+        return tensor
 
     def remove(self, name):
         """Remove a tensor from the blob.
@@ -99,28 +203,46 @@ class Blob(object):
           TypeError: if `name` is not a string.
           RuntimeError: if the tensor does not exist in the blob.
         """
-        if not isinstance(name, string_types):
-            raise TypeError('Tensor name must be a string.')
-        if not self.has(name):
+        try:
+            tensor = self._data.pop(name)
+        except KeyError:
+            _check_name(name)
             raise RuntimeError("Can't find tensor: {}".format(name))
-
-        tensor = self._data[name]
-        del self._data[name]
+        self._shared.discard(name)
 
         return tensor
 
-    def copy(self):
+    def copy(self, deep=False):
         """Copy the blob to a new instance.
 
+        By default, the copy is copy-on-write and costs no tensor copying.
+        Both blobs hold read-only views of the tensors afterwards, so writing
+        a tensor requires fetching it with writable=True. Note that writing
+        an array through a reference that was obtained before copying is
+        still visible to both blobs.
+
+        Args:
+          deep (bool): Copy every tensor immediately or not. Defaults to
+            False.
+
         Returns:
           `Blob`: The copied blob.
         """
         c_blob = Blob()
 
+        if deep:
+            for name, tensor in self._data.items():
+                c_blob.feed(name, np.copy(tensor))
+            return c_blob
+
+        # pylint: disable=protected-access
         for name, tensor in self._data.items():
-            # TODO(JiaKuan Su): Currently, the tensors are copied during blob
-            # copying. Maybe we can also implement more efficient methods
-            # such as copy-on-write.
-            c_blob.feed(name, np.copy(tensor))
+            if not name in self._shared:
+                view = tensor.view()
+                view.flags.writeable = False
+                self._data[name] = view
+                self._shared.add(name)
+            c_blob._data[name] = self._data[name]
+        c_blob._shared = set(self._shared)
 
         return c_blob
@@ -9,6 +9,10 @@ import pytest
 
 from jagereye.util.test_util import create_blob
 from jagereye.streaming.blob import Blob
+from jagereye.streaming.blob import SOURCE_ID_NAME
+from jagereye.streaming.blob import ANALYSIS_IMAGE_NAME
+from jagereye.streaming.blob import get_analysis_image
+from jagereye.streaming.blob import get_source_id
 
 
 class TestBlob(object):
@@ -50,6 +54,24 @@ class TestBlob(object):
             np.testing.assert_equal(tensor,
                                     blob.feed('string_ndarray', tensor))
 
+    def test_feed_unchecked(self):
+        blob = Blob()
+        tensor = np.random.rand(1, 2, 3)
+        assert blob.feed_unchecked('tensor', tensor) is tensor
+        assert blob.fetch('tensor') is tensor
+
+    def test_feed_unchecked_replaces_shared_tensor(self):
+        blob = create_blob('tensor', np.zeros((4, 4)))
+        c_blob = blob.copy()
+        tensor = np.ones((4, 4))
+        c_blob.feed_unchecked('tensor', tensor)
+        assert c_blob.fetch('tensor', writable=True) is tensor
+
+    def test_no_instance_dict(self):
+        blob = Blob()
+        with pytest.raises(AttributeError):
+            blob.extra = 1
+
     def test_has_with_non_string_name(self):
         blob = create_blob()
         with pytest.raises(TypeError):
@@ -78,6 +100,16 @@ class TestBlob(object):
         blob = create_blob('existing', tensor)
         np.testing.assert_equal(tensor, blob.fetch('existing'))
 
+    def test_fetch_writable_read_only_tensor(self):
+        tensor = np.zeros((2, 3))
+        tensor.setflags(write=False)
+        blob = create_blob('read_only', tensor)
+        assert blob.fetch('read_only') is tensor
+        writable = blob.fetch('read_only', writable=True)
+        assert not writable is tensor
+        writable += 1
+        np.testing.assert_equal(tensor, np.zeros((2, 3)))
+
     def test_remove_with_non_string_name(self):
         blob = create_blob()
         with pytest.raises(TypeError):
@@ -113,3 +145,60 @@ class TestBlob(object):
                                 c_blob.fetch('tensor_i'))
         np.testing.assert_equal(blob.fetch('tensor_b'),
                                 c_blob.fetch('tensor_b'))
+
+    def test_copy_shares_read_only_tensors(self):
+        tensor = np.zeros((4, 4))
+        blob = create_blob('tensor', tensor)
+        c_blob = blob.copy()
+        for b in [blob, c_blob]:
+            assert np.shares_memory(b.fetch('tensor'), tensor)
+            with pytest.raises(ValueError):
+                b.fetch('tensor')[0, 0] = 1.0
+
+    def test_copy_materializes_on_write(self):
+        blob = create_blob('tensor', np.zeros((4, 4)))
+        c_blob = blob.copy()
+        c_blob.fetch('tensor', writable=True)[0, 0] = 1.0
+        assert c_blob.fetch('tensor')[0, 0] == 1.0
+        assert blob.fetch('tensor')[0, 0] == 0.0
+        blob.fetch('tensor', writable=True)[0, 0] = 2.0
+        assert c_blob.fetch('tensor')[0, 0] == 1.0
+        assert not np.shares_memory(blob.fetch('tensor'),
+                                    c_blob.fetch('tensor'))
+
+    def test_copy_then_feed(self):
+        blob = create_blob('tensor', np.zeros((4, 4)))
+        c_blob = blob.copy()
+        tensor = np.ones((4, 4))
+        c_blob.feed('tensor', tensor)
+        assert c_blob.fetch('tensor', writable=True) is tensor
+        np.testing.assert_equal(blob.fetch('tensor'), np.zeros((4, 4)))
+
+    def test_copy_of_copy(self):
+        blob = create_blob('tensor', np.zeros((4, 4)))
+        c_blob = blob.copy().copy()
+        c_blob.fetch('tensor', writable=True)[0, 0] = 1.0
+        assert blob.fetch('tensor')[0, 0] == 0.0
+
+    def test_deep_copy(self):
+        tensor = np.zeros((4, 4))
+        blob = create_blob('tensor', tensor)
+        c_blob = blob.copy(deep=True)
+        assert not np.shares_memory(c_blob.fetch('tensor'), tensor)
+        c_blob.fetch('tensor')[0, 0] = 1.0
+        assert tensor[0, 0] == 0.0
+
+
+def test_get_source_id():
+    assert get_source_id(create_blob()) is None
+    blob = create_blob(SOURCE_ID_NAME, np.array('cam'))
+    assert get_source_id(blob) == 'cam'
+
+
+def test_get_analysis_image():
+    image = np.zeros((4, 6, 3), dtype=np.uint8)
+    blob = create_blob('image', image)
+    assert get_analysis_image(blob) is image
+    analysis_image = np.zeros((2, 3, 3), dtype=np.uint8)
+    blob.feed(ANALYSIS_IMAGE_NAME, analysis_image)
+    assert get_analysis_image(blob) is analysis_image
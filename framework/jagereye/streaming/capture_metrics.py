@@ -0,0 +1,140 @@
+"""Metrics of capturing."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from jagereye.util.metrics import Histogram
+from jagereye.util.metrics import RateMeter
+from jagereye.util.metrics import exponential_bounds
+
+
+class CaptureMetrics(object):
+    """The metrics of capturing from a source.
+
+    The metrics include:
+    1. The latency histogram (in milliseconds) to capture a frame, such as
+       the decoding time.
+    2. The jitter histogram (in milliseconds), which is the absolute
+       difference between the actual and the expected spacing of consecutive
+       captures.
+    3. The effective FPS, which is the rate of captured frames.
+    4. The dropped FPS, which is the rate of frames that are read but not
+       processed, such as frames dropped by a full queue.
+    5. The number of retries due to disconnection.
+    """
+
+    def __init__(self, window=5.0):
+        """Create a new `CaptureMetrics`.
+
+        Args:
+          window (float): The length (in seconds) of the sliding window to
+            measure the FPS. Defaults to 5.0.
+        """
+        # From 0.1 ms to about 3.3 s.
+        self._latency_histogram = Histogram(exponential_bounds(0.1, 2, 16))
+        self._jitter_histogram = Histogram(exponential_bounds(0.1, 2, 16))
+        self._captured_meter = RateMeter(window)
+        self._dropped_meter = RateMeter(window)
+        self._retry_meter = RateMeter(window)
+
+    @property
+    def latency_histogram(self):
+        """`Histogram`: The latency (in milliseconds) to capture a frame."""
+        return self._latency_histogram
+
+    @property
+    def jitter_histogram(self):
+        """`Histogram`: The jitter (in milliseconds) of capture spacing."""
+        return self._jitter_histogram
+
+    @property
+    def captured_count(self):
+        """int: The number of captured frames."""
+        return self._captured_meter.count
+
+    @property
+    def dropped_count(self):
+        """int: The number of dropped frames."""
+        return self._dropped_meter.count
+
+    @property
+    def retry_count(self):
+        """int: The number of retries."""
+        return self._retry_meter.count
+
+    def effective_fps(self):
+        """Measure the rate of captured frames.
+
+        Returns:
+          float: The captured frames per second.
+        """
+        return self._captured_meter.rate()
+
+    def dropped_fps(self):
+        """Measure the rate of dropped frames.
+
+        Returns:
+          float: The dropped frames per second.
+        """
+        return self._dropped_meter.rate()
+
+    def observe_latency(self, latency):
+        """Observe the latency to capture a frame.
+
+        Args:
+          latency (float): The latency (in milliseconds).
+        """
+        self._latency_histogram.observe(latency)
+
+    def observe_spacing(self, spacing, expected):
+        """Observe the spacing of two consecutive captures.
+
+        Args:
+          spacing (float): The actual spacing (in milliseconds).
+          expected (float): The expected spacing (in milliseconds).
+        """
+        self._jitter_histogram.observe(abs(spacing - expected))
+
+    def mark_captured(self, n=1):
+        """Mark captured frames.
+
+        Args:
+          n (int): The number of frames. Defaults to 1.
+        """
+        self._captured_meter.mark(n)
+
+    def mark_dropped(self, n=1):
+        """Mark dropped frames.
+
+        Args:
+          n (int): The number of frames. Defaults to 1.
+        """
+        self._dropped_meter.mark(n)
+
+    def mark_retry(self):
+        """Mark a retry."""
+        self._retry_meter.mark()
+
+    def snapshot(self):
+        """Take a snapshot of the metrics.
+
+        Returns:
+          dict: The snapshot, which contains:
+            latency (dict): The snapshot of the latency histogram.
+            jitter (dict): The snapshot of the jitter histogram.
+            captured (int): The number of captured frames.
+            dropped (int): The number of dropped frames.
+            retries (int): The number of retries.
+            effective_fps (float): The captured frames per second.
+            dropped_fps (float): The dropped frames per second.
+        """
+        return {
+            'latency': self._latency_histogram.snapshot(),
+            'jitter': self._jitter_histogram.snapshot(),
+            'captured': self.captured_count,
+            'dropped': self.dropped_count,
+            'retries': self.retry_count,
+            'effective_fps': self.effective_fps(),
+            'dropped_fps': self.dropped_fps(),
+        }
@@ -0,0 +1,31 @@
+"""Tests for capture metrics."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from jagereye.streaming.capture_metrics import CaptureMetrics
+
+
+class TestCaptureMetrics(object):
+    """Tests for CaptureMetrics class."""
+
+    def test_snapshot(self):
+        metrics = CaptureMetrics()
+        metrics.observe_latency(2.0)
+        metrics.observe_spacing(55.0, 50.0)
+        metrics.observe_spacing(48.0, 50.0)
+        metrics.mark_captured(3)
+        metrics.mark_dropped()
+        metrics.mark_retry()
+
+        snapshot = metrics.snapshot()
+        assert snapshot['latency']['count'] == 1
+        assert snapshot['latency']['max'] == 2.0
+        assert snapshot['jitter']['count'] == 2
+        assert snapshot['jitter']['sum'] == 7.0
+        assert snapshot['captured'] == 3
+        assert snapshot['dropped'] == 1
+        assert snapshot['retries'] == 1
+        assert snapshot['effective_fps'] > 0
+        assert snapshot['dropped_fps'] > 0
@@ -0,0 +1,328 @@
+"""Capturers to capture images from files."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from concurrent.futures import ThreadPoolExecutor
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+
+from jagereye.streaming.exceptions import EndOfVideoError
+from jagereye.streaming.blob import Blob
+from jagereye.streaming.capturers.base import ICapturer
+from jagereye.util.generic import now
+
+
+class VideoReplayCapturer(ICapturer):
+    """The video replay capturer.
+
+    The capturer replays a video file for offline processing and benchmarking.
+    Unlike `VideoStreamCapturer`, the timestamp of each frame is derived from
+    its position in the file instead of the wall clock, so replaying a file
+    always produces the same blobs. Each captured blob has a "image" tensor,
+    a "timestamp" tensor and a "frame_index" tensor.
+
+    The "image" tensor is a 3-dimensional numpy `ndarray` whose type is uint8
+    and the shape format is:
+    1. Image height.
+    2. Image width.
+    3. Number of channels, which is usually 3.
+
+    The "timestamp" tensor is a 0-dimensional float numpy `ndarray`, which is
+    the start timestamp plus the position (in seconds) of the frame.
+
+    The "frame_index" tensor is a 0-dimensional int numpy `ndarray`, which is
+    the index of the frame in the file.
+
+    By default, the file is read as fast as the pipeline consumes it. To
+    process every frame, run the pipeline with the "event" scheduler, a zero
+    capture interval, a bounded "block" queue and `drain_on_end`. The file can
+    also be replayed at a speed multiplier of its frame rate.
+    """
+
+    def __init__(self, src, speed=0, start_timestamp=0.0, fps=None):
+        """Create a new `VideoReplayCapturer`.
+
+        Args:
+          src (string): The video file name.
+          speed (float): The speed multiplier of the frame rate to replay. If
+            speed <= 0, the file is read as fast as possible. Defaults to 0.
+          start_timestamp (float): The timestamp of the first frame. Defaults
+            to 0.0.
+          fps (float): The frame rate of the file. If it is None, the frame
+            rate reported by the file is used. Defaults to None.
+        """
+        self._src = src
+        self._speed = speed
+        self._start_timestamp = start_timestamp
+        self._fps = fps
+        self._cap = None
+        self._frame_index = 0
+        self._start_time = None
+
+    @property
+    def src(self):
+        """string: The video file name."""
+        return self._src
+
+    @property
+    def speed(self):
+        """float: The speed multiplier of the frame rate to replay."""
+        return self._speed
+
+    @property
+    def fps(self):
+        """float: The frame rate of the file, or None if it is not known
+        yet."""
+        return self._fps
+
+    def prepare(self):
+        """The routine of video replay capturer preparation.
+
+        Raises:
+          RuntimeError: If the video file is not opened or its frame rate is
+            unknown.
+        """
+        self._cap = cv2.VideoCapture(self._src)
+        if not self._cap.isOpened():
+            raise RuntimeError(
+                'The video file {} is not opened.'.format(self._src))
+        if self._fps is None:
+            self._fps = self._cap.get(cv2.CAP_PROP_FPS)
+        if not self._fps > 0:
+            raise RuntimeError('The frame rate of video file {} is unknown.'
+                               .format(self._src))
+        self._frame_index = 0
+        self._start_time = None
+
+    def capture(self):
+        """The routine of video replay capturer capturation.
+
+        Returns:
+          `Blob`: The blob which contains "image", "timestamp" and
+            "frame_index" tensor.
+
+        Raises:
+          EndOfVideoError: If the video ends.
+        """
+        position = self._frame_index / self._fps
+        if self._speed > 0:
+            if self._start_time is None:
+                self._start_time = time.monotonic()
+            delay = self._start_time + position / self._speed - \
+                    time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+        success, image = self._cap.read()
+        if not success:
+            raise EndOfVideoError('Video {} ends'.format(self._src))
+
+        blob = Blob()
+        blob.feed_unchecked('image', image)
+        blob.feed_unchecked('timestamp',
+                            np.array(self._start_timestamp + position))
+        blob.feed_unchecked('frame_index', np.array(self._frame_index))
+        self._frame_index += 1
+
+        return blob
+
+    def destroy(self):
+        """The routine of video replay capturer destruction."""
+        self._cap.release()
+
+
+class ImageDirectoryCapturer(ICapturer):
+    """The image directory capturer.
+
+    The capturer reads the images in a directory in the order of file names,
+    such as pre-extracted JPEG frames for load tests and model evaluation.
+    Images are decoded ahead on a thread pool, since OpenCV releases the GIL
+    while decoding. Each captured blob has a "image" tensor, a "timestamp"
+    tensor and a "frame_index" tensor, like `VideoReplayCapturer`, but the
+    timestamp is the capture time.
+    """
+
+    def __init__(self,
+                 directory,
+                 pattern='*.jpg',
+                 num_threads=4,
+                 prefetch=8,
+                 loop=False):
+        """Create a new `ImageDirectoryCapturer`.
+
+        Args:
+          directory (string): The directory of images.
+          pattern (string): The glob pattern of image file names. Defaults to
+            "*.jpg".
+          num_threads (int): The number of decoding threads. Defaults to 4.
+          prefetch (int): The number of images to decode ahead. Defaults to 8.
+          loop (bool): Restart from the first image after the last one or not.
+            Defaults to False.
+        """
+        self._directory = directory
+        self._pattern = pattern
+        self._num_threads = num_threads
+        self._prefetch = max(1, prefetch)
+        self._loop = loop
+        self._paths = []
+        self._executor = None
+        self._futures = []
+        self._next_index = 0
+
+    @property
+    def paths(self):
+        """list of string: The paths of images in order."""
+        return self._paths
+
+    def prepare(self):
+        """The routine of image directory capturer preparation.
+
+        Raises:
+          RuntimeError: If no image is found in the directory.
+        """
+        self._paths = sorted(glob.glob(os.path.join(self._directory,
+                                                    self._pattern)))
+        if not self._paths:
+            raise RuntimeError('No image matches {} in {}.'.format(
+                self._pattern, self._directory))
+        self._executor = ThreadPoolExecutor(max_workers=self._num_threads)
+        self._next_index = 0
+        self._futures = []
+        for _ in range(self._prefetch):
+            self._submit()
+
+    def capture(self):
+        """The routine of image directory capturer capturation.
+
+        Returns:
+          `Blob`: The blob which contains "image", "timestamp" and
+            "frame_index" tensor.
+
+        Raises:
+          EndOfVideoError: If all images are captured.
+          RuntimeError: If an image can't be decoded.
+        """
+        if not self._futures:
+            raise EndOfVideoError('Images in {} end'.format(self._directory))
+        index, future = self._futures.pop(0)
+        self._submit()
+
+        image = future.result()
+        if image is None:
+            raise RuntimeError('Fail to decode image {}'.format(
+                self._paths[index]))
+
+        blob = Blob()
+        blob.feed_unchecked('image', image)
+        blob.feed_unchecked('timestamp', np.array(now()))
+        blob.feed_unchecked('frame_index', np.array(index))
+
+        return blob
+
+    def _submit(self):
+        """Submit the next image to decode."""
+        if self._next_index >= len(self._paths):
+            if not self._loop:
+                return
+            self._next_index = 0
+        index = self._next_index
+        future = self._executor.submit(cv2.imread, self._paths[index])
+        self._futures.append((index, future))
+        self._next_index += 1
+
+    def destroy(self):
+        """The routine of image directory capturer destruction."""
+        if not self._executor is None:
+            for _, future in self._futures:
+                future.cancel()
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self._futures = []
+
+
+class RawFrameCapturer(ICapturer):
+    """The raw frame capturer.
+
+    The capturer reads a file of raw frames, which are uint8 records of the
+    same shape (such as height x width x 3 BGR images) stored back to back.
+    The file is memory-mapped read-only, and each captured "image" tensor is a
+    zero-copy view of a record, so capturing costs no decoding nor copying.
+    It is useful to benchmark modules without the decoding cost. Modules that
+    modify the image in place must fetch it by `Blob.fetch` with
+    `writable=True`, which makes a private copy of the read-only view.
+
+    Each captured blob has a "image" tensor, a "timestamp" tensor and a
+    "frame_index" tensor, like `ImageDirectoryCapturer`.
+    """
+
+    def __init__(self, path, shape, loop=False):
+        """Create a new `RawFrameCapturer`.
+
+        Args:
+          path (string): The path of the raw frame file.
+          shape (tuple): The shape of a frame, such as (height, width, 3).
+          loop (bool): Restart from the first frame after the last one or not.
+            Defaults to False.
+        """
+        self._path = path
+        self._shape = tuple(shape)
+        self._loop = loop
+        self._frames = None
+        self._index = 0
+
+    @property
+    def num_frames(self):
+        """int: The number of frames in the file, or 0 if it is not mapped
+        yet."""
+        return 0 if self._frames is None else self._frames.shape[0]
+
+    def prepare(self):
+        """The routine of raw frame capturer preparation to map the file.
+
+        Raises:
+          RuntimeError: If the file contains no complete frame.
+        """
+        frame_size = int(np.prod(self._shape))
+        num_frames = os.path.getsize(self._path) // frame_size
+        if num_frames <= 0:
+            raise RuntimeError('No complete frame in {}.'.format(self._path))
+        self._frames = np.memmap(self._path,
+                                 dtype=np.uint8,
+                                 mode='r',
+                                 shape=(num_frames,) + self._shape)
+        self._index = 0
+
+    def capture(self):
+        """The routine of raw frame capturer capturation.
+
+        Returns:
+          `Blob`: The blob which contains "image", "timestamp" and
+            "frame_index" tensor.
+
+        Raises:
+          EndOfVideoError: If all frames are captured.
+        """
+        if self._index >= self._frames.shape[0]:
+            if not self._loop:
+                raise EndOfVideoError('Frames in {} end'.format(self._path))
+            self._index = 0
+        index = self._index
+        self._index += 1
+
+        blob = Blob()
+        blob.feed_unchecked('image', self._frames[index])
+        blob.feed_unchecked('timestamp', np.array(now()))
+        blob.feed_unchecked('frame_index', np.array(index))
+
+        return blob
+
+    def destroy(self):
+        """The routine of raw frame capturer destruction."""
+        # The mapping is closed when all views are garbage collected.
+        self._frames = None
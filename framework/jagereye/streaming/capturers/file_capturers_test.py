@@ -0,0 +1,168 @@
+"""Tests for file capturers."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from jagereye.streaming.capturers.file_capturers import ImageDirectoryCapturer
+from jagereye.streaming.capturers.file_capturers import RawFrameCapturer
+from jagereye.streaming.capturers.file_capturers import VideoReplayCapturer
+from jagereye.streaming.exceptions import EndOfVideoError
+from jagereye.streaming.modules.base import IModule
+from jagereye.streaming.pipeline import Pipeline
+from jagereye.util.test_util import create_image_full
+
+
+class _IndexModule(IModule):
+    """Module to record the frame indexes and timestamps."""
+
+    def __init__(self):
+        self.records = []
+
+    def prepare(self):
+        pass
+
+    def execute(self, blobs):
+        for blob in blobs:
+            self.records.append((int(blob.fetch('frame_index')),
+                                 float(blob.fetch('timestamp'))))
+        return blobs
+
+    def destroy(self):
+        pass
+
+
+def _replay(capturer):
+    """Capture all frames from a capturer."""
+    blobs = []
+    capturer.prepare()
+    with pytest.raises(EndOfVideoError):
+        while True:
+            blobs.append(capturer.capture())
+    capturer.destroy()
+    return blobs
+
+
+class TestVideoReplayCapturer(object):
+    """Tests for VideoReplayCapturer class."""
+
+    def test_prepare_non_existing_video(self):
+        capturer = VideoReplayCapturer('non_existing.mp4')
+        with pytest.raises(RuntimeError):
+            capturer.prepare()
+
+    def test_execute_deterministic_timestamps(self):
+        # The video has 75 frames at 25 FPS.
+        src = os.path.join(os.getcwd(), 'testdata/hamster.mp4')
+        blobs = _replay(VideoReplayCapturer(src, start_timestamp=100.0))
+        assert len(blobs) == 75
+        for i, blob in enumerate(blobs):
+            assert int(blob.fetch('frame_index')) == i
+            assert float(blob.fetch('timestamp')) == pytest.approx(100 + i / 25)
+        assert blobs[0].fetch('image').shape == (240, 320, 3)
+
+    def test_execute_with_speed(self):
+        src = os.path.join(os.getcwd(), 'testdata/hamster.mp4')
+        start = time.monotonic()
+        blobs = _replay(VideoReplayCapturer(src, speed=10))
+        # 74 frame intervals at 250 FPS.
+        assert time.monotonic() - start >= 74 / 250.0
+        assert float(blobs[-1].fetch('timestamp')) == pytest.approx(74 / 25)
+
+    def test_execute_in_pipeline(self):
+        src = os.path.join(os.getcwd(), 'testdata/hamster.mp4')
+        index_module = _IndexModule()
+        pipeline = Pipeline(cap_interval=0,
+                            batch_size=4,
+                            scheduler=Pipeline.SCHEDULER_EVENT,
+                            queue_size=8,
+                            drain_on_end=True)
+        pipeline.source(VideoReplayCapturer(src)).pipe(index_module)
+        pipeline.start()
+        pipeline.await_termination()
+        assert [index for index, _ in index_module.records] == list(range(75))
+
+
+class TestImageDirectoryCapturer(object):
+    """Tests for ImageDirectoryCapturer class."""
+
+    def test_prepare_empty_directory(self, tmpdir):
+        capturer = ImageDirectoryCapturer(str(tmpdir))
+        with pytest.raises(RuntimeError):
+            capturer.prepare()
+
+    def test_execute(self, tmpdir):
+        for i in range(12):
+            # PNG is lossless, so the decoded images are exact.
+            cv2.imwrite(str(tmpdir.join('{:03d}.png'.format(i))),
+                        create_image_full([i, i, i]))
+        blobs = _replay(ImageDirectoryCapturer(str(tmpdir),
+                                               pattern='*.png',
+                                               num_threads=3,
+                                               prefetch=4))
+        assert len(blobs) == 12
+        for i, blob in enumerate(blobs):
+            assert int(blob.fetch('frame_index')) == i
+            np.testing.assert_equal(blob.fetch('image'),
+                                    create_image_full([i, i, i]))
+
+    def test_execute_with_loop(self, tmpdir):
+        for i in range(3):
+            cv2.imwrite(str(tmpdir.join('{}.png'.format(i))),
+                        create_image_full([i, i, i]))
+        capturer = ImageDirectoryCapturer(str(tmpdir), pattern='*.png',
+                                          loop=True)
+        capturer.prepare()
+        indexes = [int(capturer.capture().fetch('frame_index'))
+                   for _ in range(7)]
+        assert indexes == [0, 1, 2, 0, 1, 2, 0]
+        capturer.destroy()
+
+
+class TestRawFrameCapturer(object):
+    """Tests for RawFrameCapturer class."""
+
+    def test_prepare_empty_file(self, tmpdir):
+        path = tmpdir.join('empty.raw')
+        path.write('')
+        capturer = RawFrameCapturer(str(path), (100, 100, 3))
+        with pytest.raises(RuntimeError):
+            capturer.prepare()
+
+    def test_execute(self, tmpdir):
+        path = str(tmpdir.join('frames.raw'))
+        frames = np.stack([create_image_full([i, i, i]) for i in range(5)])
+        frames.tofile(path)
+        capturer = RawFrameCapturer(path, (100, 100, 3))
+        blobs = _replay(capturer)
+        assert len(blobs) == 5
+        for i, blob in enumerate(blobs):
+            assert int(blob.fetch('frame_index')) == i
+            image = blob.fetch('image')
+            np.testing.assert_equal(image, frames[i])
+            # The image is a read-only view of the mapped file.
+            assert isinstance(image.base, np.memmap) or \
+                   isinstance(image, np.memmap)
+            assert not image.flags.writeable
+            # Writable fetching makes a private copy.
+            writable = blob.fetch('image', writable=True)
+            writable += 1
+            np.testing.assert_equal(image, frames[i])
+
+    def test_execute_with_loop(self, tmpdir):
+        path = str(tmpdir.join('frames.raw'))
+        np.zeros((2, 4, 4, 3), dtype=np.uint8).tofile(path)
+        capturer = RawFrameCapturer(path, (4, 4, 3), loop=True)
+        capturer.prepare()
+        assert capturer.num_frames == 2
+        indexes = [int(capturer.capture().fetch('frame_index'))
+                   for _ in range(5)]
+        assert indexes == [0, 1, 0, 1, 0]
+        capturer.destroy()
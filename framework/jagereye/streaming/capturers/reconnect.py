@@ -0,0 +1,328 @@
+"""Background reconnection of capturers."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import heapq
+import itertools
+import random
+import threading
+import time
+
+from jagereye.util import logging
+
+
+class _Request(object):
+    """Inner class for a reconnecting request."""
+
+    def __init__(self, key, open_fn, on_open, on_discard, timeout):
+        self.key = key
+        self.open_fn = open_fn
+        self.on_open = on_open
+        self.on_discard = on_discard
+        self.timeout = timeout
+        self.submit_time = time.monotonic()
+        self.attempts = 0
+        self.cancelled = False
+
+
+class _Attempt(object):
+    """Inner class for an open attempt with a time limit."""
+
+    def __init__(self, request):
+        self.request = request
+        self.done = threading.Event()
+        self.abandoned = False
+        self.resource = None
+
+
+class ReconnectManager(object):
+    """The background reconnect manager.
+
+    The manager reconnects sources on a few background threads, so a
+    disconnected source does not block the thread that captures from it. Each
+    request is retried with exponential backoff and jitter until it succeeds
+    or is cancelled, and the number of concurrent open attempts is capped by
+    the number of threads. The threads are started lazily and shared by all
+    requests.
+
+    An open attempt can be given a time limit. An attempt that exceeds it,
+    such as opening a hanging camera, is abandoned: its thread slot is freed
+    for other requests, and the request is not retried until the abandoned
+    attempt returns. If it returns an opened resource late, the request
+    still succeeds with it.
+
+    The manager records the number of reconnections, open attempts and
+    failures, and the total time spent reconnecting.
+    """
+
+    def __init__(self,
+                 max_concurrent_opens=2,
+                 initial_backoff=1.0,
+                 max_backoff=60.0,
+                 jitter=0.5,
+                 open_timeout=None):
+        """Create a new `ReconnectManager`.
+
+        Args:
+          max_concurrent_opens (int): The maximum number of concurrent open
+            attempts. Defaults to 2.
+          initial_backoff (float): The delay (in seconds) before the second
+            attempt. The delay doubles after each failed attempt. Defaults to
+            1.0.
+          max_backoff (float): The maximum delay (in seconds) between attempts.
+            Defaults to 60.0.
+          jitter (float): The fraction of the delay to randomize, range from 0
+            to 1. A delay d is drawn from [d * (1 - jitter), d]. Defaults to
+            0.5.
+          open_timeout (float): The default time limit (in seconds) of an
+            open attempt. If it is None, attempts have no time limit.
+            Defaults to None.
+
+        Raises:
+          ValueError: if max_concurrent_opens < 1 or jitter is not in [0, 1].
+        """
+        if max_concurrent_opens < 1:
+            raise ValueError('Maximum concurrent opens must be at least 1.')
+        if jitter < 0 or jitter > 1:
+            raise ValueError('Jitter must be in [0, 1].')
+        self._max_concurrent_opens = max_concurrent_opens
+        self._initial_backoff = initial_backoff
+        self._max_backoff = max_backoff
+        self._jitter = jitter
+        self._open_timeout = open_timeout
+        self._cond = threading.Condition()
+        self._heap = []
+        self._sequence = itertools.count()
+        self._requests = dict()
+        self._threads = []
+        self._opening_count = 0
+        self._reconnect_count = 0
+        self._attempt_count = 0
+        self._failure_count = 0
+        self._timeout_count = 0
+        self._reconnect_time = 0.0
+
+    @property
+    def max_concurrent_opens(self):
+        """int: The maximum number of concurrent open attempts."""
+        return self._max_concurrent_opens
+
+    @property
+    def stats(self):
+        """dict: The statistics of reconnection, which contains:
+            pending (int): The number of pending requests.
+            opening (int): The number of ongoing open attempts.
+            reconnects (int): The number of succeeded reconnections.
+            attempts (int): The number of open attempts.
+            failures (int): The number of failed open attempts.
+            timeouts (int): The number of open attempts abandoned for
+              exceeding the time limit.
+            reconnect_time (float): The total time (in seconds) from
+              submitting to succeeding of succeeded reconnections.
+        """
+        with self._cond:
+            return {
+                'pending': len(self._requests),
+                'opening': self._opening_count,
+                'reconnects': self._reconnect_count,
+                'attempts': self._attempt_count,
+                'failures': self._failure_count,
+                'timeouts': self._timeout_count,
+                'reconnect_time': self._reconnect_time,
+            }
+
+    def submit(self, key, open_fn, on_open, on_discard=None, timeout=None):
+        """Submit a request to reconnect in background.
+
+        Args:
+          key (object): The hashable key of the request, such as the capturer.
+          open_fn (function): The function to open the source. It returns the
+            opened resource, or None if it fails.
+          on_open (function): The callback with the opened resource when the
+            request succeeds.
+          on_discard (function): The callback with the opened resource when
+            the request is cancelled during its last attempt. Defaults to None.
+          timeout (float): The time limit (in seconds) of an open attempt. If
+            it is None, the default time limit of the manager is used.
+            Defaults to None.
+
+        Returns:
+          bool: True if the request is submitted, False if a request with the
+            same key is already pending.
+        """
+        with self._cond:
+            if key in self._requests:
+                return False
+            if timeout is None:
+                timeout = self._open_timeout
+            request = _Request(key, open_fn, on_open, on_discard, timeout)
+            self._requests[key] = request
+            self._schedule(request, 0)
+            if len(self._threads) < self._max_concurrent_opens:
+                thread = threading.Thread(target=self._run)
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+            return True
+
+    def cancel(self, key):
+        """Cancel a pending request.
+
+        Args:
+          key (object): The key of the request.
+        """
+        with self._cond:
+            request = self._requests.pop(key, None)
+            if not request is None:
+                request.cancelled = True
+
+    def is_pending(self, key):
+        """Check whether a request is pending or not.
+
+        Args:
+          key (object): The key of the request.
+
+        Returns:
+          bool: True if the request is pending, False otherwise.
+        """
+        with self._cond:
+            return key in self._requests
+
+    def _backoff(self, attempts):
+        """Compute the delay before the next attempt.
+
+        Args:
+          attempts (int): The number of failed attempts.
+
+        Returns:
+          float: The delay (in seconds).
+        """
+        delay = min(self._max_backoff,
+                    self._initial_backoff * (2 ** (attempts - 1)))
+        return delay * (1 - self._jitter * random.random())
+
+    def _schedule(self, request, delay):
+        """Schedule the next attempt of a request, with the lock held."""
+        heapq.heappush(self._heap, (time.monotonic() + delay,
+                                    next(self._sequence),
+                                    request))
+        self._cond.notify()
+
+    def _next_request(self):
+        """Wait for the next due request, with the lock held."""
+        while True:
+            while self._heap and self._heap[0][2].cancelled:
+                heapq.heappop(self._heap)
+            if not self._heap:
+                self._cond.wait()
+                continue
+            due_time = self._heap[0][0]
+            delay = due_time - time.monotonic()
+            if delay > 0:
+                self._cond.wait(delay)
+                continue
+            return heapq.heappop(self._heap)[2]
+
+    def _run(self):
+        """The worker function of reconnecting threads."""
+        while True:
+            with self._cond:
+                request = self._next_request()
+                self._opening_count += 1
+                self._attempt_count += 1
+            request.attempts += 1
+
+            if request.timeout is None:
+                resource = self._open(request)
+            else:
+                attempt = _Attempt(request)
+                thread = threading.Thread(target=self._run_attempt,
+                                          args=(attempt,))
+                thread.daemon = True
+                thread.start()
+                attempt.done.wait(request.timeout)
+                with self._cond:
+                    if not attempt.done.is_set():
+                        # Free the slot, the attempt is finished by its own
+                        # thread when it returns.
+                        attempt.abandoned = True
+                        self._opening_count -= 1
+                        self._timeout_count += 1
+                resource = attempt.resource
+                if attempt.abandoned:
+                    logging.warn('Opening {} exceeds {}s, abandon it'
+                                 .format(request.key, request.timeout))
+                    continue
+
+            with self._cond:
+                self._opening_count -= 1
+            self._finish(request, resource)
+
+    def _run_attempt(self, attempt):
+        """The worker function of an open attempt with a time limit."""
+        resource = self._open(attempt.request)
+        with self._cond:
+            attempt.resource = resource
+            attempt.done.set()
+            abandoned = attempt.abandoned
+        if abandoned:
+            self._finish(attempt.request, resource)
+
+    @staticmethod
+    def _open(request):
+        """Open the source of a request.
+
+        Returns:
+          object: The opened resource, or None if it fails.
+        """
+        try:
+            return request.open_fn()
+        except Exception as e: # pylint: disable=broad-except
+            logging.warn('Fail to reconnect {}: {}'.format(request.key, e))
+            return None
+
+    def _finish(self, request, resource):
+        """Finish an open attempt of a request.
+
+        Args:
+          request (`_Request`): The request.
+          resource (object): The opened resource, or None if it fails.
+        """
+        with self._cond:
+            if resource is None:
+                self._failure_count += 1
+                if not request.cancelled:
+                    self._schedule(request, self._backoff(request.attempts))
+                return
+            if request.cancelled:
+                discard = True
+            else:
+                discard = False
+                del self._requests[request.key]
+                self._reconnect_count += 1
+                self._reconnect_time += time.monotonic() - request.submit_time
+
+        if discard:
+            if not request.on_discard is None:
+                request.on_discard(resource)
+        else:
+            request.on_open(resource)
+
+
+_default_manager = None
+_default_manager_lock = threading.Lock()
+
+
+def get_default_reconnect_manager():
+    """Get the default reconnect manager shared by capturers.
+
+    Returns:
+      `ReconnectManager`: The default reconnect manager.
+    """
+    global _default_manager # pylint: disable=global-statement
+    with _default_manager_lock:
+        if _default_manager is None:
+            _default_manager = ReconnectManager()
+        return _default_manager
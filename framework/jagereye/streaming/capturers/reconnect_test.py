@@ -0,0 +1,136 @@
+"""Tests for reconnect manager."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import threading
+import time
+
+import pytest
+
+from jagereye.streaming.capturers.reconnect import ReconnectManager
+
+
+def _wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return predicate()
+
+
+class TestReconnectManager(object):
+    """Tests for ReconnectManager class."""
+
+    def test_create_invalid(self):
+        with pytest.raises(ValueError):
+            ReconnectManager(max_concurrent_opens=0)
+        with pytest.raises(ValueError):
+            ReconnectManager(jitter=2)
+
+    def test_reconnect_after_failures(self):
+        manager = ReconnectManager(initial_backoff=0.01, max_backoff=0.02)
+        attempts = []
+        opened = []
+
+        def open_fn():
+            attempts.append(time.monotonic())
+            return 'resource' if len(attempts) >= 3 else None
+
+        assert manager.submit('cam', open_fn, opened.append)
+        # A duplicate request is ignored.
+        assert not manager.submit('cam', open_fn, opened.append)
+        assert _wait_for(lambda: opened == ['resource'])
+        assert not manager.is_pending('cam')
+        stats = manager.stats
+        assert stats['reconnects'] == 1
+        assert stats['attempts'] == 3
+        assert stats['failures'] == 2
+        assert stats['reconnect_time'] > 0
+        # The attempts are delayed by backoff.
+        assert attempts[1] - attempts[0] >= 0.004
+
+    def test_backoff(self):
+        # pylint: disable=protected-access
+        manager = ReconnectManager(initial_backoff=1, max_backoff=8, jitter=0)
+        assert [manager._backoff(i) for i in range(1, 6)] == [1, 2, 4, 8, 8]
+        manager = ReconnectManager(initial_backoff=1, max_backoff=8, jitter=0.5)
+        for _ in range(100):
+            assert 2 <= manager._backoff(3) <= 4
+
+    def test_max_concurrent_opens(self):
+        manager = ReconnectManager(max_concurrent_opens=2)
+        lock = threading.Lock()
+        counts = {'current': 0, 'max': 0}
+        opened = []
+
+        def open_fn():
+            with lock:
+                counts['current'] += 1
+                counts['max'] = max(counts['max'], counts['current'])
+            time.sleep(0.02)
+            with lock:
+                counts['current'] -= 1
+            return 'resource'
+
+        for i in range(6):
+            manager.submit(i, open_fn, opened.append)
+        assert _wait_for(lambda: len(opened) == 6)
+        assert counts['max'] == 2
+
+    def test_cancel(self):
+        manager = ReconnectManager(initial_backoff=0.01)
+        opened = []
+        manager.submit('cam', lambda: None, opened.append)
+        assert manager.is_pending('cam')
+        manager.cancel('cam')
+        assert not manager.is_pending('cam')
+        time.sleep(0.05)
+        assert manager.stats['attempts'] <= 2
+        assert not opened
+
+    def test_open_timeout(self):
+        manager = ReconnectManager(max_concurrent_opens=1,
+                                   initial_backoff=0.01,
+                                   open_timeout=0.05)
+        release = threading.Event()
+        opened = []
+
+        def hanging_open_fn():
+            release.wait()
+            return 'late'
+
+        manager.submit('hanging', hanging_open_fn, opened.append)
+        # The hanging attempt does not block the only slot.
+        manager.submit('cam', lambda: 'resource', opened.append)
+        assert _wait_for(lambda: opened == ['resource'])
+        stats = manager.stats
+        assert stats['timeouts'] == 1
+        assert stats['opening'] == 0
+        # The hanging request is not retried until the attempt returns, and
+        # it still succeeds with the late resource.
+        assert manager.is_pending('hanging')
+        assert manager.stats['attempts'] == 2
+        release.set()
+        assert _wait_for(lambda: opened == ['resource', 'late'])
+        assert not manager.is_pending('hanging')
+
+    def test_open_timeout_of_request(self):
+        manager = ReconnectManager(max_concurrent_opens=1)
+        release = threading.Event()
+        discarded = []
+
+        def hanging_open_fn():
+            release.wait()
+            return 'late'
+
+        manager.submit('hanging',
+                       hanging_open_fn,
+                       lambda resource: None,
+                       discarded.append,
+                       timeout=0.05)
+        assert _wait_for(lambda: manager.stats['timeouts'] == 1)
+        # The late resource of a cancelled request is discarded.
+        manager.cancel('hanging')
+        release.set()
+        assert _wait_for(lambda: discarded == ['late'])
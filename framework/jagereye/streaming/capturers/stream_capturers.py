@@ -4,6 +4,7 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import threading
 import time
 from urllib.parse import urlparse
 
@@ -12,11 +13,22 @@ import numpy as np
 
 from jagereye.streaming.exceptions import EndOfVideoError
 from jagereye.streaming.exceptions import RetryError
+from jagereye.streaming.blob import ANALYSIS_IMAGE_NAME
 from jagereye.streaming.blob import Blob
+from jagereye.streaming.capture_metrics import CaptureMetrics
 from jagereye.streaming.capturers.base import ICapturer
+from jagereye.streaming.capturers.reconnect import \
+    get_default_reconnect_manager
+from jagereye.streaming.frame_buffer import FrameRingBuffer
 from jagereye.util import logging
 from jagereye.util.generic import exec_timeout
 from jagereye.util.generic import now
+from jagereye.util.metrics import Histogram
+from jagereye.util.metrics import exponential_bounds
+
+# The maximum time (in seconds) that decimation keeps skipping lagging frames
+# of a live stream before re-anchoring the frame clock.
+_MAX_LAG_DURATION = 1.0
 
 
 class VideoStreamCapturer(ICapturer):
@@ -35,9 +47,45 @@ class VideoStreamCapturer(ICapturer):
 
     The "timestamp" tensor is a 0-dimensional numpy `ndarray` whose type is
     string.
+
+    The capturer can decode frames into a preallocated `FrameRingBuffer`, so
+    that capturing allocates no new image in steady state. In this case, the
+    "image" tensor is a view of a frame slot, and each blob is also fed a
+    0-dimensional int "frame_slot" tensor that stores the slot index. The
+    number of slots must be larger than the number of frames held by the
+    pipeline at the same time, otherwise a slot is overwritten while it is
+    still in use.
+
+    The capturer can also decimate frames. In this case, it grabs every frame
+    from the stream but only decodes the frames to keep, which are spaced by
+    the decimation interval on the frame clock. For live streams, frames that
+    lag behind the wall clock by more than the interval are skipped without
+    decoding too, so latency does not build up in the stream buffer. A frame
+    whose grabbing blocks is fresh from the stream, so the frame clock is
+    re-anchored to it, and it is also re-anchored if frames keep lagging for
+    too long. Hence a stream slower than its reported frame rate is not
+    starved.
+
+    The capturer can also feed a downscaled "analysis_image" tensor alongside
+    the full resolution "image" tensor, for analysis modules to run on fewer
+    pixels (see `get_analysis_image`).
+
+    When a live stream is disconnected, the capturer reconnects in background
+    by a `ReconnectManager` with exponential backoff, and `capture` raises
+    `RetryError` immediately until the stream is reopened, so the capturing
+    thread is never blocked by a down camera. Each open attempt is limited by
+    the retry timeout, so a hanging camera does not hold a reconnecting
+    thread.
     """
 
-    def __init__(self, src, retry_timeout=30):
+    def __init__(self,
+                 src,
+                 retry_timeout=30,
+                 num_frame_slots=0,
+                 shared_memory=False,
+                 decimate_interval=0,
+                 reconnect_manager=None,
+                 analysis_size=None):
         """Create a new `VideoStreamCapturer`.
 
         Args:
@@ -45,11 +93,48 @@ class VideoStreamCapturer(ICapturer):
             stream URL such as RTSP, Motion JPEG.
           retry_timeout (int): The limit of retry timeout (in seconds). Defaults
             to 30.
+          num_frame_slots (int): The number of slots of the frame ring buffer.
+            If num_frame_slots <= 0, no ring buffer is used and every frame is
+            newly allocated. Defaults to 0.
+          shared_memory (bool): Back the frame ring buffer by shared memory or
+            not. Defaults to False.
+          decimate_interval (int): The interval (in milliseconds) between kept
+            frames. If decimate_interval <= 0, every frame is kept. Defaults to
+            0.
+          reconnect_manager (`ReconnectManager`): The manager to reconnect
+            live streams. If it is None, the default manager shared by all
+            capturers is used. Defaults to None.
+          analysis_size (tuple): The (width, height) of the "analysis_image"
+            tensor. If the height is None, it is derived from the width by the
+            aspect ratio of the frame. If it is None, no analysis image is
+            fed. Defaults to None.
         """
         self._src = src
         self._retry_timeout = retry_timeout
+        self._num_frame_slots = num_frame_slots
+        self._shared_memory = shared_memory
+        self._frame_buffer = None
+        self._stale_frame_buffers = []
+        self._decimate_interval = decimate_interval / 1000.0
+        self._reconnect_manager = reconnect_manager
+        self._analysis_size = analysis_size
         self._cap = None
         self._retry = False
+        self._reconnect_lock = threading.Lock()
+        self._reopened_cap = None
+        self._destroyed = False
+        self._disconnect_time = 0.0
+        self._reconnect_count = 0
+        self._reconnect_time = 0.0
+        self._fps = 0.0
+        self._frame_index = 0
+        self._next_keep_time = 0.0
+        self._clock_anchor = None
+        self._lag_start = None
+        self._grabbed_count = 0
+        self._decoded_count = 0
+        self._decode_time = 0.0
+        self._metrics = CaptureMetrics()
 
     @property
     def src(self):
@@ -62,18 +147,76 @@ class VideoStreamCapturer(ICapturer):
         """int: The limit of retry timeout."""
         return self._retry_timeout
 
+    @property
+    def frame_buffer(self):
+        """`FrameRingBuffer`: The frame ring buffer, or None if it is not used
+        or not allocated yet."""
+        return self._frame_buffer
+
+    @property
+    def metrics(self):
+        """`CaptureMetrics`: The capture metrics. The latency is the time to
+        read (and decode) a frame, and the dropped frames are the frames
+        skipped by decimation."""
+        return self._metrics
+
+    @property
+    def reconnect_stats(self):
+        """dict: The statistics of reconnection, which contains:
+            connected (bool): Whether the stream is connected or not.
+            reconnects (int): The number of reconnections.
+            reconnect_time (float): The total time (in seconds) from
+              disconnecting to reconnecting.
+        """
+        return {
+            'connected': not self._retry,
+            'reconnects': self._reconnect_count,
+            'reconnect_time': self._reconnect_time,
+        }
+
+    @property
+    def decimation_stats(self):
+        """dict: The statistics of frame decimation, which contains:
+            grabbed (int): The number of grabbed frames.
+            decoded (int): The number of decoded frames.
+            skipped (int): The number of frames skipped without decoding.
+            decode_time (float): The total decoding time (in seconds).
+            decode_time_saved (float): The estimated decoding time (in
+              seconds) saved by skipping, based on the mean decoding time.
+        """
+        skipped = self._grabbed_count - self._decoded_count
+        if self._decoded_count > 0:
+            mean_decode_time = self._decode_time / self._decoded_count
+        else:
+            mean_decode_time = 0.0
+        return {
+            'grabbed': self._grabbed_count,
+            'decoded': self._decoded_count,
+            'skipped': skipped,
+            'decode_time': self._decode_time,
+            'decode_time_saved': skipped * mean_decode_time,
+        }
+
     def prepare(self):
         """The routine of video stream capturer preparation.
 
         Raises:
           RuntimeError: If the video stream is not opened.
         """
-        self._cap = cv2.VideoCapture()
-        exec_timeout(self._retry_timeout, self._cap.open, self._src)
+        self._destroyed = False
+        self._cap = exec_timeout(self._retry_timeout, self._open_stream)
 
-        if not self._cap.isOpened():
+        if self._cap is None:
             raise RuntimeError(
                 'The video stream {} is not opened.'.format(self._src))
+        self._reset_frame_clock()
+
+        if self._num_frame_slots > 0:
+            width = int(self._cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(self._cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            # Allocate the ring buffer lazily if the frame size is unknown.
+            if width > 0 and height > 0:
+                self._allocate_frame_buffer((height, width, 3))
 
     def capture(self):
         """The routine of video stream capturer capturation.
@@ -86,33 +229,189 @@ class VideoStreamCapturer(ICapturer):
           EndOfVideoError: If the stream ends.
         """
         if self._retry:
-            try:
-                logging.info('Start trying to open {}'.format(self._src))
-
-                exec_timeout(self._retry_timeout, self._cap.open, self._src)
-                self._retry = False
-
-                logging.info('End trying to open {}'.format(self._src))
-            except TimeoutError as e:
-                logging.warn('Fail to open {} due to timeout: {}'.format(self._src, e))
-                self._raise_retry()
+            self._swap_reopened()
 
-        success, image = self._cap.read()
+        start = time.monotonic()
+        skipped_count = self._grabbed_count - self._decoded_count
+        if self._num_frame_slots > 0:
+            success, image, slot_index = self._read_into_slot()
+        else:
+            success, image = self._read()
         timestamp = np.array(now())
+        self._metrics.mark_dropped(self._grabbed_count - self._decoded_count -
+                                   skipped_count)
 
         if not success:
             if self._is_live_stream():
-                self._retry = True
+                self._start_reconnect()
                 self._raise_retry()
             else:
                 raise EndOfVideoError('Video {} ends'.format(self._src))
+        self._metrics.observe_latency((time.monotonic() - start) * 1000.0)
+        self._metrics.mark_captured()
 
         blob = Blob()
-        blob.feed('image', image)
-        blob.feed('timestamp', timestamp)
+        blob.feed_unchecked('image', image)
+        blob.feed_unchecked('timestamp', timestamp)
+        if self._num_frame_slots > 0:
+            blob.feed_unchecked('frame_slot', np.array(slot_index))
+        self._feed_analysis_image(blob, image)
 
         return blob
 
+    def _feed_analysis_image(self, blob, image):
+        """Feed the downscaled analysis image into a blob if it is enabled.
+
+        Args:
+          blob (`Blob`): The blob to feed.
+          image (numpy `ndarray`): The full resolution image.
+        """
+        if self._analysis_size is None:
+            return
+        width, height = self._analysis_size
+        if height is None:
+            height = max(1, int(round(width * image.shape[0] /
+                                      float(image.shape[1]))))
+        analysis_image = cv2.resize(image,
+                                    (width, height),
+                                    interpolation=cv2.INTER_AREA)
+        blob.feed_unchecked(ANALYSIS_IMAGE_NAME, analysis_image)
+
+    def _allocate_frame_buffer(self, shape):
+        """Allocate a new frame ring buffer.
+
+        The previous buffer is kept until destruction, since its frames may
+        still be referenced by blobs.
+
+        Args:
+          shape (tuple): The shape of a frame.
+        """
+        if not self._frame_buffer is None:
+            self._stale_frame_buffers.append(self._frame_buffer)
+        self._frame_buffer = FrameRingBuffer(self._num_frame_slots,
+                                             shape,
+                                             shared=self._shared_memory)
+
+    def _read_into_slot(self):
+        """Read a frame into the next slot of the frame ring buffer.
+
+        Returns:
+          tuple: The read result. The tuple contains:
+            success (bool): True if a frame is read, False otherwise.
+            image (numpy `ndarray`): The read frame.
+            slot_index (int): The slot index of the frame.
+        """
+        if self._frame_buffer is None:
+            success, image = self._read()
+            if not success:
+                return success, image, -1
+            self._allocate_frame_buffer(image.shape)
+            slot_index, slot = self._frame_buffer.next_slot()
+            slot[:] = image
+            return success, slot, slot_index
+
+        slot_index, slot = self._frame_buffer.next_slot()
+        success, image = self._read(slot)
+        if success and not image is slot:
+            # The frame size changes, such as after reconnecting.
+            logging.warn('Frame size of {} changes to {}, reallocate the frame'
+                         ' buffer'.format(self._src, image.shape))
+            self._allocate_frame_buffer(image.shape)
+            slot_index, slot = self._frame_buffer.next_slot()
+            slot[:] = image
+            image = slot
+        return success, image, slot_index
+
+    def _reset_frame_clock(self):
+        """Reset the frame clock of decimation after (re)opening."""
+        fps = self._cap.get(cv2.CAP_PROP_FPS)
+        # Some live streams report bogus frame rates, fall back to the time of
+        # grabbing in this case.
+        self._fps = fps if 0 < fps <= 1000 else 0.0
+        self._frame_index = 0
+        self._next_keep_time = 0.0
+        self._clock_anchor = None
+        self._lag_start = None
+
+    def _read(self, image=None):
+        """Read a frame, with decimation if it is enabled.
+
+        Args:
+          image (numpy `ndarray`): The buffer to decode into. Defaults to None.
+
+        Returns:
+          tuple: The read result. The tuple contains:
+            success (bool): True if a frame is read, False otherwise.
+            image (numpy `ndarray`): The read frame.
+        """
+        if self._decimate_interval <= 0:
+            return self._cap.read(image)
+
+        if not self._grab_kept():
+            return False, None
+        start = time.monotonic()
+        result = self._cap.retrieve(image)
+        self._decode_time += time.monotonic() - start
+        self._decoded_count += 1
+        return result
+
+    def _grab_kept(self):
+        """Grab frames without decoding until a frame to keep is grabbed.
+
+        Returns:
+          bool: True if a frame to keep is grabbed, False if the stream ends
+            or is disconnected.
+        """
+        live = self._is_live_stream()
+        while True:
+            start = time.monotonic()
+            if not self._cap.grab():
+                return False
+            self._grabbed_count += 1
+            grab_time = time.monotonic()
+
+            if self._fps > 0:
+                frame_time = self._frame_index / self._fps
+            else:
+                if self._clock_anchor is None:
+                    self._clock_anchor = grab_time
+                frame_time = grab_time - self._clock_anchor
+            self._frame_index += 1
+
+            lag = 0.0
+            if live and self._fps > 0:
+                # Anchor the frame clock to the earliest arrival, so the lag
+                # is how late a frame is read compared to a frame on time. A
+                # frame that blocks grabbing has just arrived, so it is on
+                # time even if the stream is slower than its reported rate.
+                blocked = grab_time - start >= 0.5 / self._fps
+                if (blocked or self._clock_anchor is None or
+                        grab_time - frame_time < self._clock_anchor):
+                    self._clock_anchor = grab_time - frame_time
+                lag = grab_time - self._clock_anchor - frame_time
+                if lag <= self._decimate_interval:
+                    self._lag_start = None
+                elif self._lag_start is None:
+                    self._lag_start = grab_time
+                elif grab_time - self._lag_start > _MAX_LAG_DURATION:
+                    # A backlog is drained faster than real time, so frames
+                    # lagging for so long means the frame clock drifts.
+                    # Re-anchor to this frame to bound skipping.
+                    self._clock_anchor = grab_time - frame_time
+                    self._lag_start = None
+                    lag = 0.0
+
+            # Tolerate rounding errors of the frame clock.
+            if frame_time + 1e-6 >= self._next_keep_time and \
+                    lag <= self._decimate_interval:
+                break
+
+        self._next_keep_time += self._decimate_interval
+        if self._next_keep_time <= frame_time:
+            # Re-align to the kept frame if the schedule falls behind.
+            self._next_keep_time = frame_time + self._decimate_interval
+        return True
+
     def _is_live_stream(self):
         """Check whether the source is live stream or not.
 
@@ -123,10 +422,318 @@ class VideoStreamCapturer(ICapturer):
         # "http://url.to/vdieo.mp4"
         return urlparse(self._src).scheme != ''
 
+    def _get_reconnect_manager(self):
+        """Get the reconnect manager."""
+        if self._reconnect_manager is None:
+            self._reconnect_manager = get_default_reconnect_manager()
+        return self._reconnect_manager
+
+    def _start_reconnect(self):
+        """Start reconnecting the stream in background."""
+        logging.warn('Stream {} is disconnected, reconnect in background'
+                     .format(self._src))
+        self._retry = True
+        self._disconnect_time = time.monotonic()
+        self._cap.release()
+        self._get_reconnect_manager().submit(self,
+                                             self._open_stream,
+                                             self._on_reopened,
+                                             self._on_discarded,
+                                             timeout=self._retry_timeout)
+
+    def _open_stream(self):
+        """Open the stream when it is prepared or on a reconnecting thread.
+
+        The open and read timeouts of the backend are set to the retry
+        timeout if it supports them, so a hanging camera fails instead of
+        blocking the thread.
+
+        Returns:
+          `cv2.VideoCapture`: The opened stream, or None if it fails.
+        """
+        timeout_msec = int(self._retry_timeout * 1000)
+        params = []
+        # The timeout properties are only available since OpenCV 4.2.
+        for name in ['CAP_PROP_OPEN_TIMEOUT_MSEC',
+                     'CAP_PROP_READ_TIMEOUT_MSEC']:
+            if hasattr(cv2, name):
+                params.extend([getattr(cv2, name), timeout_msec])
+        if params:
+            cap = cv2.VideoCapture(self._src, cv2.CAP_ANY, params)
+        else:
+            cap = cv2.VideoCapture(self._src)
+        if cap.isOpened():
+            return cap
+        cap.release()
+        return None
+
+    def _on_reopened(self, cap):
+        """The callback when the stream is reopened."""
+        with self._reconnect_lock:
+            if not self._destroyed:
+                self._reopened_cap = cap
+                return
+        cap.release()
+
+    def _on_discarded(self, cap):
+        """The callback when the reopened stream is discarded."""
+        cap.release()
+
+    def _swap_reopened(self):
+        """Swap in the reopened stream.
+
+        Raises:
+          RetryError: If the stream is not reopened yet.
+        """
+        if not self._try_swap_reopened():
+            self._raise_retry()
+
+    def _try_swap_reopened(self):
+        """Swap in the reopened stream if it is ready.
+
+        Returns:
+          bool: True if the reopened stream is swapped in, False if it is not
+            reopened yet.
+        """
+        with self._reconnect_lock:
+            cap = self._reopened_cap
+            self._reopened_cap = None
+        if cap is None:
+            return False
+
+        self._cap = cap
+        self._retry = False
+        self._reconnect_count += 1
+        self._reconnect_time += time.monotonic() - self._disconnect_time
+        self._reset_frame_clock()
+        logging.info('Reconnected to {}'.format(self._src))
+        return True
+
     def _raise_retry(self):
         """Raise a retry request."""
+        self._metrics.mark_retry()
         raise RetryError('Try to reconnect to {}'.format(self._src))
 
     def destroy(self):
         """The routine of video stream capturer destruction."""
-        self._cap.release()
+        if not self._reconnect_manager is None:
+            self._reconnect_manager.cancel(self)
+        with self._reconnect_lock:
+            self._destroyed = True
+            if not self._reopened_cap is None:
+                self._reopened_cap.release()
+                self._reopened_cap = None
+        if not self._cap is None:
+            self._cap.release()
+            self._cap = None
+        if self._decimate_interval > 0:
+            stats = self.decimation_stats
+            logging.info('Decimation of {}: {} grabbed, {} decoded, {:.3f}s '
+                         'decoding saved'.format(self._src,
+                                                 stats['grabbed'],
+                                                 stats['decoded'],
+                                                 stats['decode_time_saved']))
+        for frame_buffer in self._stale_frame_buffers + [self._frame_buffer]:
+            if not frame_buffer is None:
+                frame_buffer.close()
+        self._stale_frame_buffers = []
+        self._frame_buffer = None
+
+
+class LiveStreamCapturer(VideoStreamCapturer):
+    """The live stream capturer.
+
+    The capturer drains a live stream continuously on a dedicated thread and
+    keeps only the newest decoded frame, so the pipeline always processes the
+    freshest frame instead of the frames buffered in the stream. Each captured
+    blob has a "image" tensor and a "timestamp" tensor like
+    `VideoStreamCapturer`, but the timestamp is the time when the frame is
+    read from the stream rather than when it is captured by the pipeline.
+    Each blob also has a "frame_time" tensor, which is the monotonic time (in
+    seconds) when the frame is read, so modules can measure the age of the
+    frame from being read to any point of the pipeline.
+
+    If no new frame arrives since the last capture, `capture` returns None.
+    The age of each frame, from being read to being captured by the pipeline,
+    is observed in a histogram.
+
+    When the stream is disconnected, the draining thread reconnects by the
+    `ReconnectManager` like `VideoStreamCapturer`, and polls for the reopened
+    stream, so it never blocks on opening and can always be stopped.
+    """
+
+    def __init__(self,
+                 src,
+                 retry_timeout=30,
+                 reconnect_interval=1,
+                 analysis_size=None,
+                 reconnect_manager=None):
+        """Create a new `LiveStreamCapturer`.
+
+        Args:
+          src (string): The video source. It is usually a live stream URL such
+            as RTSP, Motion JPEG.
+          retry_timeout (int): The limit of retry timeout (in seconds). Defaults
+            to 30.
+          reconnect_interval (float): The interval (in seconds) to check
+            whether the stream is reopened when it is disconnected. Defaults
+            to 1.
+          analysis_size (tuple): The (width, height) of the "analysis_image"
+            tensor. If the height is None, it is derived from the width by the
+            aspect ratio of the frame. If it is None, no analysis image is
+            fed. Defaults to None.
+          reconnect_manager (`ReconnectManager`): The manager to reconnect
+            the stream. If it is None, the default manager shared by all
+            capturers is used. Defaults to None.
+        """
+        VideoStreamCapturer.__init__(self,
+                                     src,
+                                     retry_timeout=retry_timeout,
+                                     reconnect_manager=reconnect_manager,
+                                     analysis_size=analysis_size)
+        self._reconnect_interval = reconnect_interval
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._frame = None
+        self._frame_timestamp = 0.0
+        self._frame_time = 0.0
+        self._connected = True
+        self._ended = False
+        self._read_count = 0
+        self._captured_count = 0
+        # The ages are in milliseconds, from 1 ms to about 32 seconds.
+        self._age_histogram = Histogram(exponential_bounds(1, 2, 16))
+
+    @property
+    def age_histogram(self):
+        """`Histogram`: The ages (in milliseconds) of captured frames, from
+        being read to being captured by the pipeline."""
+        return self._age_histogram
+
+    @property
+    def read_count(self):
+        """int: The number of frames read from the stream."""
+        return self._read_count
+
+    @property
+    def captured_count(self):
+        """int: The number of frames captured by the pipeline."""
+        return self._captured_count
+
+    @property
+    def skipped_count(self):
+        """int: The number of frames replaced by newer frames before being
+        captured."""
+        return self._read_count - self._captured_count
+
+    def prepare(self):
+        """The routine of live stream capturer preparation to open the
+        stream and start the draining thread.
+
+        Raises:
+          RuntimeError: If the video stream is not opened.
+        """
+        VideoStreamCapturer.prepare(self)
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._drain)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def capture(self):
+        """The routine of live stream capturer capturation.
+
+        Returns:
+          `Blob`: The blob which contains "image", "timestamp" and
+            "frame_time" tensor, or None if no new frame arrives since the
+            last capture.
+
+        Raises:
+          RetryError: If the stream is disconnected temporarily.
+          EndOfVideoError: If the stream ends.
+        """
+        with self._lock:
+            image = self._frame
+            timestamp = self._frame_timestamp
+            frame_time = self._frame_time
+            self._frame = None
+            connected = self._connected
+            ended = self._ended
+
+        if image is None:
+            if ended:
+                raise EndOfVideoError('Video {} ends'.format(self._src))
+            if not connected:
+                self._raise_retry()
+            return None
+
+        self._captured_count += 1
+        self._metrics.mark_captured()
+        self._age_histogram.observe((time.monotonic() - frame_time) * 1000.0)
+
+        blob = Blob()
+        blob.feed_unchecked('image', image)
+        blob.feed_unchecked('timestamp', np.array(timestamp))
+        blob.feed_unchecked('frame_time', np.array(frame_time))
+        self._feed_analysis_image(blob, image)
+
+        return blob
+
+    def _drain(self):
+        """The worker function of the draining thread."""
+        while not self._stop_event.is_set():
+            start = time.monotonic()
+            success, image = self._cap.read()
+            if success:
+                frame_time = time.monotonic()
+                timestamp = now()
+                self._metrics.observe_latency((frame_time - start) * 1000.0)
+                with self._lock:
+                    if not self._frame is None:
+                        # The frame is replaced before being captured.
+                        self._metrics.mark_dropped()
+                    self._frame = image
+                    self._frame_timestamp = timestamp
+                    self._frame_time = frame_time
+                    self._connected = True
+                    self._read_count += 1
+                continue
+
+            if self._stop_event.is_set():
+                # The read fails because the capturer is destroyed.
+                return
+            if not self._is_live_stream():
+                with self._lock:
+                    self._ended = True
+                return
+
+            with self._lock:
+                self._connected = False
+            self._start_reconnect()
+            while not self._stop_event.wait(self._reconnect_interval):
+                if self._try_swap_reopened():
+                    break
+
+    def destroy(self):
+        """The routine of live stream capturer destruction.
+
+        The draining thread is waited for the retry timeout at most. If it is
+        still blocked on reading, the stream is left to be released when the
+        read returns, since releasing it under the read is unsafe.
+        """
+        self._stop_event.set()
+        if not self._thread is None:
+            self._thread.join(self._retry_timeout)
+            if self._thread.is_alive():
+                logging.warn('Draining thread of {} is still blocked on '
+                             'reading'.format(self._src))
+                self._cap = None
+            self._thread = None
+        snapshot = self._age_histogram.snapshot()
+        logging.info('Live capture of {}: {} read, {} captured, frame age '
+                     'p50 {:.1f} ms, p99 {:.1f} ms'.format(self._src,
+                                                          self._read_count,
+                                                          self._captured_count,
+                                                          snapshot['p50'],
+                                                          snapshot['p99']))
+        VideoStreamCapturer.destroy(self)
@@ -5,10 +5,18 @@ from __future__ import division
 from __future__ import print_function
 
 import os
+import threading
+import time
 
+import cv2
+import numpy as np
 import pytest
 
+from jagereye.streaming.capturers.reconnect import ReconnectManager
+from jagereye.streaming.capturers.stream_capturers import LiveStreamCapturer
 from jagereye.streaming.capturers.stream_capturers import VideoStreamCapturer
+from jagereye.streaming.exceptions import EndOfVideoError
+from jagereye.streaming.exceptions import RetryError
 from jagereye.util.generic import now
 
 
@@ -43,5 +51,265 @@ class TestVideoStreamCapturer(object):
 
         capturer.destroy()
 
+    def test_execute_with_frame_slots(self):
+        src = os.path.join(os.getcwd(), 'testdata/hamster.mp4')
+        capturer = VideoStreamCapturer(src, num_frame_slots=3)
+        capturer.prepare()
+        frame_buffer = capturer.frame_buffer
+        assert frame_buffer.shape == (240, 320, 3)
+
+        for i in range(5):
+            blob = capturer.capture()
+            slot_index = int(blob.fetch('frame_slot'))
+            assert slot_index == i % 3
+            image = blob.fetch('image')
+            assert image.shape == (240, 320, 3)
+            assert np.shares_memory(image, frame_buffer.slot(slot_index))
+        # No new frame buffer is allocated in steady state.
+        assert capturer.frame_buffer is frame_buffer
+
+        capturer.destroy()
+
+    def test_execute_with_decimation(self):
+        # The video has 75 frames at 25 FPS, keep one frame every 120 ms.
+        src = os.path.join(os.getcwd(), 'testdata/hamster.mp4')
+        capturer = VideoStreamCapturer(src, decimate_interval=120)
+        capturer.prepare()
+
+        images = []
+        with pytest.raises(EndOfVideoError):
+            while True:
+                images.append(capturer.capture().fetch('image'))
+        assert len(images) == 25
+        assert images[0].shape == (240, 320, 3)
+        stats = capturer.decimation_stats
+        assert stats['grabbed'] == 75
+        assert stats['decoded'] == 25
+        assert stats['skipped'] == 50
+        assert stats['decode_time_saved'] >= 0
+        snapshot = capturer.metrics.snapshot()
+        assert snapshot['captured'] == 25
+        assert snapshot['dropped'] == 50
+        assert snapshot['latency']['count'] == 25
+
+        capturer.destroy()
+
+    def test_execute_with_decimation_and_frame_slots(self):
+        src = os.path.join(os.getcwd(), 'testdata/hamster.mp4')
+        capturer = VideoStreamCapturer(src,
+                                       num_frame_slots=2,
+                                       decimate_interval=80)
+        capturer.prepare()
+        frame_buffer = capturer.frame_buffer
+
+        for i in range(4):
+            blob = capturer.capture()
+            slot_index = int(blob.fetch('frame_slot'))
+            assert slot_index == i % 2
+            assert np.shares_memory(blob.fetch('image'),
+                                    frame_buffer.slot(slot_index))
+        assert capturer.decimation_stats['grabbed'] == 7
+
+        capturer.destroy()
+
+    def test_execute_with_analysis_image(self):
+        src = os.path.join(os.getcwd(), 'testdata/hamster.mp4')
+        capturer = VideoStreamCapturer(src, analysis_size=(160, 120))
+        capturer.prepare()
+
+        blob = capturer.capture()
+        image = blob.fetch('image')
+        analysis_image = blob.fetch('analysis_image')
+        assert image.shape == (240, 320, 3)
+        assert analysis_image.shape == (120, 160, 3)
+        assert analysis_image.dtype == np.uint8
+
+        capturer.destroy()
+
+    def test_execute_with_analysis_width(self):
+        src = os.path.join(os.getcwd(), 'testdata/hamster.mp4')
+        capturer = VideoStreamCapturer(src, analysis_size=(200, None))
+        capturer.prepare()
+
+        blob = capturer.capture()
+        analysis_image = blob.fetch('analysis_image')
+        assert analysis_image.shape == (150, 200, 3)
+
+        capturer.destroy()
+
+    def test_execute_with_reconnect(self):
+        # Treat the video as a live stream, so it reconnects at the end.
+        class _LiveCapturer(VideoStreamCapturer):
+            def _is_live_stream(self):
+                return True
+
+        src = os.path.join(os.getcwd(), 'testdata/hamster.mp4')
+        manager = ReconnectManager(initial_backoff=0.01)
+        capturer = _LiveCapturer(src, reconnect_manager=manager)
+        capturer.prepare()
+
+        for _ in range(75):
+            capturer.capture()
+        with pytest.raises(RetryError):
+            capturer.capture()
+        assert not capturer.reconnect_stats['connected']
+
+        blob = None
+        deadline = time.monotonic() + 5
+        while blob is None and time.monotonic() < deadline:
+            try:
+                blob = capturer.capture()
+            except RetryError:
+                time.sleep(0.01)
+        assert blob.fetch('image').shape == (240, 320, 3)
+        stats = capturer.reconnect_stats
+        assert stats['connected']
+        assert stats['reconnects'] == 1
+        assert stats['reconnect_time'] > 0
+        assert manager.stats['reconnects'] == 1
+
+        capturer.destroy()
+
+    def test_execute_with_decimation_and_slow_stream(self):
+        # The live stream reports 25 FPS but delivers 20 FPS.
+        class _SlowCapture(object):
+            def __init__(self):
+                self._start = time.monotonic()
+                self._index = 0
+
+            def get(self, prop):
+                return 25.0 if prop == cv2.CAP_PROP_FPS else 0.0
+
+            def grab(self):
+                self._index += 1
+                delay = self._start + self._index / 20.0 - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                return True
+
+            def retrieve(self, image=None):
+                return True, np.zeros((4, 4, 3), dtype=np.uint8)
+
+            def release(self):
+                pass
+
+        class _LiveCapturer(VideoStreamCapturer):
+            def _is_live_stream(self):
+                return True
+
+        capturer = _LiveCapturer('rtsp://camera', decimate_interval=66)
+        capturer._cap = _SlowCapture() # pylint: disable=protected-access
+        capturer._reset_frame_clock() # pylint: disable=protected-access
+
+        # Without re-anchoring, the lag grows 10 ms per frame and every frame
+        # is skipped after about 7 frames.
+        for _ in range(15):
+            capturer.capture()
+        stats = capturer.decimation_stats
+        assert stats['decoded'] == 15
+        assert stats['grabbed'] <= 30
+
+        capturer.destroy()
+
     def test_destroy(self):
         pass
+
+
+class TestLiveStreamCapturer(object):
+    """Tests for LiveStreamCapturer class."""
+
+    def test_prepare_non_existing_video(self):
+        capturer = LiveStreamCapturer('non_existing.mp4')
+        with pytest.raises(RuntimeError):
+            capturer.prepare()
+
+    def test_execute_latest_frame(self):
+        src = os.path.join(os.getcwd(), 'testdata/hamster.mp4')
+        capturer = LiveStreamCapturer(src)
+        capturer.prepare()
+
+        # Wait for the draining thread to read all the 75 frames.
+        deadline = time.monotonic() + 5
+        while capturer.read_count < 75 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.05)
+
+        blob = capturer.capture()
+        image = blob.fetch('image')
+        assert image.shape == (240, 320, 3)
+        timestamp = float(blob.fetch('timestamp'))
+        assert timestamp <= now()
+        # The frame is read at least 50 ms before being captured.
+        frame_time = float(blob.fetch('frame_time'))
+        assert time.monotonic() - frame_time >= 0.05
+        # Only the newest frame is kept.
+        assert capturer.captured_count == 1
+        assert capturer.skipped_count == 74
+        snapshot = capturer.age_histogram.snapshot()
+        assert snapshot['count'] == 1
+        assert snapshot['min'] >= 50
+        # The stream ends after the newest frame is captured.
+        with pytest.raises(EndOfVideoError):
+            capturer.capture()
+
+        capturer.destroy()
+
+    def test_destroy_with_blocking_read(self):
+        unblock_event = threading.Event()
+
+        class _BlockingStream(object):
+            def isOpened(self):
+                return True
+
+            def get(self, prop_id):
+                return 0
+
+            def read(self):
+                unblock_event.wait()
+                return False, None
+
+            def release(self):
+                pass
+
+        class _BlockingCapturer(LiveStreamCapturer):
+            def _open_stream(self):
+                return _BlockingStream()
+
+        capturer = _BlockingCapturer('rtsp://blocking', retry_timeout=0.1)
+        capturer.prepare()
+        thread = capturer._thread # pylint: disable=protected-access
+
+        # The destruction does not wait for the blocking read forever.
+        start = time.monotonic()
+        capturer.destroy()
+        assert time.monotonic() - start < 1
+        assert thread.is_alive()
+
+        # The draining thread stops without reconnecting once the read returns.
+        unblock_event.set()
+        thread.join(1)
+        assert not thread.is_alive()
+
+    def test_execute_with_reconnect(self):
+        # Treat the video as a live stream, so it reconnects at the end.
+        class _LiveCapturer(LiveStreamCapturer):
+            def _is_live_stream(self):
+                return True
+
+        src = os.path.join(os.getcwd(), 'testdata/hamster.mp4')
+        manager = ReconnectManager(initial_backoff=0.01)
+        capturer = _LiveCapturer(src,
+                                 reconnect_interval=0.01,
+                                 reconnect_manager=manager)
+        capturer.prepare()
+
+        # The draining thread reads the video twice by reconnecting.
+        deadline = time.monotonic() + 5
+        while capturer.read_count < 150 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert capturer.read_count >= 150
+        stats = capturer.reconnect_stats
+        assert stats['reconnects'] >= 1
+        assert manager.stats['reconnects'] >= 1
+
+        capturer.destroy()
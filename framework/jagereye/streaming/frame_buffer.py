@@ -0,0 +1,148 @@
+"""The FrameRingBuffer class definition."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as np
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # Shared memory is only available since Python 3.8.
+    shared_memory = None
+
+
+class FrameRingBuffer(object):
+    """The preallocated ring buffer of frame slots.
+
+    The ring buffer allocates a fixed number of frame slots once, and hands
+    them out in a round-robin order. A capturer can decode frames into the
+    slots, so that capturing in steady state allocates no new frame. The
+    buffer can optionally be backed by shared memory, so that other processes
+    can attach to it by name and read the frames without copying.
+
+    A slot is reused after all other slots have been handed out, so the
+    number of slots must be larger than the number of frames that are held at
+    the same time, including the frames in queues and the frames reserved by
+    modules.
+    """
+
+    def __init__(self, num_slots, shape, dtype=np.uint8, shared=False,
+                 name=None):
+        """Create a new `FrameRingBuffer`.
+
+        Args:
+          num_slots (int): The number of frame slots.
+          shape (tuple): The shape of a frame.
+          dtype (numpy `dtype`): The data type of a frame. Defaults to uint8.
+          shared (bool): Back the buffer by shared memory or not. Defaults to
+            False.
+          name (string): The name of existing shared memory to attach to. It
+            is only used when shared is True. If None, new shared memory is
+            created. Defaults to None.
+
+        Raises:
+          ValueError: if num_slots < 1.
+          RuntimeError: if shared memory is not supported.
+        """
+        if num_slots < 1:
+            raise ValueError('Number of slots must be at least 1.')
+        self._num_slots = num_slots
+        self._shape = tuple(shape)
+        self._dtype = np.dtype(dtype)
+        self._next_index = 0
+        self._shm = None
+        self._owner = False
+
+        buffer_shape = (num_slots,) + self._shape
+        if shared:
+            if shared_memory is None:
+                raise RuntimeError('Shared memory is not supported.')
+            size = int(np.prod(buffer_shape)) * self._dtype.itemsize
+            if name is None:
+                self._shm = shared_memory.SharedMemory(create=True, size=size)
+                self._owner = True
+            else:
+                self._shm = shared_memory.SharedMemory(name=name)
+            self._frames = np.ndarray(buffer_shape,
+                                      dtype=self._dtype,
+                                      buffer=self._shm.buf)
+        else:
+            self._frames = np.empty(buffer_shape, dtype=self._dtype)
+
+    @classmethod
+    def attach(cls, name, num_slots, shape, dtype=np.uint8):
+        """Attach to a ring buffer backed by shared memory in another process.
+
+        Args:
+          name (string): The name of the shared memory.
+          num_slots (int): The number of frame slots.
+          shape (tuple): The shape of a frame.
+          dtype (numpy `dtype`): The data type of a frame. Defaults to uint8.
+
+        Returns:
+          `FrameRingBuffer`: The attached ring buffer.
+        """
+        return cls(num_slots, shape, dtype=dtype, shared=True, name=name)
+
+    @property
+    def num_slots(self):
+        """int: The number of frame slots."""
+        return self._num_slots
+
+    @property
+    def shape(self):
+        """tuple: The shape of a frame."""
+        return self._shape
+
+    @property
+    def dtype(self):
+        """numpy `dtype`: The data type of a frame."""
+        return self._dtype
+
+    @property
+    def name(self):
+        """string: The name of the shared memory, or None if the buffer is not
+        shared."""
+        return None if self._shm is None else self._shm.name
+
+    def slot(self, index):
+        """Get a frame slot by index.
+
+        Args:
+          index (int): The slot index.
+
+        Returns:
+          numpy `ndarray`: The frame slot, which is a view of the buffer.
+        """
+        return self._frames[index]
+
+    def next_slot(self):
+        """Hand out the next frame slot in round-robin order.
+
+        Returns:
+          tuple: The slot. The tuple contains:
+            index (int): The slot index.
+            frame (numpy `ndarray`): The frame slot, which is a view of the
+              buffer.
+        """
+        index = self._next_index
+        self._next_index = (index + 1) % self._num_slots
+        return index, self._frames[index]
+
+    def close(self):
+        """Release the buffer. The shared memory is also destroyed if it is
+        created by this buffer."""
+        # Drop the views before closing the shared memory.
+        self._frames = None
+        if not self._shm is None:
+            if self._owner:
+                self._shm.unlink()
+            try:
+                self._shm.close()
+            except BufferError:
+                # Some frames are still referenced, the memory will be
+                # released when they are garbage collected.
+                pass
+            self._shm = None
@@ -0,0 +1,47 @@
+"""Tests for frame ring buffer."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as np
+import pytest
+
+from jagereye.streaming import frame_buffer
+from jagereye.streaming.frame_buffer import FrameRingBuffer
+
+
+class TestFrameRingBuffer(object):
+    """Tests for FrameRingBuffer class."""
+
+    def test_invalid_num_slots(self):
+        with pytest.raises(ValueError):
+            FrameRingBuffer(0, (4, 4, 3))
+
+    def test_next_slot(self):
+        buf = FrameRingBuffer(3, (4, 4, 3))
+        indexes = [buf.next_slot()[0] for i in range(7)]
+        assert indexes == [0, 1, 2, 0, 1, 2, 0]
+        buf.close()
+
+    def test_slot_is_view(self):
+        buf = FrameRingBuffer(2, (4, 4, 3))
+        index, frame = buf.next_slot()
+        assert frame.shape == (4, 4, 3)
+        assert frame.dtype == np.uint8
+        frame[:] = 7
+        np.testing.assert_equal(buf.slot(index), frame)
+        assert np.shares_memory(buf.slot(index), frame)
+        assert buf.name is None
+        buf.close()
+
+    @pytest.mark.skipif(frame_buffer.shared_memory is None,
+                        reason='Shared memory is not supported.')
+    def test_shared(self):
+        buf = FrameRingBuffer(2, (4, 4, 3), shared=True)
+        index, frame = buf.next_slot()
+        frame[:] = 9
+        attached = FrameRingBuffer.attach(buf.name, 2, (4, 4, 3))
+        np.testing.assert_equal(attached.slot(index), frame)
+        attached.close()
+        buf.close()
@@ -0,0 +1,106 @@
+"""The FrameQueue class definition."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from queue import Queue
+
+
+class FrameQueue(Queue):
+    """The queue of captured blobs between a capturer and modules.
+
+    FrameQueue is a `queue.Queue` that can be bounded and decides what to do
+    when a new blob arrives at a full queue. The supported overflow policies
+    are:
+    1. "block": Block the producer until there is a free slot.
+    2. "drop_oldest": Drop the oldest blob in the queue to make room.
+    3. "drop_newest": Drop the arriving blob.
+    4. "latest": Keep only the latest blob, the queue size is always 1.
+
+    The queue counts how many blobs are put and dropped so that users can
+    compare the capture rate with the processing rate.
+    """
+
+    POLICY_BLOCK = 'block'
+    POLICY_DROP_OLDEST = 'drop_oldest'
+    POLICY_DROP_NEWEST = 'drop_newest'
+    POLICY_LATEST = 'latest'
+
+    POLICIES = (POLICY_BLOCK, POLICY_DROP_OLDEST, POLICY_DROP_NEWEST,
+                POLICY_LATEST)
+
+    def __init__(self, maxsize=0, policy=POLICY_BLOCK):
+        """Create a new `FrameQueue`.
+
+        Args:
+          maxsize (int): The maximum number of blobs in the queue. If maxsize
+            <= 0, the queue size is unlimited. It is ignored when the policy is
+            "latest". Defaults to 0.
+          policy (string): The overflow policy. Defaults to "block".
+
+        Raises:
+          ValueError: if the policy is not supported.
+        """
+        if policy not in self.POLICIES:
+            raise ValueError('Unsupported overflow policy: {}'.format(policy))
+        if policy == self.POLICY_LATEST:
+            maxsize = 1
+        Queue.__init__(self, maxsize)
+        self._policy = policy
+        self._put_count = 0
+        self._dropped_count = 0
+
+    @property
+    def policy(self):
+        """string: The overflow policy."""
+        return self._policy
+
+    @property
+    def put_count(self):
+        """int: The number of blobs that have been put into the queue,
+        including the dropped ones."""
+        return self._put_count
+
+    @property
+    def dropped_count(self):
+        """int: The number of blobs that have been dropped."""
+        return self._dropped_count
+
+    def put(self, item, block=True, timeout=None):
+        """Put a blob into the queue.
+
+        The blob is handled by the overflow policy if the queue is full. Only
+        the "block" policy respects the block and timeout arguments, the other
+        policies never block.
+
+        Args:
+          item (`Blob`): The blob to put.
+          block (bool): Block until a free slot is available or not. Defaults
+            to True.
+          timeout (float): The limit of blocking time (in seconds). Defaults
+            to None.
+
+        Raises:
+          queue.Full: if the policy is "block" and no free slot is available
+            within the timeout.
+        """
+        if self._policy == self.POLICY_BLOCK or self.maxsize <= 0:
+            Queue.put(self, item, block, timeout)
+            with self.mutex:
+                self._put_count += 1
+            return
+
+        with self.mutex:
+            self._put_count += 1
+            if self._qsize() >= self.maxsize:
+                self._dropped_count += 1
+                if self._policy == self.POLICY_DROP_NEWEST:
+                    return
+                # Drop the oldest one, its unfinished task is taken over by the
+                # new one.
+                self._get()
+            else:
+                self.unfinished_tasks += 1
+            self._put(item)
+            self.not_empty.notify()
@@ -0,0 +1,77 @@
+"""Tests for frame queue."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from queue import Full
+
+import pytest
+
+from jagereye.streaming.frame_queue import FrameQueue
+
+
+def _drain(queue):
+    """Get all items from a queue."""
+    items = []
+    while not queue.empty():
+        items.append(queue.get())
+    return items
+
+
+class TestFrameQueue(object):
+    """Tests for FrameQueue class."""
+
+    def test_unsupported_policy(self):
+        with pytest.raises(ValueError):
+            FrameQueue(policy='non_existing')
+
+    def test_unbounded(self):
+        queue = FrameQueue(policy=FrameQueue.POLICY_DROP_NEWEST)
+        for i in range(100):
+            queue.put(i)
+        assert _drain(queue) == list(range(100))
+        assert queue.put_count == 100
+        assert queue.dropped_count == 0
+
+    def test_block(self):
+        queue = FrameQueue(2, FrameQueue.POLICY_BLOCK)
+        queue.put(0)
+        queue.put(1)
+        with pytest.raises(Full):
+            queue.put(2, timeout=0.01)
+        assert _drain(queue) == [0, 1]
+        assert queue.dropped_count == 0
+
+    def test_drop_oldest(self):
+        queue = FrameQueue(3, FrameQueue.POLICY_DROP_OLDEST)
+        for i in range(5):
+            queue.put(i)
+        assert _drain(queue) == [2, 3, 4]
+        assert queue.put_count == 5
+        assert queue.dropped_count == 2
+
+    def test_drop_newest(self):
+        queue = FrameQueue(3, FrameQueue.POLICY_DROP_NEWEST)
+        for i in range(5):
+            queue.put(i)
+        assert _drain(queue) == [0, 1, 2]
+        assert queue.put_count == 5
+        assert queue.dropped_count == 2
+
+    def test_latest(self):
+        queue = FrameQueue(10, FrameQueue.POLICY_LATEST)
+        for i in range(5):
+            queue.put(i)
+        assert queue.maxsize == 1
+        assert _drain(queue) == [4]
+        assert queue.dropped_count == 4
+
+    def test_task_done_after_drop(self):
+        queue = FrameQueue(1, FrameQueue.POLICY_DROP_OLDEST)
+        queue.put(0)
+        queue.put(1)
+        queue.get()
+        queue.task_done()
+        # Join returns immediately if every remaining task is done.
+        queue.join()
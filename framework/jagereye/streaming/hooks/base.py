@@ -0,0 +1,67 @@
+"""The base definition of execution hooks."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import abc
+
+
+class IExecuteHook(object):
+    """The base execution hook interface.
+
+    Execution hook is attached to modules of a pipeline by
+    `Pipeline.add_hook` to observe their execution, such as profiling, without
+    modifying the modules. For every sampled call of an attached module, the
+    pipeline calls `before_execute` before the module executes and
+    `after_execute` after it, on the thread that executes the module.
+    Exceptions from hooks are logged and never stop the pipeline.
+    """
+
+    def attach(self):
+        """The routine when the hook is added to a pipeline.
+
+        The function is for hook preparation, such as starting a tracer. It
+          does nothing by default.
+        """
+        pass
+
+    @abc.abstractmethod
+    def before_execute(self, module, blobs):
+        """The routine before the module execution.
+
+        Args:
+          module (`IModule`): The module to execute.
+          blobs (list of `Blob`): The input blobs of the module.
+
+        Returns:
+          object: The state of the call, which is passed to `after_execute`.
+
+        Raises:
+          NotImplementedError: If the function is not implemented.
+        """
+        raise NotImplementedError('Should have implemented this function.')
+
+    @abc.abstractmethod
+    def after_execute(self, module, blobs, outputs, state):
+        """The routine after the module execution.
+
+        Args:
+          module (`IModule`): The executed module.
+          blobs (list of `Blob`): The input blobs of the module.
+          outputs (list of `Blob`): The executed blobs.
+          state (object): The state returned by `before_execute`.
+
+        Raises:
+          NotImplementedError: If the function is not implemented.
+        """
+        raise NotImplementedError('Should have implemented this function.')
+
+    def detach(self):
+        """The routine when the hook is removed from a pipeline, or the
+        pipeline stops.
+
+        The function is for hook destruction, such as stopping a tracer. It
+          does nothing by default.
+        """
+        pass
@@ -0,0 +1,29 @@
+"""Tests for base execution hooks."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import pytest
+
+from jagereye.streaming.hooks.base import IExecuteHook
+
+
+class TestIExecuteHook(object):
+    """Tests for IExecuteHook class."""
+
+    def test_attach(self):
+        IExecuteHook().attach()
+
+    def test_before_execute(self):
+        i_hook = IExecuteHook()
+        with pytest.raises(NotImplementedError):
+            i_hook.before_execute(None, [])
+
+    def test_after_execute(self):
+        i_hook = IExecuteHook()
+        with pytest.raises(NotImplementedError):
+            i_hook.after_execute(None, [], [], None)
+
+    def test_detach(self):
+        IExecuteHook().detach()
@@ -0,0 +1,250 @@
+"""Execution hooks to profile modules."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import threading
+import time
+import tracemalloc
+
+import cv2
+
+from jagereye.streaming.hooks.base import IExecuteHook
+from jagereye.util.metrics import Histogram
+from jagereye.util.metrics import exponential_bounds
+
+try:
+    _thread_time = time.thread_time # pylint: disable=invalid-name
+except AttributeError:
+    # time.thread_time() is only available since Python 3.7.
+    import resource
+
+    def _thread_time():
+        """Get the CPU time (in seconds) of the current thread."""
+        # pylint: disable=no-member
+        usage = resource.getrusage(resource.RUSAGE_THREAD)
+        return usage.ru_utime + usage.ru_stime
+
+
+def _module_name(module):
+    """Get the name of a module to group the profiles."""
+    return type(module).__name__
+
+
+class CpuTimeHook(IExecuteHook):
+    """The hook to profile the CPU time of modules.
+
+    For every sampled call, the hook records the CPU time and the wall time
+    (in milliseconds) of the executing thread, grouped by the module class
+    name. A CPU to wall time ratio far below 1 means the module mostly waits,
+    such as for I/O, locks or other threads. Note that CPU time spent on
+    other threads or processes, such as a `ProcessModule`, is not counted.
+    """
+
+    def __init__(self):
+        """Create a new `CpuTimeHook`."""
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def before_execute(self, module, blobs):
+        return (_thread_time(), time.monotonic())
+
+    def after_execute(self, module, blobs, outputs, state):
+        cpu_time = (_thread_time() - state[0]) * 1000.0
+        wall_time = (time.monotonic() - state[1]) * 1000.0
+        cpu_histogram, wall_histogram = self._get_histograms(module)
+        cpu_histogram.observe(cpu_time)
+        wall_histogram.observe(wall_time)
+
+    def _get_histograms(self, module):
+        """Get the CPU and wall time histograms of a module."""
+        name = _module_name(module)
+        with self._lock:
+            if not name in self._histograms:
+                # From 0.01 ms to about 10 s.
+                self._histograms[name] = (
+                    Histogram(exponential_bounds(0.01, 2, 20)),
+                    Histogram(exponential_bounds(0.01, 2, 20)))
+            return self._histograms[name]
+
+    def snapshot(self):
+        """Take a snapshot of the profiles.
+
+        Returns:
+          dict: The profiles keyed by module class names. Each of them
+            contains:
+            cpu (dict): The snapshot of the CPU time histogram.
+            wall (dict): The snapshot of the wall time histogram.
+            cpu_ratio (float): The total CPU time over the total wall time.
+        """
+        with self._lock:
+            histograms = dict(self._histograms)
+        profiles = {}
+        for name, (cpu_histogram, wall_histogram) in histograms.items():
+            wall_sum = wall_histogram.sum
+            profiles[name] = {
+                'cpu': cpu_histogram.snapshot(),
+                'wall': wall_histogram.snapshot(),
+                'cpu_ratio': cpu_histogram.sum / wall_sum if wall_sum else 0.0,
+            }
+        return profiles
+
+
+class AllocationHook(IExecuteHook):
+    """The hook to profile the memory allocation of modules.
+
+    For every sampled call, the hook records the change of memory (in KiB)
+    traced by `tracemalloc`, grouped by the module class name. A positive
+    delta means the memory allocated by the call is still retained after it,
+    such as a growing buffer. If top > 0, the hook also compares snapshots
+    before and after the call and keeps the top lines of the latest call,
+    which is costly and should be sampled sparsely.
+
+    Tracing starts when the hook is attached if it is not started yet, and
+    stops when the hook is detached. Memory is traced for all threads, so
+    the deltas include allocations of other threads during the call.
+    """
+
+    def __init__(self, top=0, frames=1):
+        """Create a new `AllocationHook`.
+
+        Args:
+          top (int): The number of top allocation lines to keep. If top <= 0,
+            no snapshot is taken. Defaults to 0.
+          frames (int): The number of frames of traceback to trace if the hook
+            starts tracing. Defaults to 1.
+        """
+        self._top = top
+        self._frames = frames
+        self._started = False
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._top_stats = {}
+
+    def attach(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self._frames)
+            self._started = True
+
+    def before_execute(self, module, blobs):
+        snapshot = self._take_snapshot() if self._top > 0 else None
+        return (tracemalloc.get_traced_memory()[0], snapshot)
+
+    def after_execute(self, module, blobs, outputs, state):
+        current = tracemalloc.get_traced_memory()[0]
+        name = _module_name(module)
+        with self._lock:
+            if not name in self._histograms:
+                # From 1 KiB to about 512 MiB.
+                self._histograms[name] = Histogram(
+                    exponential_bounds(1, 2, 20))
+            histogram = self._histograms[name]
+        histogram.observe((current - state[0]) / 1024.0)
+        if not state[1] is None:
+            stats = self._take_snapshot().compare_to(state[1], 'lineno')
+            with self._lock:
+                self._top_stats[name] = [str(stat)
+                                         for stat in stats[:self._top]]
+
+    def detach(self):
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
+
+    @staticmethod
+    def _take_snapshot():
+        """Take a snapshot without the traces of tracemalloc itself."""
+        return tracemalloc.take_snapshot().filter_traces(
+            (tracemalloc.Filter(False, tracemalloc.__file__),))
+
+    def snapshot(self):
+        """Take a snapshot of the profiles.
+
+        Returns:
+          dict: The profiles keyed by module class names. Each of them
+            contains:
+            delta (dict): The snapshot of the memory delta (in KiB) histogram.
+            top (list of string): The top allocation lines of the latest
+              sampled call, which is empty if top <= 0.
+        """
+        with self._lock:
+            return {
+                name: {
+                    'delta': histogram.snapshot(),
+                    'top': list(self._top_stats.get(name, [])),
+                } for name, histogram in self._histograms.items()
+            }
+
+
+class SlowFrameHook(IExecuteHook):
+    """The hook to capture the frames that are slow to execute.
+
+    When a sampled call takes longer than a threshold, the hook writes the
+    images of its input blobs to a directory, to reproduce and investigate
+    the offending frames offline. The file name contains the module class
+    name, the sequence number of the slow frame and the execution time. The
+    images are written after the module executes, so they include in-place
+    changes made by the module.
+    """
+
+    def __init__(self,
+                 directory,
+                 threshold,
+                 image_name='image',
+                 max_frames=100):
+        """Create a new `SlowFrameHook`.
+
+        Args:
+          directory (string): The directory to write the frames.
+          threshold (float): The execution time threshold (in milliseconds).
+          image_name (string): The name of the image tensor to write.
+            Defaults to "image".
+          max_frames (int): The maximum number of frames to write. Defaults
+            to 100.
+        """
+        self._directory = directory
+        self._threshold = threshold
+        self._image_name = image_name
+        self._max_frames = max_frames
+        self._lock = threading.Lock()
+        self._slow_count = 0
+        self._paths = []
+
+    @property
+    def slow_count(self):
+        """int: The number of slow calls."""
+        return self._slow_count
+
+    @property
+    def paths(self):
+        """list of string: The paths of the written frames."""
+        with self._lock:
+            return list(self._paths)
+
+    def attach(self):
+        if not os.path.isdir(self._directory):
+            os.makedirs(self._directory)
+
+    def before_execute(self, module, blobs):
+        return time.monotonic()
+
+    def after_execute(self, module, blobs, outputs, state):
+        elapsed = (time.monotonic() - state) * 1000.0
+        if elapsed <= self._threshold:
+            return
+        with self._lock:
+            self._slow_count += 1
+            images = []
+            for blob in blobs:
+                if len(self._paths) >= self._max_frames:
+                    break
+                if blob.has(self._image_name):
+                    file_name = '{}_{:06d}_{:.0f}ms.jpg'.format(
+                        _module_name(module), len(self._paths), elapsed)
+                    path = os.path.join(self._directory, file_name)
+                    self._paths.append(path)
+                    images.append((path, blob.fetch(self._image_name)))
+        for path, image in images:
+            cv2.imwrite(path, image)
@@ -0,0 +1,113 @@
+"""Tests for profiling hooks."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import time
+import tracemalloc
+
+import numpy as np
+
+from jagereye.streaming.hooks.profile_hooks import AllocationHook
+from jagereye.streaming.hooks.profile_hooks import CpuTimeHook
+from jagereye.streaming.hooks.profile_hooks import SlowFrameHook
+from jagereye.streaming.modules.base import IModule
+from jagereye.util.test_util import create_blob
+
+
+class _SleepModule(IModule):
+    """Module that sleeps for a while."""
+
+    def __init__(self, interval):
+        self._interval = interval
+
+    def prepare(self):
+        pass
+
+    def execute(self, blobs):
+        time.sleep(self._interval)
+        return blobs
+
+    def destroy(self):
+        pass
+
+
+class _AllocateModule(IModule):
+    """Module that allocates and retains a buffer per call."""
+
+    def __init__(self):
+        self.buffers = []
+
+    def prepare(self):
+        pass
+
+    def execute(self, blobs):
+        self.buffers.append(bytearray(1024 * 1024))
+        return blobs
+
+    def destroy(self):
+        pass
+
+
+def _call(hook, module, blobs):
+    """Call a module with a hook."""
+    state = hook.before_execute(module, blobs)
+    outputs = module.execute(blobs)
+    hook.after_execute(module, blobs, outputs, state)
+
+
+class TestCpuTimeHook(object):
+    """Tests for CpuTimeHook class."""
+
+    def test_sleep_uses_no_cpu(self):
+        hook = CpuTimeHook()
+        module = _SleepModule(0.05)
+        for _ in range(2):
+            _call(hook, module, [])
+        profile = hook.snapshot()['_SleepModule']
+        assert profile['wall']['count'] == 2
+        assert profile['wall']['min'] >= 50
+        assert profile['cpu_ratio'] < 0.5
+
+
+class TestAllocationHook(object):
+    """Tests for AllocationHook class."""
+
+    def test_retained_allocation(self):
+        hook = AllocationHook(top=3)
+        hook.attach()
+        try:
+            assert tracemalloc.is_tracing()
+            module = _AllocateModule()
+            _call(hook, module, [])
+            profile = hook.snapshot()['_AllocateModule']
+        finally:
+            hook.detach()
+        assert not tracemalloc.is_tracing()
+        assert profile['delta']['count'] == 1
+        assert profile['delta']['max'] >= 1000
+        assert len(profile['top']) == 3
+        assert 'profile_hooks_test.py' in profile['top'][0]
+
+
+class TestSlowFrameHook(object):
+    """Tests for SlowFrameHook class."""
+
+    def test_write_slow_frames(self, tmpdir):
+        directory = os.path.join(str(tmpdir), 'slow')
+        hook = SlowFrameHook(directory, threshold=20, max_frames=3)
+        hook.attach()
+        image = np.full((8, 8, 3), 255, dtype=np.uint8)
+        blobs = [create_blob('image', image) for _ in range(2)]
+        _call(hook, _SleepModule(0.0), blobs)
+        assert hook.slow_count == 0
+        for _ in range(2):
+            _call(hook, _SleepModule(0.03), blobs)
+        assert hook.slow_count == 2
+        paths = hook.paths
+        assert len(paths) == 3
+        for path in paths:
+            assert os.path.basename(path).startswith('_SleepModule_')
+            assert os.path.isfile(path)
@@ -0,0 +1,107 @@
+"""Metrics of module execution."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from jagereye.util.metrics import Histogram
+from jagereye.util.metrics import RateMeter
+from jagereye.util.metrics import exponential_bounds
+
+
+class ModuleMetrics(object):
+    """The metrics of executing a module in a pipeline.
+
+    The metrics include:
+    1. The execution time histogram (in milliseconds) per call.
+    2. The number and the rate (per second) of executed blobs.
+    3. The histogram of the queue depth (in batches or blobs) before the
+       module when a batch is dispatched. Only the first module of a stage
+       has a queue before it, the histogram of other modules is empty.
+    """
+
+    def __init__(self, name, window=5.0):
+        """Create a new `ModuleMetrics`.
+
+        Args:
+          name (string): The name of the module.
+          window (float): The length (in seconds) of the sliding window to
+            measure the rate of blobs. Defaults to 5.0.
+        """
+        self._name = name
+        # From 0.01 ms to about 10 s.
+        self._time_histogram = Histogram(exponential_bounds(0.01, 2, 20))
+        self._queue_depth_histogram = Histogram(exponential_bounds(1, 2, 12))
+        self._blob_meter = RateMeter(window)
+
+    @property
+    def name(self):
+        """string: The name of the module."""
+        return self._name
+
+    @property
+    def time_histogram(self):
+        """`Histogram`: The execution time (in milliseconds) per call."""
+        return self._time_histogram
+
+    @property
+    def queue_depth_histogram(self):
+        """`Histogram`: The queue depth before the module."""
+        return self._queue_depth_histogram
+
+    @property
+    def call_count(self):
+        """int: The number of calls."""
+        return self._time_histogram.count
+
+    @property
+    def blob_count(self):
+        """int: The number of executed blobs."""
+        return self._blob_meter.count
+
+    def blobs_per_sec(self):
+        """Measure the rate of executed blobs.
+
+        Returns:
+          float: The executed blobs per second.
+        """
+        return self._blob_meter.rate()
+
+    def observe(self, elapsed, num_blobs):
+        """Observe a call of the module.
+
+        Args:
+          elapsed (float): The execution time (in milliseconds).
+          num_blobs (int): The number of input blobs.
+        """
+        self._time_histogram.observe(elapsed)
+        self._blob_meter.mark(num_blobs)
+
+    def observe_queue_depth(self, depth):
+        """Observe the queue depth before the module.
+
+        Args:
+          depth (int): The queue depth.
+        """
+        self._queue_depth_histogram.observe(depth)
+
+    def snapshot(self):
+        """Take a snapshot of the metrics.
+
+        Returns:
+          dict: The snapshot, which contains:
+            name (string): The name of the module.
+            calls (int): The number of calls.
+            blobs (int): The number of executed blobs.
+            blobs_per_sec (float): The executed blobs per second.
+            time (dict): The snapshot of the execution time histogram.
+            queue_depth (dict): The snapshot of the queue depth histogram.
+        """
+        return {
+            'name': self._name,
+            'calls': self.call_count,
+            'blobs': self.blob_count,
+            'blobs_per_sec': self.blobs_per_sec(),
+            'time': self._time_histogram.snapshot(),
+            'queue_depth': self._queue_depth_histogram.snapshot(),
+        }
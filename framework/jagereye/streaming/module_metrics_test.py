@@ -0,0 +1,32 @@
+"""Tests for module metrics."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from jagereye.streaming.module_metrics import ModuleMetrics
+
+
+class TestModuleMetrics(object):
+    """Tests for ModuleMetrics class."""
+
+    def test_observe(self):
+        metrics = ModuleMetrics('0:Module')
+        metrics.observe(2.0, 4)
+        metrics.observe(4.0, 2)
+        assert metrics.name == '0:Module'
+        assert metrics.call_count == 2
+        assert metrics.blob_count == 6
+        assert metrics.time_histogram.mean == 3.0
+        assert metrics.blobs_per_sec() > 0
+
+    def test_snapshot(self):
+        metrics = ModuleMetrics('module')
+        metrics.observe(1.0, 1)
+        metrics.observe_queue_depth(3)
+        snapshot = metrics.snapshot()
+        assert snapshot['name'] == 'module'
+        assert snapshot['calls'] == 1
+        assert snapshot['blobs'] == 1
+        assert snapshot['time']['count'] == 1
+        assert snapshot['queue_depth']['max'] == 3
@@ -52,9 +52,8 @@ class DisplayModule(IModule):
         Raises:
             RuntimeError: If the input tensor is not 3-dimensional.
         """
-        if blobs:
-            # TODO(JiaKuan Su): Handle multiple blobs.
-            image = blobs[0].fetch(self._image_name)
+        for blob in blobs:
+            image = blob.fetch(self._image_name)
             if image.ndim != 2 and image.ndim != 3:
                 raise RuntimeError('The input "image" tensor is not '
                                    '2 or 3-dimensional.')
@@ -111,35 +111,33 @@ class ImageSaveModule(IModule):
         Raises:
             RuntimeError: If the input "image" tensor is not 2 or 3-dimensional.
         """
-        # TODO(JiaKuan Su): Currently, I only handle the case for batch_size=1,
-        # please help complete the case for batch_size>1.
-        blob = blobs[0]
-
-        if blob.has('to_save') and blob.fetch('to_save').tolist():
-            image = blob.fetch(self._image_name)
-            timestamp = blob.fetch('timestamp').tolist()
-
-            if image.ndim != 2 and image.ndim != 3:
-                raise RuntimeError('The input "image" tensor is not '
-                                   '3-dimensional.')
-
-            origianl_width = image.shape[1]
-            if self._max_width > 0 and origianl_width > self._max_width:
-                ratio = self._max_width / origianl_width
-                image = cv2.resize(image, (0, 0), fx=ratio, fy=ratio)
-
-            # Construct the image file name.
-            image_file = '{}.{}'.format(timestamp, self._image_format)
-            abs_image_name = _abs_file_name(self._files_dir, image_file)
-            relative_image_name = _relative_file_name(self._files_dir,
-                                                      image_file)
-            # Save Image to disk.
-            cv2.imwrite(abs_image_name, image)
-            logging.info('Save image: {}'.format(abs_image_name))
-
-            # Feed the relative image file name to blob.
-            blob.feed('abs_image_name', np.array(abs_image_name))
-            blob.feed('relative_image_name', np.array(relative_image_name))
+        for blob in blobs:
+            if blob.has('to_save') and blob.fetch('to_save').tolist():
+                image = blob.fetch(self._image_name)
+                timestamp = blob.fetch('timestamp').tolist()
+
+                if image.ndim != 2 and image.ndim != 3:
+                    raise RuntimeError('The input "image" tensor is not '
+                                       '3-dimensional.')
+
+                origianl_width = image.shape[1]
+                if self._max_width > 0 and origianl_width > self._max_width:
+                    ratio = self._max_width / origianl_width
+                    image = cv2.resize(image, (0, 0), fx=ratio, fy=ratio)
+
+                # Construct the image file name.
+                image_file = '{}.{}'.format(timestamp, self._image_format)
+                abs_image_name = _abs_file_name(self._files_dir, image_file)
+                relative_image_name = _relative_file_name(self._files_dir,
+                                                          image_file)
+                # Save Image to disk.
+                cv2.imwrite(abs_image_name, image)
+                logging.info('Save image: {}'.format(abs_image_name))
+
+                # Feed the relative image file name to blob.
+                blob.feed('abs_image_name', np.array(abs_image_name))
+                blob.feed('relative_image_name',
+                          np.array(relative_image_name))
 
         return blobs
 
@@ -0,0 +1,425 @@
+"""Modules to execute other modules in worker processes."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import multiprocessing
+
+import numpy as np
+
+try:
+    from multiprocessing import resource_tracker
+    from multiprocessing import shared_memory
+except ImportError:
+    # Shared memory is only available since Python 3.8.
+    resource_tracker = None
+    shared_memory = None
+
+from jagereye.streaming.blob import Blob
+from jagereye.streaming.modules.base import IModule
+
+
+# Tensors smaller than the size (in bytes) are pickled instead of being put
+# into shared memory.
+_INLINE_LIMIT = 4096
+# The alignment (in bytes) of tensors in shared memory.
+_ALIGNMENT = 64
+
+
+def _align(size):
+    """Align a size to the tensor alignment."""
+    return (size + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+class _SharedArena(object):
+    """Inner growable shared memory to pass tensors to another process.
+
+    The arena is reused by every call, and it is re-created with a larger
+    size when the tensors do not fit.
+    """
+
+    def __init__(self):
+        self._shm = None
+
+    def pack(self, tensors):
+        """Copy tensors into the arena.
+
+        Args:
+          tensors (list of numpy `ndarray`): The tensors to copy.
+
+        Returns:
+          tuple: The packing result. The tuple contains:
+            name (string): The name of the shared memory, or None if no tensor
+              is given.
+            offsets (list of int): The offset of each tensor.
+        """
+        offsets = []
+        size = 0
+        for tensor in tensors:
+            offsets.append(size)
+            size += _align(tensor.nbytes)
+        if size == 0:
+            return None, offsets
+
+        if self._shm is None or self._shm.size < size:
+            self.close()
+            # Grow geometrically to avoid re-creating for slightly larger
+            # batches.
+            self._shm = shared_memory.SharedMemory(create=True, size=size * 2)
+        for tensor, offset in zip(tensors, offsets):
+            view = np.ndarray(tensor.shape,
+                              dtype=tensor.dtype,
+                              buffer=self._shm.buf,
+                              offset=offset)
+            view[...] = tensor
+            del view
+        return self._shm.name, offsets
+
+    def close(self):
+        """Destroy the shared memory."""
+        if not self._shm is None:
+            try:
+                self._shm.close()
+            except BufferError:
+                # Some views are still referenced, the memory will be released
+                # when they are garbage collected. The name is unlinked anyway,
+                # so it does not leak after the process exits.
+                pass
+            self._shm.unlink()
+            self._shm = None
+
+
+class _SharedReader(object):
+    """Inner reader of tensors in the shared memory of another process."""
+
+    def __init__(self):
+        self._shm = None
+
+    def view(self, name, offset, shape, dtype):
+        """Get a view of a tensor in shared memory.
+
+        Args:
+          name (string): The name of the shared memory.
+          offset (int): The offset of the tensor.
+          shape (tuple): The shape of the tensor.
+          dtype (string): The data type of the tensor.
+
+        Returns:
+          numpy `ndarray`: The view of the tensor.
+        """
+        if self._shm is None or self._shm.name != name:
+            self.close()
+            self._shm = shared_memory.SharedMemory(name=name)
+        return np.ndarray(shape,
+                          dtype=np.dtype(dtype),
+                          buffer=self._shm.buf,
+                          offset=offset)
+
+    def close(self):
+        """Detach from the shared memory."""
+        if not self._shm is None:
+            try:
+                self._shm.close()
+            except BufferError:
+                # Some views are still referenced, the memory will be released
+                # when they are garbage collected.
+                pass
+            self._shm = None
+
+
+def _encode(blobs, arena, same_tensors=None):
+    """Encode blobs into a message and put large tensors into shared memory.
+
+    Args:
+      blobs (list of `Blob`): The blobs to encode.
+      arena (`_SharedArena`): The arena to put large tensors.
+      same_tensors (list of dict): For each blob, the tensors that are known
+        by the receiver, indexed by names. They are sent as references instead
+        of data. Defaults to None.
+
+    Returns:
+      tuple: The message. The tuple contains:
+        shm_name (string): The name of shared memory.
+        entries (list of list of tuple): The encoded tensors of each blob.
+    """
+    # pylint: disable=protected-access
+    large_tensors = []
+    entries = []
+    for i, blob in enumerate(blobs):
+        known = same_tensors[i] if not same_tensors is None else dict()
+        blob_entries = []
+        for name, tensor in blob._data.items():
+            if known.get(name) is tensor:
+                blob_entries.append((name, 'same', None))
+            elif tensor.nbytes < _INLINE_LIMIT:
+                blob_entries.append((name, 'inline', tensor))
+            else:
+                blob_entries.append((name, 'shm', len(large_tensors)))
+                large_tensors.append(tensor)
+        entries.append(blob_entries)
+
+    shm_name, offsets = arena.pack(large_tensors)
+    for blob_entries in entries:
+        for k, (name, kind, value) in enumerate(blob_entries):
+            if kind == 'shm':
+                tensor = large_tensors[value]
+                blob_entries[k] = (name, kind, (offsets[value],
+                                                tensor.shape,
+                                                tensor.dtype.str))
+    return shm_name, entries
+
+
+def _serve(module_fn, conn, copy_inputs):
+    """Worker function of a module process.
+
+    Args:
+      module_fn (function): The function to create the module.
+      conn (`multiprocessing.Connection`): The connection to the parent.
+      copy_inputs (bool): Copy input tensors out of shared memory or not.
+    """
+    # pylint: disable=protected-access
+    reader = _SharedReader()
+    arena = _SharedArena()
+    try:
+        module = module_fn()
+        module.prepare()
+        conn.send(('READY', None))
+    except Exception as e: # pylint: disable=broad-except
+        conn.send(('ERROR', repr(e)))
+        return
+
+    while True:
+        command, payload = conn.recv()
+        if command == 'DESTROY':
+            break
+        try:
+            shm_name, entries = payload
+            blobs = []
+            for blob_entries in entries:
+                blob = Blob()
+                for name, kind, value in blob_entries:
+                    if kind == 'inline':
+                        tensor = value
+                    else:
+                        tensor = reader.view(shm_name, *value)
+                        if copy_inputs:
+                            # The shared memory is overwritten by the next
+                            # call, copy out for modules that retain inputs.
+                            tensor = np.copy(tensor)
+                    # Inputs are read-only and copied on writable fetch, like
+                    # copy-on-write blobs, so in-place changes are not lost.
+                    tensor.setflags(write=False)
+                    blob.feed_unchecked(name, tensor)
+                    blob._shared.add(name)
+                blobs.append(blob)
+            inputs = [dict(blob._data) for blob in blobs]
+
+            out_blobs = module.execute(blobs)
+
+            # Tell which input blob each output blob comes from, and send the
+            # unchanged tensors as references.
+            indexes = []
+            same_tensors = []
+            for out_blob in out_blobs:
+                index = next((i for i, blob in enumerate(blobs)
+                              if blob is out_blob), -1)
+                indexes.append(index)
+                same_tensors.append(inputs[index] if index >= 0 else dict())
+            result = _encode(out_blobs, arena, same_tensors)
+            # Drop the views before the next message.
+            del blobs, inputs, out_blobs, same_tensors
+            conn.send(('OK', (indexes, result)))
+        except Exception as e: # pylint: disable=broad-except
+            conn.send(('ERROR', repr(e)))
+
+    try:
+        module.destroy()
+    finally:
+        reader.close()
+        arena.close()
+        conn.close()
+
+
+class ProcessModule(IModule):
+    """The module to execute another module in worker processes.
+
+    The module runs a module in one or more worker processes, so CPU-bound
+    work does not contend on the GIL with the capture and other modules. Large
+    tensors move between processes through shared memory instead of being
+    pickled, small tensors are pickled. The module in worker processes is
+    created by a given function, so that heavy resources are created in the
+    worker processes.
+
+    When there are multiple processes, each batch is split into contiguous
+    chunks, one for each process, and the results are concatenated in order.
+    Since each process has its own module instance, multiple processes should
+    only be used for stateless modules.
+
+    The large input tensors are passed through shared memory that is
+    overwritten by every call. By default, the worker process copies them out
+    before executing, so a module can retain input tensors across calls, such
+    as the last frame of motion detection. If copy_inputs is False, the module
+    gets views of the shared memory without the copy, and a retained input
+    tensor silently changes to the tensor of the next call, so it must only
+    be used for modules that copy what they retain.
+    """
+
+    def __init__(self, module_fn, num_processes=1, copy_inputs=True):
+        """Create a new `ProcessModule`.
+
+        Args:
+          module_fn (function): The function to create the module to execute.
+            It is called in worker processes, so it must be picklable if the
+            start method of multiprocessing is not "fork".
+          num_processes (int): The number of worker processes. Defaults to 1.
+          copy_inputs (bool): Copy the large input tensors out of shared
+            memory in worker processes or not. Defaults to True.
+
+        Raises:
+          ValueError: if num_processes < 1.
+          RuntimeError: if shared memory is not supported.
+        """
+        if num_processes < 1:
+            raise ValueError('Number of processes must be at least 1.')
+        if shared_memory is None:
+            raise RuntimeError('Shared memory is not supported.')
+        self._module_fn = module_fn
+        self._num_processes = num_processes
+        self._copy_inputs = copy_inputs
+        self._processes = []
+        self._conns = []
+        self._arenas = []
+        self._readers = []
+
+    @property
+    def num_processes(self):
+        """int: The number of worker processes."""
+        return self._num_processes
+
+    def prepare(self):
+        """The routine of process module preparation to start the worker
+        processes.
+
+        Raises:
+          RuntimeError: If the module fails to prepare in a worker process.
+        """
+        # Share one resource tracker with the worker processes, so shared
+        # memory is only unlinked by its creator.
+        resource_tracker.ensure_running()
+        for _ in range(self._num_processes):
+            parent_conn, child_conn = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_serve,
+                                              args=(self._module_fn,
+                                                    child_conn,
+                                                    self._copy_inputs))
+            process.daemon = True
+            process.start()
+            self._processes.append(process)
+            self._conns.append(parent_conn)
+            self._arenas.append(_SharedArena())
+            self._readers.append(_SharedReader())
+        errors = []
+        for conn in self._conns:
+            status, payload = conn.recv()
+            if status != 'READY':
+                errors.append(payload)
+        if errors:
+            for process in self._processes:
+                process.terminate()
+            self._release()
+            raise RuntimeError('Fail to prepare module in worker process: '
+                               '{}'.format(errors[0]))
+
+    def execute(self, blobs):
+        """The routine of process module execution.
+
+        Args:
+          blobs (list of `Blob`): The input blobs for execution.
+
+        Returns:
+          list of `Blob`: The executed blobs. The input blobs that are
+            returned by the module are updated in place.
+
+        Raises:
+          RuntimeError: If the module fails in a worker process.
+        """
+        if not blobs:
+            return blobs
+
+        # Split the batch into contiguous chunks.
+        num_chunks = min(self._num_processes, len(blobs))
+        chunk_size = (len(blobs) + num_chunks - 1) // num_chunks
+        chunks = [blobs[i:i + chunk_size]
+                  for i in range(0, len(blobs), chunk_size)]
+
+        for chunk, conn, arena in zip(chunks, self._conns, self._arenas):
+            conn.send(('EXECUTE', _encode(chunk, arena)))
+
+        out_blobs = []
+        errors = []
+        for chunk, conn, reader in zip(chunks, self._conns, self._readers):
+            status, payload = conn.recv()
+            if status != 'OK':
+                errors.append(payload)
+                continue
+            out_blobs.extend(self._decode(chunk, payload, reader))
+        if errors:
+            raise RuntimeError('Fail to execute module in worker process: {}'
+                               .format(errors[0]))
+
+        return out_blobs
+
+    def destroy(self):
+        """The routine of process module destruction to stop the worker
+        processes."""
+        for conn in self._conns:
+            conn.send(('DESTROY', None))
+        self._release()
+
+    def _release(self):
+        """Wait for the worker processes and release their resources."""
+        for process in self._processes:
+            process.join()
+        for conn, arena, reader in zip(self._conns,
+                                       self._arenas,
+                                       self._readers):
+            conn.close()
+            arena.close()
+            reader.close()
+        self._processes = []
+        self._conns = []
+        self._arenas = []
+        self._readers = []
+
+    def _decode(self, chunk, payload, reader):
+        """Decode the executed blobs from a worker process.
+
+        Args:
+          chunk (list of `Blob`): The input blobs sent to the process.
+          payload (tuple): The result from the process.
+          reader (`_SharedReader`): The reader of the process shared memory.
+
+        Returns:
+          list of `Blob`: The executed blobs.
+        """
+        indexes, (shm_name, entries) = payload
+        out_blobs = []
+        for index, blob_entries in zip(indexes, entries):
+            blob = chunk[index] if index >= 0 else Blob()
+            names = set()
+            for name, kind, value in blob_entries:
+                names.add(name)
+                if kind == 'same':
+                    continue
+                if kind == 'inline':
+                    tensor = value
+                else:
+                    # Copy out since the process reuses its shared memory.
+                    tensor = np.copy(reader.view(shm_name, *value))
+                blob.feed_unchecked(name, tensor)
+            for name in list(blob._data): # pylint: disable=protected-access
+                if not name in names:
+                    blob.remove(name)
+            out_blobs.append(blob)
+        return out_blobs
@@ -0,0 +1,224 @@
+"""Tests for process modules."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+
+import numpy as np
+import pytest
+
+from jagereye.streaming.blob import Blob
+from jagereye.streaming.modules.base import IModule
+from jagereye.streaming.modules.grayscale_modules import GrayscaleModule
+from jagereye.streaming.modules import process_modules
+from jagereye.streaming.modules.process_modules import ProcessModule
+from jagereye.util.test_util import create_blob
+from jagereye.util.test_util import create_image_full
+
+pytestmark = pytest.mark.skipif(process_modules.shared_memory is None,
+                                reason='Shared memory is not supported.')
+
+
+class _PidModule(IModule):
+    """Module that records the process ID and modifies tensors."""
+
+    def prepare(self):
+        pass
+
+    def execute(self, blobs):
+        for blob in blobs:
+            blob.feed('pid', np.array(os.getpid()))
+            image = blob.fetch('image', writable=True)
+            image += 1
+            if blob.has('removed'):
+                blob.remove('removed')
+        return blobs
+
+    def destroy(self):
+        pass
+
+
+class _DropModule(IModule):
+    """Module that drops every other blob and creates a new one."""
+
+    def prepare(self):
+        pass
+
+    def execute(self, blobs):
+        new_blob = Blob()
+        new_blob.feed('image', np.full((100, 100), 7, dtype=np.uint8))
+        return blobs[::2] + [new_blob]
+
+    def destroy(self):
+        pass
+
+
+class _RetainModule(IModule):
+    """Module that retains the last input image and outputs it."""
+
+    def __init__(self):
+        self._last_image = None
+
+    def prepare(self):
+        pass
+
+    def execute(self, blobs):
+        for blob in blobs:
+            image = blob.fetch('image')
+            if not self._last_image is None:
+                blob.feed('last_image', np.copy(self._last_image))
+            self._last_image = image
+        return blobs
+
+    def destroy(self):
+        pass
+
+
+class _FailModule(IModule):
+    """Module that fails on execution."""
+
+    def prepare(self):
+        pass
+
+    def execute(self, blobs):
+        raise ValueError('failed')
+
+    def destroy(self):
+        pass
+
+
+class _FailPrepareModule(_FailModule):
+    """Module that fails on preparation."""
+
+    def prepare(self):
+        raise ValueError('failed')
+
+
+class TestSharedArena(object):
+    """Tests for _SharedArena class."""
+
+    def test_close_with_referenced_buffer(self):
+        # pylint: disable=protected-access
+        arena = process_modules._SharedArena()
+        name, offsets = arena.pack([np.arange(16, dtype=np.uint8)])
+        # A slice of the buffer keeps it exported, so it can not be closed.
+        shm = arena._shm
+        buf = shm.buf[offsets[0]:offsets[0] + 16]
+        arena.close()
+        # The shared memory is unlinked even if the buffer is referenced.
+        with pytest.raises(FileNotFoundError):
+            process_modules.shared_memory.SharedMemory(name=name)
+        assert buf[15] == 15
+        buf.release()
+        shm.close()
+
+
+class TestProcessModule(object):
+    """Tests for ProcessModule class."""
+
+    def test_create_invalid_num_processes(self):
+        with pytest.raises(ValueError):
+            ProcessModule(GrayscaleModule, num_processes=0)
+
+    def test_execute_grayscale(self):
+        module = ProcessModule(GrayscaleModule)
+        module.prepare()
+        try:
+            blob = create_blob('image', create_image_full([10, 20, 30]))
+            exe_blob = module.execute([blob])[0]
+            assert exe_blob is blob
+            np.testing.assert_equal(exe_blob.fetch('gray_image'),
+                                    create_image_full([22]))
+        finally:
+            module.destroy()
+
+    def test_execute_in_place_changes(self):
+        module = ProcessModule(_PidModule)
+        module.prepare()
+        try:
+            image = np.zeros((100, 100, 3), dtype=np.uint8)
+            blob = create_blob('image', image)
+            blob.feed('removed', np.zeros((100, 100), dtype=np.uint8))
+            blob.feed('timestamp', np.array(1.0))
+            timestamp = blob.fetch('timestamp')
+            exe_blob = module.execute([blob])[0]
+            assert int(exe_blob.fetch('pid')) != os.getpid()
+            np.testing.assert_equal(exe_blob.fetch('image'), image + 1)
+            # Unchanged tensors are kept as they are.
+            assert exe_blob.fetch('timestamp') is timestamp
+            assert not exe_blob.has('removed')
+        finally:
+            module.destroy()
+
+    @pytest.mark.parametrize('copy_inputs', [True, False])
+    def test_execute_retained_inputs(self, copy_inputs):
+        module = ProcessModule(_RetainModule, copy_inputs=copy_inputs)
+        module.prepare()
+        try:
+            module.execute([create_blob('image', create_image_full([1]))])
+            blob = create_blob('image', create_image_full([2]))
+            last_image = module.execute([blob])[0].fetch('last_image')
+            if copy_inputs:
+                np.testing.assert_equal(last_image, create_image_full([1]))
+            else:
+                # The retained view of shared memory is overwritten by the
+                # input of the next call.
+                np.testing.assert_equal(last_image, create_image_full([2]))
+        finally:
+            module.destroy()
+
+    def test_execute_multiple_processes(self):
+        module = ProcessModule(_PidModule, num_processes=2)
+        module.prepare()
+        try:
+            blobs = [create_blob('image', create_image_full([i, i, i]))
+                     for i in range(5)]
+            exe_blobs = module.execute(blobs)
+            assert exe_blobs == blobs
+            for i, blob in enumerate(exe_blobs):
+                np.testing.assert_equal(blob.fetch('image'),
+                                        create_image_full([i + 1] * 3))
+            pids = set(int(blob.fetch('pid')) for blob in exe_blobs)
+            assert len(pids) == 2
+        finally:
+            module.destroy()
+
+    def test_execute_filtered_and_new_blobs(self):
+        module = ProcessModule(_DropModule)
+        module.prepare()
+        try:
+            blobs = [create_blob('image', create_image_full([i, i, i]))
+                     for i in range(3)]
+            exe_blobs = module.execute(blobs)
+            assert len(exe_blobs) == 3
+            assert exe_blobs[0] is blobs[0]
+            assert exe_blobs[1] is blobs[2]
+            np.testing.assert_equal(exe_blobs[2].fetch('image'),
+                                    np.full((100, 100), 7, dtype=np.uint8))
+        finally:
+            module.destroy()
+
+    def test_execute_empty(self):
+        module = ProcessModule(GrayscaleModule)
+        module.prepare()
+        try:
+            assert module.execute([]) == []
+        finally:
+            module.destroy()
+
+    def test_execute_failure(self):
+        module = ProcessModule(_FailModule)
+        module.prepare()
+        try:
+            blob = create_blob('image', create_image_full([10, 20, 30]))
+            with pytest.raises(RuntimeError):
+                module.execute([blob])
+        finally:
+            module.destroy()
+
+    def test_prepare_failure(self):
+        module = ProcessModule(_FailPrepareModule)
+        with pytest.raises(RuntimeError):
+            module.prepare()
@@ -5,59 +5,532 @@ from __future__ import division
 from __future__ import print_function
 
 import threading
+from queue import Empty
+from queue import Full
 from queue import Queue
 import time
 
+import numpy as np
+
+from jagereye.streaming.blob import SOURCE_ID_NAME
+from jagereye.streaming.capture_metrics import CaptureMetrics
 from jagereye.streaming.exceptions import EndOfVideoError
 from jagereye.streaming.exceptions import RetryError
 from jagereye.streaming.capturers.base import ICapturer
+from jagereye.streaming.frame_queue import FrameQueue
+from jagereye.streaming.hooks.base import IExecuteHook
 from jagereye.streaming.modules.base import IModule
+from jagereye.streaming.module_metrics import ModuleMetrics
 from jagereye.util import logging
+from jagereye.util.metrics import Histogram
+from jagereye.util.metrics import exponential_bounds
 
 
-def _receive(capturer, cap_interval, queue, retry_interval, stop_event):
-    """Worker function to receive blobs from a capturer."""
-    cap_interval_sec = cap_interval / 1000.0
-    retry_interval_sec = retry_interval / 1000.0
+# The marker put after the last blob when the pipeline drains on end.
+_END_OF_STREAM = object()
+
+
+class _Batch(object):
+    """Inner class for a batch of blobs passed between stages."""
+
+    __slots__ = ('blobs', 'capture_times', 'enqueue_times')
+
+    def __init__(self, blobs, capture_times, enqueue_times):
+        # The blobs of the batch.
+        self.blobs = blobs
+        # The monotonic times when the blobs are captured.
+        self.capture_times = capture_times
+        # The monotonic times when the blobs are put into the stage queue.
+        self.enqueue_times = enqueue_times
+
+
+def _unpack(items):
+    """Make a batch from the (blob, capture time) items of a frame queue."""
+    capture_times = [capture_time for _, capture_time in items]
+    return _Batch([blob for blob, _ in items], capture_times, capture_times)
+
+
+class _StageMetrics(object):
+    """Inner class for the metrics of a stage."""
+
+    def __init__(self, module_metrics, queue_wait_histogram,
+                 latency_histogram=None):
+        # The metrics of the modules in the stage.
+        self.module_metrics = module_metrics
+        # The histogram of time (in milliseconds) waiting in the stage queue.
+        self.queue_wait_histogram = queue_wait_histogram
+        # The histogram of frame latency (in milliseconds) from capturing to
+        # the end of the stage, only for the last stage.
+        self.latency_histogram = latency_histogram
+
+
+class _HookEntry(object):
+    """Inner class for a hook attached to a module."""
+
+    __slots__ = ('hook', 'sample_interval', 'count')
+
+    def __init__(self, hook, sample_interval):
+        self.hook = hook
+        self.sample_interval = sample_interval
+        # The number of blobs the module has executed since the hook is
+        # attached.
+        self.count = 0
+
+    def sample(self, num_blobs):
+        """Check whether a call contains a sampled blob, which is 1 in every
+        sample interval blobs."""
+        first = self.count
+        self.count += num_blobs
+        interval = self.sample_interval
+        return (first + num_blobs - 1) // interval >= \
+               (first + interval - 1) // interval
+
+
+class _HookSlot(object):
+    """Inner class for the hooks attached to a module. The entries are
+    replaced instead of modified, so hooks can be added and removed while the
+    module is executing."""
+
+    __slots__ = ('entries',)
+
+    def __init__(self):
+        self.entries = ()
+
+
+def _call_hook(hook_fn, *args):
+    """Call a hook function and log the exception from it."""
+    try:
+        return hook_fn(*args)
+    except Exception as e: # pylint: disable=broad-except
+        logging.error('Exception from hook: {}'.format(e))
+        return None
+
+
+def _execute_module(module, blobs, slot=None):
+    """Execute a module with the hooks attached to it.
+
+    Args:
+      module (`IModule`): The module to execute.
+      blobs (list of `Blob`): The input blobs.
+      slot (`_HookSlot`): The hooks attached to the module. Defaults to None.
+
+    Returns:
+      list of `Blob`: The executed blobs.
+    """
+    entries = () if slot is None else slot.entries
+    if not entries:
+        return module.execute(blobs)
+    states = []
+    for entry in entries:
+        if entry.sample(len(blobs)):
+            states.append((entry.hook, _call_hook(entry.hook.before_execute,
+                                                  module,
+                                                  blobs)))
+    outputs = module.execute(blobs)
+    for hook, state in reversed(states):
+        _call_hook(hook.after_execute, module, blobs, outputs, state)
+    return outputs
+
+
+def _put(queue, item, stop_event, timeout=0.1):
+    """Put an item into a queue without blocking the pipeline stopping.
+
+    Args:
+      queue (`queue.Queue`): The queue to put the item.
+      item (object): The item to put.
+      stop_event (`threading.Event`): The event to give up putting.
+      timeout (float): The interval (in seconds) to check the stop event when
+        the queue is full. Defaults to 0.1.
+    """
     while not stop_event.is_set():
-        sleep_interval = cap_interval_sec
+        try:
+            queue.put(item, timeout=timeout)
+            return
+        except Full:
+            continue
+
+
+def _put_end(queue, stop_event):
+    """Put the end of stream marker into a queue.
 
+    The marker bypasses the overflow policy of `FrameQueue`, so it is never
+    dropped.
+
+    Args:
+      queue (`queue.Queue`): The queue to put the marker.
+      stop_event (`threading.Event`): The event to give up putting.
+    """
+    while not stop_event.is_set():
         try:
-            blob = capturer.capture()
-            if not blob is None:
-                queue.put(blob)
-        except RetryError as e:
-            logging.warn('Retry request from capturer: {}'.format(e))
-            sleep_interval = retry_interval_sec
-        except EndOfVideoError as e:
-            logging.info('End of file from capturer: {}'.format(e))
-            stop_event.set()
-        except Exception as e: # pylint: disable=broad-except
-            # TODO(JiaKuan Su): Handle more exception cases.
-            logging.error('Exception from capturer: {}'.format(e))
+            Queue.put(queue, _END_OF_STREAM, timeout=0.1)
+            return
+        except Full:
+            continue
+
+
+def _is_done(stop_event, end_event):
+    """Check whether a receiving thread should exit or not."""
+    return stop_event.is_set() or (not end_event is None and
+                                   end_event.is_set())
+
+
+def _finish(stop_event, out_queue=None):
+    """Finish the execution of a drained stage.
+
+    Args:
+      stop_event (`threading.Event`): The event to set if it is the last
+        stage.
+      out_queue (`queue.Queue`): The queue of the next stage to put the end
+        of stream marker. Defaults to None.
+    """
+    if out_queue is None:
+        stop_event.set()
+    else:
+        _put(out_queue, _END_OF_STREAM, stop_event)
+
+
+def _capture(capturer, queue, stop_event, end_event=None, metrics=None):
+    """Capture a blob from a capturer and put it into the queue.
+
+    Args:
+      capturer (`ICapturer`): The capturer to capture from.
+      queue (`queue.Queue`): The queue to put the captured blob.
+      stop_event (`threading.Event`): The event to set when the capturer
+        can't capture anymore.
+      end_event (`threading.Event`): The event to set after putting the end
+        of stream marker when the capturer ends. If it is None, the stop event
+        is set instead, and the queued blobs are discarded. Defaults to None.
+      metrics (`CaptureMetrics`): The metrics to record the capture latency,
+        the captured, dropped frames and retries. Defaults to None.
+
+    Returns:
+      bool: True if the capturer requests a retry, False otherwise.
+    """
+    try:
+        start = time.monotonic()
+        blob = capturer.capture()
+        if not blob is None:
+            capture_time = time.monotonic()
+            if metrics is None:
+                _put(queue, (blob, capture_time), stop_event)
+            else:
+                metrics.observe_latency((capture_time - start) * 1000.0)
+                dropped_count = queue.dropped_count
+                _put(queue, (blob, capture_time), stop_event)
+                metrics.mark_captured()
+                metrics.mark_dropped(queue.dropped_count - dropped_count)
+    except RetryError as e:
+        logging.warn('Retry request from capturer: {}'.format(e))
+        if not metrics is None:
+            metrics.mark_retry()
+        return True
+    except EndOfVideoError as e:
+        logging.info('End of file from capturer: {}'.format(e))
+        if end_event is None:
             stop_event.set()
+        else:
+            _put_end(queue, stop_event)
+            end_event.set()
+    except Exception as e: # pylint: disable=broad-except
+        # TODO(JiaKuan Su): Handle more exception cases.
+        logging.error('Exception from capturer: {}'.format(e))
+        stop_event.set()
+    return False
 
-        time.sleep(sleep_interval)
 
+def _execute(modules,
+             batch,
+             stop_event,
+             out_queue=None,
+             metrics=None,
+             queue_depth=0,
+             hooks=None):
+    """Execute the modules on a batch of blobs.
 
-def _operate(modules, batch_size, wait_interval, queue, stop_event):
+    Args:
+      modules (list of `IModule`): The modules to execute in order.
+      batch (`_Batch`): The batch of blobs to execute.
+      stop_event (`threading.Event`): The event to set when a module fails.
+      out_queue (`queue.Queue`): The queue of the next stage to put the
+        executed batch. Defaults to None.
+      metrics (`_StageMetrics`): The metrics to record the execution. Defaults
+        to None.
+      queue_depth (int): The depth of the input queue when the batch is
+        dispatched. Defaults to 0.
+      hooks (list of `_HookSlot`): The hooks attached to the modules.
+        Defaults to None.
+    """
+    if hooks is None:
+        hooks = [None] * len(modules)
+    blobs = batch.blobs
+    try:
+        if metrics is None:
+            for module, slot in zip(modules, hooks):
+                blobs = _execute_module(module, blobs, slot)
+        else:
+            start = time.monotonic()
+            for enqueue_time in batch.enqueue_times:
+                metrics.queue_wait_histogram.observe(
+                    (start - enqueue_time) * 1000.0)
+            metrics.module_metrics[0].observe_queue_depth(queue_depth)
+            for module, module_metrics, slot in zip(modules,
+                                                    metrics.module_metrics,
+                                                    hooks):
+                num_blobs = len(blobs)
+                blobs = _execute_module(module, blobs, slot)
+                end = time.monotonic()
+                module_metrics.observe((end - start) * 1000.0, num_blobs)
+                start = end
+            if not metrics.latency_histogram is None:
+                for capture_time in batch.capture_times:
+                    metrics.latency_histogram.observe(
+                        (end - capture_time) * 1000.0)
+    except Exception as e: # pylint: disable=broad-except
+        # TODO(JiaKuan Su): Handle more exception cases.
+        logging.error('Exception from modules: {}'.format(e))
+        stop_event.set()
+        return
+
+    if not out_queue is None and blobs:
+        enqueue_time = time.monotonic()
+        _put(out_queue,
+             _Batch(blobs,
+                    batch.capture_times,
+                    [enqueue_time] * len(batch.capture_times)),
+             stop_event)
+
+
+def _receive(capturer,
+             cap_interval,
+             queue,
+             retry_interval,
+             stop_event,
+             end_event=None,
+             metrics=None):
+    """Worker function to receive blobs from a capturer."""
+    cap_interval_sec = cap_interval / 1000.0
+    retry_interval_sec = retry_interval / 1000.0
+    last_time = None
+    while not _is_done(stop_event, end_event):
+        last_time = _observe_spacing(metrics, last_time, cap_interval)
+        if _capture(capturer, queue, stop_event, end_event, metrics):
+            last_time = None
+            time.sleep(retry_interval_sec)
+        else:
+            time.sleep(cap_interval_sec)
+
+
+def _observe_spacing(metrics, last_time, cap_interval):
+    """Observe the spacing from the last capture to now.
+
+    Args:
+      metrics (`CaptureMetrics`): The metrics to observe, or None.
+      last_time (float): The monotonic time of the last capture, or None.
+      cap_interval (float): The expected spacing (in milliseconds).
+
+    Returns:
+      float: The monotonic time of now.
+    """
+    current = time.monotonic()
+    if not metrics is None and not last_time is None:
+        metrics.observe_spacing((current - last_time) * 1000.0, cap_interval)
+    return current
+
+
+def _operate(modules,
+             batch_size,
+             wait_interval,
+             queue,
+             stop_event,
+             out_queue=None,
+             end_event=None,
+             metrics=None,
+             hooks=None):
     """Worker function to feed blobs and execute modules."""
     wait_interval_sec = wait_interval / 1000.0
     while not stop_event.is_set():
-        if queue.qsize() >= batch_size:
-            try:
-                blobs = [queue.get() for i in range(batch_size)] # pylint: disable=unused-variable
-                for module in modules:
-                    blobs = module.execute(blobs)
-            except Exception as e: # pylint: disable=broad-except
-                # TODO(JiaKuan Su): Handle more exception cases.
-                logging.error('Exception from modules: {}'.format(e))
-                stop_event.set()
+        size = queue.qsize()
+        # After the end, the last batch can be smaller than the batch size.
+        if size >= batch_size or (size > 0 and not end_event is None and
+                                  end_event.is_set()):
+            items = [queue.get() for _ in range(min(size, batch_size))]
+            if _END_OF_STREAM in items:
+                items = items[:items.index(_END_OF_STREAM)]
+                if items:
+                    _execute(modules, _unpack(items), stop_event, out_queue,
+                             metrics, size, hooks)
+                _finish(stop_event, out_queue)
+                return
+            _execute(modules, _unpack(items), stop_event, out_queue, metrics,
+                     size, hooks)
         else:
             # Sleep only when queue size is not enough.
             time.sleep(wait_interval_sec)
 
 
+def _receive_paced(capturer,
+                   cap_interval,
+                   queue,
+                   retry_interval,
+                   stop_event,
+                   end_event=None,
+                   metrics=None):
+    """Worker function to receive blobs from a capturer on a deadline clock.
+
+    The time spent inside `capture()` is counted toward the capture interval,
+    so a slow read does not delay the next one by a full interval. If the
+    capturer falls behind by more than one interval, the clock is re-anchored
+    instead of bursting to catch up.
+    """
+    cap_interval_sec = cap_interval / 1000.0
+    retry_interval_sec = retry_interval / 1000.0
+    deadline = time.monotonic()
+    last_time = None
+    while not _is_done(stop_event, end_event):
+        deadline += cap_interval_sec
+        last_time = _observe_spacing(metrics, last_time, cap_interval)
+        if _capture(capturer, queue, stop_event, end_event, metrics):
+            last_time = None
+            deadline = time.monotonic() + retry_interval_sec
+        delay = deadline - time.monotonic()
+        if delay > 0:
+            # Wake up immediately when the pipeline is stopped.
+            stop_event.wait(delay)
+        elif delay < -cap_interval_sec:
+            deadline = time.monotonic()
+
+
+def _operate_blocking(modules,
+                      batch_size,
+                      wait_interval,
+                      queue,
+                      stop_event,
+                      out_queue=None,
+                      end_event=None, # pylint: disable=unused-argument
+                      metrics=None,
+                      hooks=None):
+    """Worker function to execute modules as soon as a batch is available.
+
+    The thread blocks on the queue instead of polling its size, so a blob is
+    handed to the modules the moment it completes a batch. The wait interval
+    only bounds how long the thread takes to notice a stop request.
+    """
+    wait_interval_sec = wait_interval / 1000.0
+    items = []
+    while not stop_event.is_set():
+        try:
+            item = queue.get(timeout=wait_interval_sec)
+        except Empty:
+            continue
+        if item is _END_OF_STREAM:
+            if items:
+                _execute(modules, _unpack(items), stop_event, out_queue,
+                         metrics, queue.qsize() + len(items), hooks)
+            _finish(stop_event, out_queue)
+            return
+        items.append(item)
+        if len(items) >= batch_size:
+            _execute(modules, _unpack(items), stop_event, out_queue, metrics,
+                     queue.qsize() + len(items), hooks)
+            items = []
+
+
+def _operate_stage(modules,
+                   wait_interval,
+                   in_queue,
+                   stop_event,
+                   out_queue=None,
+                   metrics=None,
+                   hooks=None):
+    """Worker function to execute a non-first stage in staged execution.
+
+    Each item of the input queue is a batch from the previous stage. Since a
+    stage is executed by exactly one thread and the queues are FIFO, the
+    order of batches is preserved across stages.
+    """
+    wait_interval_sec = wait_interval / 1000.0
+    while not stop_event.is_set():
+        try:
+            batch = in_queue.get(timeout=wait_interval_sec)
+        except Empty:
+            continue
+        if batch is _END_OF_STREAM:
+            _finish(stop_event, out_queue)
+            return
+        _execute(modules, batch, stop_event, out_queue, metrics,
+                 in_queue.qsize() + 1, hooks)
+
+
+class _SourceCapturer(ICapturer):
+    """Inner capturer that tags the blobs of a source in a multi-source
+    pipeline.
+
+    The capturer wraps a capturer and feeds a "source_id" tensor into every
+    captured blob. When the wrapped capturer ends, the capturer keeps
+    returning None until all sources of the pipeline end, so that a finished
+    video file does not stop the other sources.
+    """
+
+    def __init__(self, capturer, source_id, end_counter):
+        """Create a new `_SourceCapturer`.
+
+        Args:
+          capturer (`ICapturer`): The capturer to wrap.
+          source_id (string): The source ID.
+          end_counter (`_EndCounter`): The counter of ended sources.
+        """
+        self._capturer = capturer
+        self._source_id = np.array(source_id)
+        self._end_counter = end_counter
+        self._ended = False
+
+    @property
+    def capturer(self):
+        """`ICapturer`: The wrapped capturer."""
+        return self._capturer
+
+    def prepare(self):
+        self._capturer.prepare()
+
+    def capture(self):
+        if not self._ended:
+            try:
+                blob = self._capturer.capture()
+                if not blob is None:
+                    blob.feed_unchecked(SOURCE_ID_NAME, self._source_id)
+                return blob
+            except EndOfVideoError:
+                self._ended = True
+                self._end_counter.increase()
+        if self._end_counter.all_ended():
+            raise EndOfVideoError('All sources end')
+        return None
+
+    def destroy(self):
+        self._capturer.destroy()
+
+
+class _EndCounter(object):
+    """Inner thread-safe counter of ended sources."""
+
+    def __init__(self):
+        self._total = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def add_source(self):
+        with self._lock:
+            self._total += 1
+
+    def increase(self):
+        with self._lock:
+            self._count += 1
+
+    def all_ended(self):
+        with self._lock:
+            return self._count >= self._total
+
+
 class Pipeline(object):
     """The streaming execution pipeline.
 
@@ -71,21 +544,92 @@ class Pipeline(object):
     STATE_ACTIVE = 1
     STATE_STOPPED = 2
 
-    def __init__(self, cap_interval=50, batch_size=1, retry_interval=3000):
+    SCHEDULER_POLLING = 'polling'
+    SCHEDULER_EVENT = 'event'
+
+    def __init__(self,
+                 cap_interval=50,
+                 batch_size=1,
+                 retry_interval=3000,
+                 scheduler=SCHEDULER_POLLING,
+                 queue_size=0,
+                 overflow_policy=FrameQueue.POLICY_BLOCK,
+                 staged=False,
+                 stage_queue_size=2,
+                 drain_on_end=False,
+                 instrumented=True):
         """Create a new `Pipeline`.
 
         Args:
           cap_interval (int): The interval (in milliseconds) to capture a new
-            blob. Defaults to 0.
+            blob. The polling scheduler also sleeps it when no batch is
+            ready, so a zero interval makes the polling threads spin on a
+            full core, and requires the "event" scheduler. Defaults to 50.
           batch_size (int): The size of batch. Defaults to 1.
           retry_interval (int): The intreval (in milliseconds) to retry when
             the capturer requests a retry.
+          scheduler (string): The scheduling mode of the capture and operator
+            threads. "polling" sleeps a fixed capture interval after every
+            capture and polls the queue size for a full batch. "event" paces
+            the capture on a deadline clock and blocks the operator until a
+            batch is available. Defaults to "polling".
+          queue_size (int): The maximum number of captured blobs waiting for
+            modules. If queue_size <= 0, the queue size is unlimited. Defaults
+            to 0.
+          overflow_policy (string): The policy when the queue is full, it can
+            be "block", "drop_oldest", "drop_newest" or "latest". See
+            `FrameQueue` for details. Defaults to "block".
+          staged (bool): Run every stage of modules on its own thread or not.
+            A stage is a module, or consecutive modules piped with the same
+            stage name. If False, all modules run on a single thread. Defaults
+            to False.
+          stage_queue_size (int): The maximum number of batches waiting
+            between two stages in staged execution. Defaults to 2.
+          drain_on_end (bool): When the capturer ends, execute all captured
+            blobs before stopping or not. If False, the pipeline stops at once
+            and the blobs waiting in queues are discarded. Defaults to False.
+          instrumented (bool): Record the execution time of every module, the
+            queue wait of every stage and the end-to-end frame latency or not.
+            See `metrics_snapshot`. Defaults to True.
+
+        Raises:
+          ValueError: if the scheduler or the overflow policy is not
+            supported, or the bounded queue can never hold a batch or the
+            capture interval is not positive for the polling scheduler.
         """
+        if scheduler not in (self.SCHEDULER_POLLING, self.SCHEDULER_EVENT):
+            raise ValueError('Unsupported scheduler: {}'.format(scheduler))
+        if overflow_policy not in FrameQueue.POLICIES:
+            raise ValueError('Unsupported overflow policy: {}'
+                             .format(overflow_policy))
+        if scheduler == self.SCHEDULER_POLLING:
+            max_queue_size = 1 if overflow_policy == FrameQueue.POLICY_LATEST \
+                             else queue_size
+            if 0 < max_queue_size < batch_size:
+                raise ValueError('Queue size must not be smaller than batch '
+                                 'size for the polling scheduler.')
+            if cap_interval <= 0:
+                raise ValueError('Capture interval must be positive for the '
+                                 'polling scheduler.')
         self._cap_interval = cap_interval
         self._batch_size = batch_size
         self._retry_interval = retry_interval
+        self._scheduler = scheduler
+        self._queue_size = queue_size
+        self._overflow_policy = overflow_policy
+        self._queue = None
+        self._staged = staged
+        self._stage_queue_size = stage_queue_size
+        self._drain_on_end = drain_on_end
+        self._instrumented = instrumented
+        self._capture_metrics = []
+        self._stage_metrics = []
         self._capturer = None
         self._modules = []
+        self._stage_names = []
+        self._hook_slots = []
+        self._hooks = []
+        self._hooks_lock = threading.Lock()
         self._state = self.STATE_INITIALIZED
         self._threads = []
         self._stop_event = None
@@ -100,6 +644,123 @@ class Pipeline(object):
         """int: The size of batch."""
         return self._batch_size
 
+    @property
+    def scheduler(self):
+        """string: The scheduling mode of the pipeline."""
+        return self._scheduler
+
+    @property
+    def queue_size(self):
+        """int: The maximum number of captured blobs waiting for modules."""
+        return self._queue_size
+
+    @property
+    def overflow_policy(self):
+        """string: The policy when the queue is full."""
+        return self._overflow_policy
+
+    @property
+    def captured_count(self):
+        """int: The number of captured blobs, including the dropped ones."""
+        return 0 if self._queue is None else self._queue.put_count
+
+    @property
+    def dropped_count(self):
+        """int: The number of captured blobs dropped by the overflow policy."""
+        return 0 if self._queue is None else self._queue.dropped_count
+
+    @property
+    def staged(self):
+        """bool: Run every stage of modules on its own thread or not."""
+        return self._staged
+
+    @property
+    def capture_metrics(self):
+        """list of `CaptureMetrics`: The capture metrics of each capturer,
+        recorded by the receiving threads since the pipeline starts. The
+        latency is the time spent in `capture`, the jitter is the deviation of
+        capture spacing from the capture interval, and the dropped frames are
+        the blobs dropped by the overflow policy."""
+        return self._capture_metrics
+
+    @property
+    def drain_on_end(self):
+        """bool: Execute all captured blobs before stopping or not when the
+        capturer ends."""
+        return self._drain_on_end
+
+    @property
+    def instrumented(self):
+        """bool: Record the execution metrics or not."""
+        return self._instrumented
+
+    @property
+    def module_metrics(self):
+        """list of `ModuleMetrics`: The metrics of modules in order. It is
+        empty before the pipeline starts or if the pipeline is not
+        instrumented."""
+        return [module_metrics for stage_metrics in self._stage_metrics
+                for module_metrics in stage_metrics.module_metrics]
+
+    def metrics_snapshot(self):
+        """Take a snapshot of the execution metrics.
+
+        All times are in milliseconds. The breakdown lists the mean and the
+        99th percentile time that a frame spends in each step, in the order of
+        execution, to see where the latency goes.
+
+        Returns:
+          dict: The snapshot, which contains:
+            capture (list of dict): The snapshots of `CaptureMetrics` of the
+              capturers.
+            latency (dict): The snapshot of the end-to-end frame latency
+              histogram from capturing to the end of the last module, or None
+              if the pipeline is not instrumented.
+            stages (list of dict): The snapshots of stages. Each of them
+              contains the "queue_wait" histogram snapshot and the "modules"
+              list of `ModuleMetrics` snapshots.
+            breakdown (list of dict): The steps in order. Each of them
+              contains "name", "mean_ms" and "p99_ms".
+        """
+        stages = []
+        breakdown = []
+        latency = None
+        for i, stage_metrics in enumerate(self._stage_metrics):
+            queue_wait = stage_metrics.queue_wait_histogram.snapshot()
+            modules = [module_metrics.snapshot()
+                       for module_metrics in stage_metrics.module_metrics]
+            stages.append({'queue_wait': queue_wait, 'modules': modules})
+            breakdown.append({'name': 'queue_wait[{}]'.format(i),
+                              'mean_ms': queue_wait['mean'],
+                              'p99_ms': queue_wait['p99']})
+            for module in modules:
+                breakdown.append({'name': module['name'],
+                                  'mean_ms': module['time']['mean'],
+                                  'p99_ms': module['time']['p99']})
+            if not stage_metrics.latency_histogram is None:
+                latency = stage_metrics.latency_histogram.snapshot()
+        return {
+            'capture': [metrics.snapshot()
+                        for metrics in self._capture_metrics],
+            'latency': latency,
+            'stages': stages,
+            'breakdown': breakdown,
+        }
+
+    @property
+    def stages(self):
+        """list of list of `IModule`: The modules grouped by stages. A stage
+        is a module, or consecutive modules piped with the same stage name."""
+        stages = []
+        last_name = None
+        for module, name in zip(self._modules, self._stage_names):
+            if stages and not name is None and name == last_name:
+                stages[-1].append(module)
+            else:
+                stages.append([module])
+            last_name = name
+        return stages
+
     @property
     def capturer(self):
         """`ICapturer`: The capturer in the pipeline."""
@@ -132,11 +793,15 @@ class Pipeline(object):
         self._capturer = capturer
         return self
 
-    def pipe(self, module):
+    def pipe(self, module, stage=None):
         """Add a module to the end of the pipeline.
 
         Args:
           module (IModule): The module to be added.
+          stage (string): The stage name of the module. Consecutive modules
+            with the same stage name run on the same thread in staged
+            execution. If None, the module runs on its own thread in staged
+            execution. Defaults to None.
 
         Returns:
           `Pipeline`: The pipeline instance.
@@ -147,8 +812,78 @@ class Pipeline(object):
         if not isinstance(module, IModule):
             raise TypeError('Module must a IModule instance.')
         self._modules.append(module)
+        self._stage_names.append(stage)
+        self._hook_slots.append(_HookSlot())
         return self
 
+    @property
+    def hooks(self):
+        """list of `IExecuteHook`: The attached hooks."""
+        with self._hooks_lock:
+            return list(self._hooks)
+
+    def add_hook(self, hook, module=None, sample_interval=1):
+        """Attach an execution hook to modules.
+
+        The hook can be attached before or while the pipeline is running. It
+        is called for 1 in every sample_interval blobs that the module
+        executes, counted since the hook is attached. For batches, a call is
+        sampled if any of its blobs is sampled.
+
+        Args:
+          hook (`IExecuteHook`): The hook to attach.
+          module (`IModule`): The module to attach the hook to. If None, the
+            hook is attached to all modules. Defaults to None.
+          sample_interval (int): The interval of blobs to call the hook.
+            Defaults to 1.
+
+        Returns:
+          `Pipeline`: The pipeline instance.
+
+        Raises:
+          TypeError: if hook is not a `IExecuteHook` instance.
+          ValueError: if the module is not in the pipeline, or the sample
+            interval is not positive, or the hook is already attached.
+        """
+        if not isinstance(hook, IExecuteHook):
+            raise TypeError('Hook must a IExecuteHook instance.')
+        if sample_interval < 1:
+            raise ValueError('Sample interval must be positive.')
+        if module is None:
+            slots = self._hook_slots
+        else:
+            slots = [slot for m, slot in zip(self._modules, self._hook_slots)
+                     if m is module]
+            if not slots:
+                raise ValueError('Module is not in the pipeline.')
+        with self._hooks_lock:
+            if hook in self._hooks:
+                raise ValueError('Hook has been already attached.')
+            hook.attach()
+            self._hooks.append(hook)
+            for slot in slots:
+                slot.entries = slot.entries + (_HookEntry(hook,
+                                                          sample_interval),)
+        return self
+
+    def remove_hook(self, hook):
+        """Detach an execution hook from all modules.
+
+        Args:
+          hook (`IExecuteHook`): The hook to detach.
+
+        Raises:
+          ValueError: if the hook is not attached.
+        """
+        with self._hooks_lock:
+            if not hook in self._hooks:
+                raise ValueError('Hook is not attached.')
+            self._hooks.remove(hook)
+            for slot in self._hook_slots:
+                slot.entries = tuple(entry for entry in slot.entries
+                                     if not entry.hook is hook)
+        hook.detach()
+
     def start(self):
         """Start the execution of pipeline streaming without blocking.
 
@@ -157,7 +892,7 @@ class Pipeline(object):
             pipeline is not in initialized state.
         """
         if self._state == self.STATE_INITIALIZED:
-            if self._capturer is None:
+            if not self._get_capturers():
                 raise RuntimeError('Capturer is not set for pipeline starting.')
             if not self._modules:
                 raise RuntimeError('At least one module must be added for '
@@ -197,37 +932,106 @@ class Pipeline(object):
         elif self._state == self.STATE_STOPPED:
             raise RuntimeError('Pipeline has been already stopped.')
 
+    def _get_capturers(self):
+        """Inner method to get the capturers to run.
+
+        Returns:
+          list of `ICapturer`: The capturers. Each of them is run by its own
+            receiving thread.
+        """
+        return [] if self._capturer is None else [self._capturer]
+
     def _prepare(self):
         """Inner method for pipeline preparation."""
-        self._capturer.prepare()
+        for capturer in self._get_capturers():
+            capturer.prepare()
         for module in self._modules:
             module.prepare()
 
     def _destroy(self):
         """Inner method for pipeline destruction."""
-        self._capturer.destroy()
+        for capturer in self._get_capturers():
+            capturer.destroy()
         for module in self._modules:
             module.destroy()
+        for hook in self.hooks:
+            self.remove_hook(hook)
 
     def _start(self):
         """Inner method for pipeline starting."""
         self._prepare()
 
         # Create threads for pipeline execution.
-        queue = Queue()
+        queue = FrameQueue(self._queue_size, self._overflow_policy)
+        self._queue = queue
         self._stop_event = threading.Event()
-        rec_args = (self._capturer, self._cap_interval, queue,
-                    self._retry_interval, self._stop_event,)
-        op_args = (self._modules, self._batch_size, self._cap_interval,
-                   queue, self._stop_event,)
-        self._threads.append(threading.Thread(target=_receive, args=rec_args))
-        self._threads.append(threading.Thread(target=_operate, args=op_args))
+        end_event = threading.Event() if self._drain_on_end else None
+        stages = self.stages if self._staged else [self._modules]
+        stage_queues = [Queue(self._stage_queue_size) for _ in stages[1:]]
+        stage_queues.append(None)
+        if self._instrumented:
+            self._stage_metrics = self._create_stage_metrics(stages)
+            stage_metrics = self._stage_metrics
+        else:
+            stage_metrics = [None] * len(stages)
+        stage_slots = []
+        for stage in stages:
+            first = sum(len(slots) for slots in stage_slots)
+            stage_slots.append(self._hook_slots[first:first + len(stage)])
+        op_args = (stages[0], self._batch_size, self._cap_interval,
+                   queue, self._stop_event, stage_queues[0], end_event,
+                   stage_metrics[0], stage_slots[0],)
+        if self._scheduler == self.SCHEDULER_EVENT:
+            receive, operate = _receive_paced, _operate_blocking
+        else:
+            receive, operate = _receive, _operate
+        self._capture_metrics = [CaptureMetrics()
+                                 for _ in self._get_capturers()]
+        for capturer, metrics in zip(self._get_capturers(),
+                                     self._capture_metrics):
+            rec_args = (capturer, self._cap_interval, queue,
+                        self._retry_interval, self._stop_event, end_event,
+                        metrics,)
+            self._threads.append(threading.Thread(target=receive,
+                                                  args=rec_args))
+        self._threads.append(threading.Thread(target=operate, args=op_args))
+        for i in range(1, len(stages)):
+            stage_args = (stages[i], self._cap_interval, stage_queues[i - 1],
+                          self._stop_event, stage_queues[i],
+                          stage_metrics[i], stage_slots[i],)
+            self._threads.append(threading.Thread(target=_operate_stage,
+                                                  args=stage_args))
 
         # Start the threads.
         for thread in self._threads:
             thread.setDaemon(True)
             thread.start()
 
+    @staticmethod
+    def _create_stage_metrics(stages):
+        """Inner method to create the metrics of stages.
+
+        Args:
+          stages (list of list of `IModule`): The modules grouped by stages.
+
+        Returns:
+          list of `_StageMetrics`: The metrics of stages.
+        """
+        stage_metrics = []
+        index = 0
+        for stage in stages:
+            module_metrics = []
+            for module in stage:
+                name = '{}:{}'.format(index, type(module).__name__)
+                module_metrics.append(ModuleMetrics(name))
+                index += 1
+            # From 0.01 ms to about 10 s.
+            stage_metrics.append(_StageMetrics(
+                module_metrics, Histogram(exponential_bounds(0.01, 2, 20))))
+        stage_metrics[-1].latency_histogram = \
+            Histogram(exponential_bounds(0.1, 2, 18))
+        return stage_metrics
+
     def _stop(self):
         """Inner method for pipeline stopping."""
         self._stop_event.set()
@@ -252,3 +1056,77 @@ class Pipeline(object):
             thread.join()
 
         self._destroy()
+
+
+class MultiSourcePipeline(Pipeline):
+    """The streaming execution pipeline with multiple sources.
+
+    MultiSourcePipeline runs several capturers that feed one shared chain of
+    modules, so expensive resources in modules (such as a TensorFlow session)
+    are shared by all sources. Each capturer runs on its own receiving thread,
+    and every captured blob is fed a 0-dimensional string "source_id" tensor.
+    Stateful modules should keep their states per source ID (see
+    `get_source_id`).
+
+    The pipeline stops when any source raises an unexpected exception, or when
+    all sources end.
+    """
+
+    def __init__(self, **kwargs):
+        """Create a new `MultiSourcePipeline`.
+
+        Args:
+          kwargs: The same arguments as `Pipeline`.
+        """
+        Pipeline.__init__(self, **kwargs)
+        self._source_ids = []
+        self._capturers = []
+        self._source_capturers = []
+        self._end_counter = _EndCounter()
+
+    @property
+    def capturer(self):
+        """`ICapturer`: The first capturer in the pipeline."""
+        return self._capturers[0] if self._capturers else None
+
+    @property
+    def capturers(self):
+        """list of `ICapturer`: The capturers in the pipeline."""
+        return self._capturers
+
+    @property
+    def source_ids(self):
+        """list of string: The source IDs of the capturers."""
+        return self._source_ids
+
+    def source(self, capturer, source_id=None):
+        """Add a capturer as a data source.
+
+        Args:
+          capturer (`ICapturer`): The capturer to add.
+          source_id (string): The source ID. Defaults to the index of the
+            capturer in the pipeline.
+
+        Returns:
+          `MultiSourcePipeline`: The pipeline instance.
+
+        Raises:
+          TypeError: if capturer is not a `ICapturer` instance.
+          ValueError: if the source ID has been used.
+        """
+        if not isinstance(capturer, ICapturer):
+            raise TypeError('Source must a ICapturer instance.')
+        if source_id is None:
+            source_id = str(len(self._capturers))
+        if source_id in self._source_ids:
+            raise ValueError('Duplicated source ID: {}'.format(source_id))
+        self._end_counter.add_source()
+        self._source_ids.append(source_id)
+        self._capturers.append(capturer)
+        self._source_capturers.append(
+            _SourceCapturer(capturer, source_id, self._end_counter))
+        return self
+
+    def _get_capturers(self):
+        """Inner method to get the capturers to run."""
+        return self._source_capturers
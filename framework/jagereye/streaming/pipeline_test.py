@@ -4,6 +4,7 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import threading
 import time
 
 import numpy as np
@@ -11,8 +12,13 @@ import pytest
 
 from jagereye.util.test_util import spy
 from jagereye.streaming.blob import Blob
+from jagereye.streaming.blob import get_source_id
+from jagereye.streaming.exceptions import EndOfVideoError
 from jagereye.streaming.capturers.base import ICapturer
+from jagereye.streaming.frame_queue import FrameQueue
+from jagereye.streaming.hooks.base import IExecuteHook
 from jagereye.streaming.modules.base import IModule
+from jagereye.streaming.pipeline import MultiSourcePipeline
 from jagereye.streaming.pipeline import Pipeline
 
 
@@ -34,6 +40,46 @@ class _NumberCapturer(ICapturer):
         pass
 
 
+class _CounterCapturer(ICapturer):
+    """Capturer to generate blobs with increasing numbers."""
+
+    def __init__(self):
+        self._counter = 0
+
+    def prepare(self):
+        pass
+
+    def capture(self):
+        blob = Blob()
+        blob.feed('number', np.array([self._counter]))
+        self._counter += 1
+        return blob
+
+    def destroy(self):
+        pass
+
+
+class _FiniteCapturer(ICapturer):
+    """Capturer to generate a finite number of blobs."""
+
+    def __init__(self, count):
+        self._count = count
+
+    def prepare(self):
+        pass
+
+    def capture(self):
+        if self._count <= 0:
+            raise EndOfVideoError()
+        self._count -= 1
+        blob = Blob()
+        blob.feed('number', np.array([self._count]))
+        return blob
+
+    def destroy(self):
+        pass
+
+
 class _NumberOpModule(IModule):
     """Module for arithmetic operators execution on number module, including '+'
     and '*'."""
@@ -85,6 +131,78 @@ class _NumberResultModule(IModule):
         pass
 
 
+class _SleepModule(IModule):
+    """Module to sleep for a while."""
+
+    def __init__(self, interval=0.1):
+        self._interval = interval
+
+    def prepare(self):
+        pass
+
+    def execute(self, blobs):
+        time.sleep(self._interval)
+        return blobs
+
+    def destroy(self):
+        pass
+
+
+class _HistoryModule(IModule):
+    """Module to record the numbers and threads it executes on."""
+
+    def __init__(self, interval=0.0):
+        self._interval = interval
+        self._numbers = []
+        self._threads = set()
+
+    @property
+    def numbers(self):
+        """list of int: The executed numbers."""
+        return self._numbers
+
+    @property
+    def threads(self):
+        """set of int: The identities of executing threads."""
+        return self._threads
+
+    def prepare(self):
+        pass
+
+    def execute(self, blobs):
+        time.sleep(self._interval)
+        self._threads.add(threading.get_ident())
+        for blob in blobs:
+            self._numbers.append(int(blob.fetch('number')[0]))
+        return blobs
+
+    def destroy(self):
+        pass
+
+
+class _SourceModule(IModule):
+    """Module to record the source IDs of blobs."""
+
+    def __init__(self):
+        self._source_ids = []
+
+    @property
+    def source_ids(self):
+        """list of string: The source IDs."""
+        return self._source_ids
+
+    def prepare(self):
+        pass
+
+    def execute(self, blobs):
+        for blob in blobs:
+            self._source_ids.append(get_source_id(blob))
+        return blobs
+
+    def destroy(self):
+        pass
+
+
 class _ExceptionModule(IModule):
     """Module to raise an exception."""
 
@@ -104,9 +222,40 @@ class _ExceptionModule(IModule):
     def destroy(self):
         pass
 
-def _gen_pipeline(capturer=None, modules=None):
+class _RecordHook(IExecuteHook):
+    """Hook to record the numbers of the sampled calls."""
+
+    def __init__(self):
+        self.numbers = []
+        self.attached = False
+        self.detached = False
+
+    def attach(self):
+        self.attached = True
+
+    def before_execute(self, module, blobs):
+        return [int(blob.fetch('number')[0]) for blob in blobs]
+
+    def after_execute(self, module, blobs, outputs, state):
+        self.numbers.append(state)
+
+    def detach(self):
+        self.detached = True
+
+
+class _ExceptionHook(IExecuteHook):
+    """Hook that always raises an exception."""
+
+    def before_execute(self, module, blobs):
+        raise RuntimeError('Hook exception')
+
+    def after_execute(self, module, blobs, outputs, state):
+        raise RuntimeError('Hook exception')
+
+
+def _gen_pipeline(capturer=None, modules=None, **kwargs):
     """Generate a pipeline."""
-    pipeline = Pipeline()
+    pipeline = Pipeline(**kwargs)
 
     if not capturer is None:
         pipeline.source(capturer)
@@ -117,14 +266,14 @@ def _gen_pipeline(capturer=None, modules=None):
     return pipeline
 
 
-def _gen_num_pipeline(init_num=0.0, to_add=1.0, to_mul=1.0):
+def _gen_num_pipeline(init_num=0.0, to_add=1.0, to_mul=1.0, **kwargs):
     """Generate a pipeline for number arithmetic execution."""
     capturer = _NumberCapturer(num=init_num)
     modules = [
         _NumberOpModule(operator='+', operand=to_add),
         _NumberOpModule(operator='*', operand=to_mul)
     ]
-    pipeline = _gen_pipeline(capturer=capturer, modules=modules)
+    pipeline = _gen_pipeline(capturer=capturer, modules=modules, **kwargs)
     return pipeline
 
 
@@ -143,6 +292,28 @@ def _spy_pipeline(pipeline):
 class TestPipeline(object):
     """Tests for Pipeline class."""
 
+    def test_unsupported_scheduler(self):
+        with pytest.raises(ValueError):
+            Pipeline(scheduler='non_existing')
+
+    def test_unsupported_overflow_policy(self):
+        with pytest.raises(ValueError):
+            Pipeline(overflow_policy='non_existing')
+
+    def test_queue_smaller_than_batch(self):
+        with pytest.raises(ValueError):
+            Pipeline(batch_size=4, queue_size=2)
+        with pytest.raises(ValueError):
+            Pipeline(batch_size=4, overflow_policy=FrameQueue.POLICY_LATEST)
+        Pipeline(batch_size=4,
+                 overflow_policy=FrameQueue.POLICY_LATEST,
+                 scheduler=Pipeline.SCHEDULER_EVENT)
+
+    def test_zero_capture_interval(self):
+        with pytest.raises(ValueError):
+            Pipeline(cap_interval=0)
+        Pipeline(cap_interval=0, scheduler=Pipeline.SCHEDULER_EVENT)
+
     def test_source_non_capturer(self):
         pipeline = Pipeline()
         with pytest.raises(TypeError):
@@ -166,6 +337,19 @@ class TestPipeline(object):
             assert pipeline.pipe(module) == pipeline
         assert pipeline.modules == modules
 
+    def test_stages(self):
+        pipeline = _gen_pipeline()
+        modules = [_NumberOpModule() for _ in range(5)]
+        pipeline.pipe(modules[0]) \
+                .pipe(modules[1], stage='a') \
+                .pipe(modules[2], stage='a') \
+                .pipe(modules[3]) \
+                .pipe(modules[4])
+        assert pipeline.stages == [[modules[0]],
+                                   [modules[1], modules[2]],
+                                   [modules[3]],
+                                   [modules[4]]]
+
     def test_start_without_capturer(self):
         pipeline = _gen_pipeline(modules=[_NumberOpModule()])
         with pytest.raises(RuntimeError):
@@ -219,6 +403,248 @@ class TestPipeline(object):
         for module in modules:
             assert module.destroy.call_count == 1
 
+    def test_start_then_stop_with_event_scheduler(self):
+        result_module = _NumberResultModule()
+        pipeline = _gen_num_pipeline(init_num=10,
+                                     to_add=30,
+                                     to_mul=5,
+                                     cap_interval=10,
+                                     batch_size=3,
+                                     scheduler=Pipeline.SCHEDULER_EVENT)
+        pipeline.pipe(result_module)
+        _spy_pipeline(pipeline)
+
+        capturer = pipeline.capturer
+        modules = pipeline.modules
+
+        pipeline.start()
+        time.sleep(0.5)
+        assert capturer.capture.call_count > 0
+        for module in modules:
+            assert module.execute.call_count > 0
+        assert len(result_module.results) == 3
+        for result in result_module.results:
+            np.testing.assert_equal(result, np.array([200]))
+
+        pipeline.stop()
+        assert capturer.destroy.call_count == 1
+        for module in modules:
+            assert module.destroy.call_count == 1
+
+    def test_dropped_count(self):
+        for policy in [FrameQueue.POLICY_DROP_OLDEST,
+                       FrameQueue.POLICY_DROP_NEWEST,
+                       FrameQueue.POLICY_LATEST]:
+            pipeline = _gen_num_pipeline(cap_interval=5,
+                                         queue_size=2,
+                                         overflow_policy=policy)
+            pipeline.pipe(_SleepModule(0.1))
+            assert pipeline.dropped_count == 0
+            pipeline.start()
+            time.sleep(0.5)
+            pipeline.stop()
+            assert pipeline.dropped_count > 0
+            assert pipeline.captured_count > pipeline.dropped_count
+
+    def test_stop_with_blocked_capturer(self):
+        pipeline = _gen_num_pipeline(cap_interval=5,
+                                     queue_size=1,
+                                     overflow_policy=FrameQueue.POLICY_BLOCK)
+        pipeline.pipe(_SleepModule(0.1))
+        pipeline.start()
+        time.sleep(0.3)
+        pipeline.stop()
+        assert pipeline.dropped_count == 0
+
+    def test_capture_metrics(self):
+        for scheduler in [Pipeline.SCHEDULER_POLLING, Pipeline.SCHEDULER_EVENT]:
+            pipeline = _gen_pipeline(capturer=_CounterCapturer(),
+                                     modules=[_HistoryModule()],
+                                     cap_interval=10,
+                                     scheduler=scheduler)
+            assert pipeline.capture_metrics == []
+            pipeline.start()
+            time.sleep(0.3)
+            pipeline.stop()
+
+            assert len(pipeline.capture_metrics) == 1
+            snapshot = pipeline.capture_metrics[0].snapshot()
+            assert snapshot['captured'] > 0
+            assert snapshot['latency']['count'] == snapshot['captured']
+            assert snapshot['jitter']['count'] > 0
+            assert snapshot['dropped'] == 0
+            assert 0 < snapshot['effective_fps'] <= 110
+
+    def test_metrics_snapshot(self):
+        for staged in [False, True]:
+            modules = [_HistoryModule(), _HistoryModule(0.01)]
+            pipeline = _gen_pipeline(capturer=_CounterCapturer(),
+                                     modules=modules,
+                                     cap_interval=10,
+                                     staged=staged)
+            assert pipeline.module_metrics == []
+            pipeline.start()
+            time.sleep(0.3)
+            pipeline.stop()
+
+            module_metrics = pipeline.module_metrics
+            assert [m.name for m in module_metrics] == \
+                ['0:_HistoryModule', '1:_HistoryModule']
+            for module, metrics in zip(modules, module_metrics):
+                assert metrics.blob_count == len(module.numbers)
+            assert module_metrics[1].time_histogram.mean >= 10
+            assert module_metrics[0].queue_depth_histogram.count > 0
+
+            snapshot = pipeline.metrics_snapshot()
+            assert len(snapshot['capture']) == 1
+            assert len(snapshot['stages']) == (2 if staged else 1)
+            latency = snapshot['latency']
+            assert latency['count'] == len(modules[1].numbers)
+            assert latency['mean'] >= 10
+            names = [step['name'] for step in snapshot['breakdown']]
+            if staged:
+                assert names == ['queue_wait[0]', '0:_HistoryModule',
+                                 'queue_wait[1]', '1:_HistoryModule']
+            else:
+                assert names == ['queue_wait[0]', '0:_HistoryModule',
+                                 '1:_HistoryModule']
+
+    def test_not_instrumented(self):
+        modules = [_HistoryModule()]
+        pipeline = _gen_pipeline(capturer=_CounterCapturer(),
+                                 modules=modules,
+                                 cap_interval=10,
+                                 instrumented=False)
+        pipeline.start()
+        time.sleep(0.1)
+        pipeline.stop()
+
+        assert modules[0].numbers
+        assert pipeline.module_metrics == []
+        snapshot = pipeline.metrics_snapshot()
+        assert snapshot['latency'] is None
+        assert snapshot['breakdown'] == []
+
+    def test_add_hook(self):
+        for staged in [False, True]:
+            modules = [_HistoryModule(), _HistoryModule()]
+            pipeline = _gen_pipeline(capturer=_CounterCapturer(),
+                                     modules=modules,
+                                     cap_interval=5,
+                                     batch_size=2,
+                                     staged=staged)
+            hook = _RecordHook()
+            pipeline.add_hook(hook, module=modules[1], sample_interval=3)
+            assert hook.attached
+            assert pipeline.hooks == [hook]
+            pipeline.start()
+            time.sleep(0.3)
+            pipeline.stop()
+
+            # Calls with a blob of 1 in every 3 blobs are sampled.
+            assert hook.detached
+            assert pipeline.hooks == []
+            assert len(hook.numbers) > 1
+            for numbers in hook.numbers:
+                assert any(number % 3 == 0 for number in numbers)
+
+    def test_add_hook_while_running(self):
+        modules = [_HistoryModule()]
+        pipeline = _gen_pipeline(capturer=_CounterCapturer(),
+                                 modules=modules,
+                                 cap_interval=5)
+        pipeline.start()
+        time.sleep(0.1)
+        hook = _RecordHook()
+        pipeline.add_hook(hook)
+        time.sleep(0.1)
+        pipeline.remove_hook(hook)
+        count = len(hook.numbers)
+        time.sleep(0.1)
+        pipeline.stop()
+
+        assert count > 0
+        assert len(hook.numbers) == count
+        assert hook.numbers[0][0] > modules[0].numbers[0]
+
+    def test_add_invalid_hook(self):
+        module = _HistoryModule()
+        pipeline = _gen_pipeline(modules=[module])
+        with pytest.raises(TypeError):
+            pipeline.add_hook(module)
+        with pytest.raises(ValueError):
+            pipeline.add_hook(_RecordHook(), module=_HistoryModule())
+        with pytest.raises(ValueError):
+            pipeline.add_hook(_RecordHook(), sample_interval=0)
+        hook = _RecordHook()
+        pipeline.add_hook(hook)
+        with pytest.raises(ValueError):
+            pipeline.add_hook(hook)
+        pipeline.remove_hook(hook)
+        with pytest.raises(ValueError):
+            pipeline.remove_hook(hook)
+
+    def test_hook_exception(self):
+        modules = [_HistoryModule()]
+        pipeline = _gen_pipeline(capturer=_CounterCapturer(),
+                                 modules=modules,
+                                 cap_interval=5)
+        pipeline.add_hook(_ExceptionHook())
+        pipeline.start()
+        time.sleep(0.1)
+        assert pipeline.state == Pipeline.STATE_ACTIVE
+        pipeline.stop()
+        assert modules[0].numbers
+
+    def test_staged_execution(self):
+        for scheduler in [Pipeline.SCHEDULER_POLLING, Pipeline.SCHEDULER_EVENT]:
+            modules = [_HistoryModule(), _HistoryModule(0.02),
+                       _HistoryModule(), _HistoryModule(0.01)]
+            pipeline = _gen_pipeline(capturer=_CounterCapturer(),
+                                     cap_interval=5,
+                                     batch_size=2,
+                                     scheduler=scheduler,
+                                     staged=True)
+            pipeline.pipe(modules[0], stage='first') \
+                    .pipe(modules[1], stage='first') \
+                    .pipe(modules[2]) \
+                    .pipe(modules[3])
+            pipeline.start()
+            time.sleep(0.5)
+            pipeline.stop()
+
+            # Each stage runs on its own thread.
+            assert modules[0].threads == modules[1].threads
+            assert not modules[1].threads & modules[2].threads
+            assert not modules[2].threads & modules[3].threads
+            # The order of blobs is preserved in every stage.
+            for module in modules:
+                assert module.numbers
+                assert module.numbers == sorted(module.numbers)
+                num_numbers = len(module.numbers)
+                assert module.numbers == modules[0].numbers[:num_numbers]
+
+    def test_await_with_drain_on_end(self):
+        for scheduler in [Pipeline.SCHEDULER_POLLING, Pipeline.SCHEDULER_EVENT]:
+            for staged in [False, True]:
+                # The polling scheduler requires a positive capture interval.
+                cap_interval = 1 if scheduler == Pipeline.SCHEDULER_POLLING \
+                               else 0
+                modules = [_HistoryModule(0.01), _HistoryModule()]
+                pipeline = _gen_pipeline(capturer=_FiniteCapturer(10),
+                                         modules=modules,
+                                         cap_interval=cap_interval,
+                                         batch_size=4,
+                                         scheduler=scheduler,
+                                         queue_size=4,
+                                         staged=staged,
+                                         drain_on_end=True)
+                pipeline.start()
+                pipeline.await_termination()
+                # Every blob is executed, including the last partial batch.
+                for module in modules:
+                    assert module.numbers == list(reversed(range(10)))
+
     def test_start_then_await(self):
         result_module = _NumberResultModule()
         exception_module = _ExceptionModule(count=10)
@@ -272,3 +698,64 @@ class TestPipeline(object):
         pipeline.stop()
         with pytest.raises(RuntimeError):
             pipeline.await_termination()
+
+
+class TestMultiSourcePipeline(object):
+    """Tests for MultiSourcePipeline class."""
+
+    def test_source_non_capturer(self):
+        pipeline = MultiSourcePipeline()
+        with pytest.raises(TypeError):
+            pipeline.source(100)
+
+    def test_source(self):
+        pipeline = MultiSourcePipeline()
+        capturers = [_NumberCapturer() for _ in range(3)]
+        assert pipeline.source(capturers[0]) == pipeline
+        assert pipeline.source(capturers[1], source_id='cam') == pipeline
+        assert pipeline.source(capturers[2]) == pipeline
+        assert pipeline.capturer == capturers[0]
+        assert pipeline.capturers == capturers
+        assert pipeline.source_ids == ['0', 'cam', '2']
+
+    def test_source_duplicated_id(self):
+        pipeline = MultiSourcePipeline()
+        pipeline.source(_NumberCapturer(), source_id='cam')
+        with pytest.raises(ValueError):
+            pipeline.source(_NumberCapturer(), source_id='cam')
+
+    def test_start_without_capturer(self):
+        pipeline = MultiSourcePipeline()
+        pipeline.pipe(_NumberOpModule())
+        with pytest.raises(RuntimeError):
+            pipeline.start()
+
+    def test_start_then_stop(self):
+        source_module = _SourceModule()
+        pipeline = MultiSourcePipeline(cap_interval=10)
+        pipeline.source(_NumberCapturer(), source_id='a') \
+                .source(_NumberCapturer(), source_id='b') \
+                .pipe(source_module)
+        for capturer in pipeline.capturers:
+            spy(capturer, 'prepare')
+            spy(capturer, 'destroy')
+        pipeline.start()
+        for capturer in pipeline.capturers:
+            assert capturer.prepare.call_count == 1
+        time.sleep(0.3)
+        pipeline.stop()
+        for capturer in pipeline.capturers:
+            assert capturer.destroy.call_count == 1
+        assert set(source_module.source_ids) == set(['a', 'b'])
+
+    def test_await_all_sources_end(self):
+        source_module = _SourceModule()
+        pipeline = MultiSourcePipeline(cap_interval=5)
+        pipeline.source(_FiniteCapturer(3), source_id='short') \
+                .source(_FiniteCapturer(20), source_id='long') \
+                .pipe(source_module)
+        pipeline.start()
+        pipeline.await_termination()
+        # The pipeline keeps running after the short source ends.
+        assert source_module.source_ids.count('short') == 3
+        assert source_module.source_ids.count('long') > 3
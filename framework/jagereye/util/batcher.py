@@ -0,0 +1,201 @@
+"""Utilities for dynamic batching."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from queue import Empty
+from queue import Queue
+import threading
+import time
+
+from jagereye.util.metrics import Histogram
+from jagereye.util.metrics import exponential_bounds
+from jagereye.util.metrics import linear_bounds
+
+
+class _Request(object):
+    """Inner class for a request to the dynamic batcher."""
+
+    def __init__(self, item):
+        self.item = item
+        self.submit_time = time.monotonic()
+        self._done = threading.Event()
+        self._result = None
+        self._error = None
+
+    def set_result(self, result):
+        self._result = result
+        self._done.set()
+
+    def set_error(self, error):
+        self._error = error
+        self._done.set()
+
+    def result(self):
+        self._done.wait()
+        if not self._error is None:
+            raise self._error
+        return self._result
+
+
+class DynamicBatcher(object):
+    """The dynamic batcher.
+
+    The batcher collects items submitted by one or more threads and runs a
+    batch function on them together. A batch is dispatched when it reaches the
+    maximum batch size, or when the oldest item in it has waited for the
+    maximum wait time. It is useful to share one expensive call, such as a
+    TensorFlow session run, by many streams.
+
+    The batcher records the size of every dispatched batch and the time that
+    every item waits before its batch is dispatched.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=8, max_wait=0):
+        """Create a new `DynamicBatcher`.
+
+        Args:
+          batch_fn (function): The function to run a batch. It takes a list of
+            items and returns a list of results in the same order.
+          max_batch_size (int): The maximum size of batch. Defaults to 8.
+          max_wait (float): The maximum time (in milliseconds) to wait for
+            more items after the first item of a batch arrives. If max_wait
+            <= 0, a batch is dispatched with whatever items are already
+            submitted. Defaults to 0.
+
+        Raises:
+          ValueError: if max_batch_size < 1.
+        """
+        if max_batch_size < 1:
+            raise ValueError('Maximum batch size must be at least 1.')
+        self._batch_fn = batch_fn
+        self._max_batch_size = max_batch_size
+        self._max_wait = max_wait
+        self._queue = Queue()
+        self._thread = None
+        self._stop_event = threading.Event()
+        # Guard the submission against stopping, so no request is submitted
+        # after the pending requests are failed.
+        self._submit_lock = threading.Lock()
+        self._batch_size_histogram = Histogram(
+            linear_bounds(1, 1, max_batch_size))
+        # From 0.1 ms to about 3.3 s.
+        self._wait_time_histogram = Histogram(exponential_bounds(0.1, 2, 16))
+
+    @property
+    def max_batch_size(self):
+        """int: The maximum size of batch."""
+        return self._max_batch_size
+
+    @property
+    def max_wait(self):
+        """float: The maximum time (in milliseconds) to wait for more items."""
+        return self._max_wait
+
+    @property
+    def batch_size_histogram(self):
+        """`Histogram`: The histogram of dispatched batch sizes."""
+        return self._batch_size_histogram
+
+    @property
+    def wait_time_histogram(self):
+        """`Histogram`: The histogram of item wait time (in milliseconds)
+        before dispatching."""
+        return self._wait_time_histogram
+
+    def start(self):
+        """Start the batching thread."""
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop the batching thread."""
+        with self._submit_lock:
+            self._stop_event.set()
+        if not self._thread is None:
+            self._thread.join()
+            self._thread = None
+
+    def run(self, items):
+        """Submit items and wait for their results.
+
+        The items are submitted together, so they are dispatched in as few
+        batches as possible.
+
+        Args:
+          items (list of object): The items to run.
+
+        Returns:
+          list of object: The results of the items in the same order.
+
+        Raises:
+          RuntimeError: if the batcher is not started or is stopped.
+          Exception: The exception raised by the batch function.
+        """
+        requests = [_Request(item) for item in items]
+        with self._submit_lock:
+            if self._thread is None or self._stop_event.is_set():
+                raise RuntimeError('Dynamic batcher is not running.')
+            for request in requests:
+                self._queue.put(request)
+        return [request.result() for request in requests]
+
+    def _collect(self):
+        """Collect a batch of requests.
+
+        Returns:
+          list of `_Request`: The batch, it is empty if no request arrives in
+            time.
+        """
+        try:
+            batch = [self._queue.get(timeout=0.1)]
+        except Empty:
+            return []
+        deadline = batch[0].submit_time + self._max_wait / 1000.0
+        while len(batch) < self._max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except Empty:
+                pass
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except Empty:
+                break
+        return batch
+
+    def _run(self):
+        """Worker function of the batching thread."""
+        while not self._stop_event.is_set():
+            batch = self._collect()
+            if not batch:
+                continue
+
+            dispatch_time = time.monotonic()
+            self._batch_size_histogram.observe(len(batch))
+            for request in batch:
+                self._wait_time_histogram.observe(
+                    (dispatch_time - request.submit_time) * 1000.0)
+
+            try:
+                results = self._batch_fn([request.item for request in batch])
+            except Exception as e: # pylint: disable=broad-except
+                for request in batch:
+                    request.set_error(e)
+                continue
+            for request, result in zip(batch, results):
+                request.set_result(result)
+
+        # Fail the pending requests so that no submitter waits forever.
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except Empty:
+                break
+            request.set_error(RuntimeError('Dynamic batcher is stopped.'))
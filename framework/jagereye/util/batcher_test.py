@@ -0,0 +1,83 @@
+"""Tests for dynamic batcher."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import threading
+
+import pytest
+
+from jagereye.util.batcher import DynamicBatcher
+
+
+class _BatchRecorder(object):
+    """Batch function to double items and record the batches."""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, items):
+        self.batches.append(list(items))
+        return [item * 2 for item in items]
+
+
+def _raise(items):
+    """Batch function to raise an exception."""
+    raise ValueError()
+
+
+class TestDynamicBatcher(object):
+    """Tests for DynamicBatcher class."""
+
+    def test_invalid_max_batch_size(self):
+        with pytest.raises(ValueError):
+            DynamicBatcher(_BatchRecorder(), max_batch_size=0)
+
+    def test_run(self):
+        recorder = _BatchRecorder()
+        batcher = DynamicBatcher(recorder, max_batch_size=4)
+        batcher.start()
+        assert batcher.run([1, 2, 3, 4, 5, 6]) == [2, 4, 6, 8, 10, 12]
+        batcher.stop()
+        assert [len(batch) for batch in recorder.batches] == [4, 2]
+        assert batcher.batch_size_histogram.count == 2
+        assert batcher.batch_size_histogram.sum == 6
+        assert batcher.wait_time_histogram.count == 6
+
+    def test_run_from_threads(self):
+        recorder = _BatchRecorder()
+        batcher = DynamicBatcher(recorder, max_batch_size=8, max_wait=200)
+        batcher.start()
+        results = dict()
+
+        def submit(index):
+            results[index] = batcher.run([index])
+
+        threads = [threading.Thread(target=submit, args=(i,))
+                   for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        batcher.stop()
+
+        assert results == {i: [i * 2] for i in range(4)}
+        # The items from all threads are run in one batch.
+        assert len(recorder.batches) == 1
+
+    def test_run_with_exception(self):
+        batcher = DynamicBatcher(_raise)
+        batcher.start()
+        with pytest.raises(ValueError):
+            batcher.run([1, 2])
+        batcher.stop()
+
+    def test_run_without_running(self):
+        batcher = DynamicBatcher(_BatchRecorder())
+        with pytest.raises(RuntimeError):
+            batcher.run([1])
+        batcher.start()
+        batcher.stop()
+        with pytest.raises(RuntimeError):
+            batcher.run([1])
@@ -35,7 +35,7 @@ class _FuncThread(threading.Thread):
 
     def stop(self):
         """Stop the thread."""
-        if self.isAlive():
+        if self.is_alive():
             signal.pthread_kill(self.ident, 0)
 
 
@@ -72,7 +72,7 @@ def exec_timeout(timeout, func, *args, **kwargs):
     thread.start()
     thread.join(timeout=timeout)
 
-    if thread.isAlive():
+    if thread.is_alive():
         thread.stop()
         raise TimeoutError('Execution time of function "{}" exceeds the timeout'
                            ' limit ({} seconds)'.format(func.__name__, timeout))
@@ -28,7 +28,8 @@ class Logger(object):
         config = get_config()['logging']
         formatters = config['formatters']
         for key, value in formatters.items():
-            formatters[key]['format'] = '{} - {}'.format(component, value['format'])
+            formatters[key]['format'] = '{} - {}'.format(component,
+                                                         value['format'])
         config['formatters'] = formatters
         _logging.config.dictConfig(config)
         self._logger = _logging.getLogger('jagereye_logger')
@@ -90,6 +91,74 @@ class Logger(object):
         """
         self._logger.warning(msg, *args, **kwargs)
 
+# The logger shared by the module-level logging functions. It is the same
+# logger that `Logger` configures.
+_module_logger = _logging.getLogger('jagereye_logger')
+
+
+def log(level, msg, *args, **kwargs):
+    """Log message for a given level.
+
+    Args:
+      level (int): The log level.
+      msg (string): The message to log.
+    """
+    _module_logger.log(level, msg, *args, **kwargs)
+
+
+def debug(msg, *args, **kwargs):
+    """Log debug level message.
+
+    Args:
+      msg (string): The message to log.
+    """
+    _module_logger.debug(msg, *args, **kwargs)
+
+
+def error(msg, *args, **kwargs):
+    """Log error level message.
+
+    Args:
+      msg (string): The message to log.
+    """
+    _module_logger.error(msg, *args, **kwargs)
+
+
+def fatal(msg, *args, **kwargs):
+    """Log fatal level message.
+
+    Args:
+      msg (string): The message to log.
+    """
+    _module_logger.fatal(msg, *args, **kwargs)
+
+
+def info(msg, *args, **kwargs):
+    """Log info level message.
+
+    Args:
+      msg (string): The message to log.
+    """
+    _module_logger.info(msg, *args, **kwargs)
+
+
+def warn(msg, *args, **kwargs):
+    """Log warn level message.
+
+    Args:
+      msg (string): The message to log.
+    """
+    _module_logger.warning(msg, *args, **kwargs)
+
+
+def warning(msg, *args, **kwargs):
+    """Log warn level message.
+
+    Args:
+      msg (string): The message to log.
+    """
+    _module_logger.warning(msg, *args, **kwargs)
+
 # Controls which methods from pyglib.logging are available within the project.
 _allowed_symbols_ = [
     'DEBUG',
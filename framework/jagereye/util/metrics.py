@@ -0,0 +1,273 @@
+"""Utilities for runtime metrics."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import bisect
+from collections import deque
+import threading
+import time
+
+from jagereye.util import logging
+
+
+def exponential_bounds(start, factor, count):
+    """Generate exponentially growing bucket bounds for a histogram.
+
+    Args:
+      start (float): The first bound.
+      factor (float): The growth factor, must be > 1.
+      count (int): The number of bounds.
+
+    Returns:
+      list of float: The bounds.
+    """
+    return [start * (factor ** i) for i in range(count)]
+
+
+def linear_bounds(start, width, count):
+    """Generate linearly growing bucket bounds for a histogram.
+
+    Args:
+      start (float): The first bound.
+      width (float): The width of each bucket.
+      count (int): The number of bounds.
+
+    Returns:
+      list of float: The bounds.
+    """
+    return [start + width * i for i in range(count)]
+
+
+class Histogram(object):
+    """The thread-safe histogram of observed values.
+
+    A histogram counts the observed values in buckets. Each bucket is defined
+    by its upper bound (inclusive), and an extra bucket holds the values that
+    are larger than the last bound. Besides the buckets, the histogram also
+    tracks the count, sum, minimum and maximum of all values.
+    """
+
+    def __init__(self, bounds):
+        """Create a new `Histogram`.
+
+        Args:
+          bounds (list of float): The upper bounds of the buckets in
+            increasing order.
+
+        Raises:
+          ValueError: if the bounds are empty or not increasing.
+        """
+        if not bounds:
+            raise ValueError('At least one bucket bound is required.')
+        if any(a >= b for a, b in zip(bounds[:-1], bounds[1:])):
+            raise ValueError('Bucket bounds must be increasing.')
+        self._bounds = list(bounds)
+        self._lock = threading.Lock()
+        self.reset()
+
+    @property
+    def bounds(self):
+        """list of float: The upper bounds of the buckets."""
+        return self._bounds
+
+    @property
+    def count(self):
+        """int: The number of observed values."""
+        return self._count
+
+    @property
+    def sum(self):
+        """float: The sum of observed values."""
+        return self._sum
+
+    @property
+    def mean(self):
+        """float: The mean of observed values, or 0 if nothing is observed."""
+        return self._sum / self._count if self._count else 0.0
+
+    def observe(self, value):
+        """Observe a value.
+
+        Args:
+          value (float): The value to observe.
+        """
+        index = bisect.bisect_left(self._bounds, value)
+        with self._lock:
+            self._buckets[index] += 1
+            self._count += 1
+            self._sum += value
+            if self._min is None or value < self._min:
+                self._min = value
+            if self._max is None or value > self._max:
+                self._max = value
+
+    def percentile(self, q):
+        """Estimate a percentile of observed values.
+
+        The estimation is the upper bound of the bucket that contains the
+        percentile, clamped by the maximum observed value.
+
+        Args:
+          q (float): The percentile, range from 0 to 100.
+
+        Returns:
+          float: The estimated percentile, or 0 if nothing is observed.
+        """
+        with self._lock:
+            if self._count == 0:
+                return 0.0
+            rank = q / 100.0 * self._count
+            accumulated = 0
+            for index, bucket in enumerate(self._buckets):
+                accumulated += bucket
+                if accumulated >= rank and bucket > 0:
+                    if index < len(self._bounds):
+                        return min(self._bounds[index], self._max)
+                    break
+            return self._max
+
+    def reset(self):
+        """Reset all observed values."""
+        with self._lock:
+            self._buckets = [0] * (len(self._bounds) + 1)
+            self._count = 0
+            self._sum = 0.0
+            self._min = None
+            self._max = None
+
+    def snapshot(self):
+        """Take a snapshot of the histogram.
+
+        Returns:
+          dict: The snapshot, which contains:
+            count (int): The number of observed values.
+            sum (float): The sum of observed values.
+            mean (float): The mean of observed values.
+            min (float): The minimum observed value, or None.
+            max (float): The maximum observed value, or None.
+            p50 (float): The estimated 50th percentile.
+            p99 (float): The estimated 99th percentile.
+            buckets (list): The [upper bound, count] pair of each bucket. The
+              upper bound of the last bucket is None, which means infinity.
+        """
+        p50 = self.percentile(50)
+        p99 = self.percentile(99)
+        with self._lock:
+            bounds = self._bounds + [None]
+            return {
+                'count': self._count,
+                'sum': self._sum,
+                'mean': self._sum / self._count if self._count else 0.0,
+                'min': self._min,
+                'max': self._max,
+                'p50': p50,
+                'p99': p99,
+                'buckets': [[bound, bucket]
+                            for bound, bucket in zip(bounds, self._buckets)]
+            }
+
+
+class RateMeter(object):
+    """The thread-safe meter of event rate.
+
+    The meter counts events and measures their rate (events per second) over
+    a sliding time window.
+    """
+
+    def __init__(self, window=5.0):
+        """Create a new `RateMeter`.
+
+        Args:
+          window (float): The length (in seconds) of the sliding window.
+            Defaults to 5.0.
+        """
+        self._window = window
+        self._lock = threading.Lock()
+        self._events = deque()
+        self._count = 0
+        self._start_time = time.monotonic()
+
+    @property
+    def count(self):
+        """int: The total number of events."""
+        return self._count
+
+    def mark(self, n=1):
+        """Mark that events happen now.
+
+        Args:
+          n (int): The number of events. Defaults to 1.
+        """
+        if n <= 0:
+            return
+        current = time.monotonic()
+        with self._lock:
+            self._count += n
+            self._events.append((current, n))
+            self._expire(current)
+
+    def rate(self):
+        """Measure the rate of events.
+
+        Returns:
+          float: The number of events per second in the window. If the meter
+            is younger than the window, the rate is over its age.
+        """
+        current = time.monotonic()
+        with self._lock:
+            self._expire(current)
+            total = sum(n for _, n in self._events)
+        elapsed = min(self._window, current - self._start_time)
+        return total / elapsed if elapsed > 0 else 0.0
+
+    def _expire(self, current):
+        """Remove the events out of the window, with the lock held."""
+        while self._events and self._events[0][0] < current - self._window:
+            self._events.popleft()
+
+
+class PeriodicReporter(object):
+    """The reporter that reports snapshots of metrics periodically.
+
+    The reporter takes a snapshot by a function and passes it to a report
+    function on a background thread at a fixed interval, such as to log or
+    publish the metrics of a worker.
+    """
+
+    def __init__(self, interval, snapshot_fn, report_fn):
+        """Create a new `PeriodicReporter`.
+
+        Args:
+          interval (float): The reporting interval (in seconds).
+          snapshot_fn (function): The function to take a snapshot.
+          report_fn (function): The function to report a snapshot.
+        """
+        self._interval = interval
+        self._snapshot_fn = snapshot_fn
+        self._report_fn = report_fn
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the reporting thread."""
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop the reporting thread."""
+        self._stop_event.set()
+        if not self._thread is None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        """The worker function of the reporting thread."""
+        while not self._stop_event.wait(self._interval):
+            try:
+                self._report_fn(self._snapshot_fn())
+            except Exception as e: # pylint: disable=broad-except
+                logging.error('Fail to report metrics: {}'.format(e))
@@ -0,0 +1,103 @@
+"""Tests for metrics utilities."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import threading
+import time
+
+import pytest
+
+from jagereye.util.metrics import Histogram
+from jagereye.util.metrics import PeriodicReporter
+from jagereye.util.metrics import RateMeter
+from jagereye.util.metrics import exponential_bounds
+from jagereye.util.metrics import linear_bounds
+
+
+def test_exponential_bounds():
+    assert exponential_bounds(1, 2, 4) == [1, 2, 4, 8]
+
+
+def test_linear_bounds():
+    assert linear_bounds(1, 2, 4) == [1, 3, 5, 7]
+
+
+class TestHistogram(object):
+    """Tests for Histogram class."""
+
+    def test_invalid_bounds(self):
+        with pytest.raises(ValueError):
+            Histogram([])
+        with pytest.raises(ValueError):
+            Histogram([1, 1, 2])
+
+    def test_observe(self):
+        histogram = Histogram([1, 2, 4])
+        for value in [0.5, 1, 1.5, 3, 10]:
+            histogram.observe(value)
+        snapshot = histogram.snapshot()
+        assert snapshot['count'] == 5
+        assert snapshot['sum'] == 16
+        assert snapshot['min'] == 0.5
+        assert snapshot['max'] == 10
+        assert snapshot['buckets'] == [[1, 2], [2, 1], [4, 1], [None, 1]]
+
+    def test_percentile(self):
+        histogram = Histogram(linear_bounds(1, 1, 100))
+        assert histogram.percentile(50) == 0.0
+        for value in range(1, 101):
+            histogram.observe(value)
+        assert histogram.percentile(50) == 50
+        assert histogram.percentile(99) == 99
+        assert histogram.percentile(100) == 100
+
+    def test_percentile_overflow(self):
+        histogram = Histogram([1])
+        histogram.observe(5)
+        assert histogram.percentile(50) == 5
+
+    def test_reset(self):
+        histogram = Histogram([1])
+        histogram.observe(5)
+        histogram.reset()
+        assert histogram.count == 0
+        assert histogram.mean == 0.0
+
+
+class TestRateMeter(object):
+    """Tests for RateMeter class."""
+
+    def test_rate(self):
+        meter = RateMeter(window=0.2)
+        assert meter.rate() == 0
+        meter.mark(10)
+        meter.mark(0)
+        assert meter.count == 10
+        time.sleep(0.05)
+        # The meter is younger than the window.
+        assert 10 / 0.2 < meter.rate() <= 10 / 0.05
+        time.sleep(0.2)
+        # The events are out of the window.
+        assert meter.rate() == 0
+        assert meter.count == 10
+
+
+class TestPeriodicReporter(object):
+    """Tests for PeriodicReporter class."""
+
+    def test_report(self):
+        reports = []
+        reported = threading.Event()
+
+        def report_fn(snapshot):
+            reports.append(snapshot)
+            if len(reports) >= 3:
+                reported.set()
+
+        reporter = PeriodicReporter(0.01, lambda: {'value': 1}, report_fn)
+        reporter.start()
+        assert reported.wait(2)
+        reporter.stop()
+        assert reports[0] == {'value': 1}
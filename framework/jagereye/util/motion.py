@@ -0,0 +1,324 @@
+"""Utilities for motion detection."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import cv2
+import numpy as np
+
+
+def _alloc_levels(height, width, factor):
+    """Allocate the buffers to downscale an image by a factor.
+
+    Area resizing is much faster when halving, so a power of 2 factor is
+    split into levels that halve the image one by one.
+
+    Args:
+      height (int): The image height.
+      width (int): The image width.
+      factor (int): The factor to downscale.
+
+    Returns:
+      list of `numpy.ndarray`: The buffers of levels in order, which is empty
+        if the factor is 1.
+    """
+    if factor <= 1:
+        return []
+    if factor & (factor - 1) == 0:
+        levels = []
+        while factor > 1:
+            height, width = max(1, height // 2), max(1, width // 2)
+            levels.append(np.empty((height, width), dtype=np.uint8))
+            factor //= 2
+        return levels
+    return [np.empty((max(1, height // factor), max(1, width // factor)),
+                     dtype=np.uint8)]
+
+
+def _area_downscale(image, levels):
+    """Downscale an image by area resizing into the buffers of levels.
+
+    Args:
+      image (`numpy.ndarray`): The image to downscale.
+      levels (list of `numpy.ndarray`): The buffers of levels.
+
+    Returns:
+      `numpy.ndarray`: The downscaled image, which is the last level, or the
+        image itself if there is no level.
+    """
+    for level in levels:
+        cv2.resize(image,
+                   (level.shape[1], level.shape[0]),
+                   dst=level,
+                   interpolation=cv2.INTER_AREA)
+        image = level
+    return image
+
+
+class MotionEngine(object):
+    """The motion engine.
+
+    The engine compares the grayscale image of every frame with the one of the
+    last frame, and measures the percentage of the moving area. The engine
+    keeps the state of one stream, so every stream needs its own engine.
+
+    The engine has two methods to measure the moving area:
+    1. Pixel method (block_size <= 0): Blur the absolute difference with a 5x5
+       box filter, remove the noise by morphological opening and closing, and
+       count the pixels whose difference exceeds the pixel threshold.
+    2. Block method (block_size > 0): Average the absolute difference over
+       blocks of block_size x block_size pixels, and count the area of blocks
+       whose mean difference exceeds the pixel threshold. Averaging removes
+       the noise like the blur and the morphology of the pixel method, but
+       it costs area resizing instead of five full size filters, and the
+       count runs on the small block image.
+
+    The image can also be downscaled by an integer factor before differencing.
+    All intermediate images are written into buffers that are allocated once
+    and reused until the image shape changes. The engine also finds the
+    bounding box of the moving area.
+    """
+
+    def __init__(self, pixel_threshold=10, scale=1, block_size=0):
+        """Create a new `MotionEngine`.
+
+        Args:
+          pixel_threshold (int): The threshold of the difference of a pixel,
+            or the mean difference of a block, to be moving. Defaults to 10.
+          scale (int): The factor to downscale the image before
+            differencing. Defaults to 1.
+          block_size (int): The size of blocks of the block method. If
+            block_size <= 0, the pixel method is used. Defaults to 0.
+        """
+        self._pixel_threshold = pixel_threshold
+        self._scale = max(1, int(scale))
+        self._block_size = max(0, int(block_size))
+        self._shape = None
+        self._has_last = False
+        self._foreground_box = None
+        self._mask = None
+
+    @property
+    def scale(self):
+        """int: The factor to downscale the image before differencing."""
+        return self._scale
+
+    @property
+    def block_size(self):
+        """int: The size of blocks, or 0 for the pixel method."""
+        return self._block_size
+
+    @property
+    def foreground_box(self):
+        """tuple: The bounding box of the moving area in the last updated
+        image, or None if nothing moves. The tuple contains xmin, ymin, xmax
+        and ymax in pixels of the image."""
+        return self._foreground_box
+
+    @property
+    def mask(self):
+        """`numpy.ndarray`: The binary mask of the moving area in the last
+        updated image, whose moving pixels are 255. It is downscaled by the
+        scale and the block size, and reused by the next update, so copy it
+        to keep it. Only valid if the last update returns a percentage."""
+        return self._mask
+
+    def reset(self):
+        """Forget the last frame."""
+        self._has_last = False
+        self._foreground_box = None
+
+    def _allocate(self, shape):
+        """Allocate the buffers for an image shape."""
+        height, width = shape[0], shape[1]
+        self._gray = np.empty((height, width), dtype=np.uint8)
+        self._scale_levels = _alloc_levels(height, width, self._scale)
+        small_height, small_width = self._scale_levels[-1].shape \
+            if self._scale_levels else (height, width)
+        self._current = np.empty((small_height, small_width), dtype=np.uint8)
+        self._last = np.empty_like(self._current)
+        self._diff = np.empty_like(self._current)
+        if self._block_size > 0:
+            self._block_levels = _alloc_levels(small_height,
+                                               small_width,
+                                               self._block_size)
+            self._work = None
+            self._mask = np.empty_like(self._block_levels[-1])
+        else:
+            self._block_levels = []
+            self._work = np.empty_like(self._current)
+            self._mask = np.empty_like(self._current)
+        self._shape = shape
+        self._has_last = False
+
+    def update(self, image):
+        """Update the engine with the image of a new frame.
+
+        Args:
+          image (`numpy.ndarray`): The BGR image, whose type is uint8 and
+            shape is (height, width, 3).
+
+        Returns:
+          float: The percentage (range from 0 to 100) of the moving area from
+            the last frame, or None if it is the first frame.
+        """
+        self._convert(image)
+
+        percentage = None
+        if self._has_last:
+            cv2.absdiff(self._last, self._current, dst=self._diff)
+            percentage = self._measure()
+
+        # Swap the buffers instead of copying the current image.
+        self._last, self._current = self._current, self._last
+        self._has_last = True
+
+        return percentage
+
+    def _convert(self, image):
+        """Convert an image into the downscaled grayscale current image."""
+        if image.shape != self._shape:
+            self._allocate(image.shape)
+        cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        np.copyto(self._current, _area_downscale(self._gray,
+                                                 self._scale_levels))
+
+    def _measure(self):
+        """Measure the moving area of the difference image.
+
+        Returns:
+          float: The percentage (range from 0 to 100) of the moving area.
+        """
+        if self._block_size > 0:
+            work = _area_downscale(self._diff, self._block_levels)
+        else:
+            work = self._work
+            cv2.blur(self._diff, (5, 5), dst=work)
+            cv2.morphologyEx(work, cv2.MORPH_OPEN, None, dst=self._mask)
+            cv2.morphologyEx(self._mask, cv2.MORPH_CLOSE, None, dst=work)
+        cv2.threshold(work,
+                      self._pixel_threshold,
+                      255,
+                      cv2.THRESH_BINARY,
+                      dst=self._mask)
+        num_moving = cv2.countNonZero(self._mask)
+
+        self._foreground_box = None
+        if num_moving > 0:
+            x, y, w, h = cv2.boundingRect(self._mask)
+            x_ratio = self._shape[1] / self._mask.shape[1]
+            y_ratio = self._shape[0] / self._mask.shape[0]
+            self._foreground_box = (
+                int(x * x_ratio),
+                int(y * y_ratio),
+                min(self._shape[1], int(np.ceil((x + w) * x_ratio))),
+                min(self._shape[0], int(np.ceil((y + h) * y_ratio))))
+
+        return num_moving * 100.0 / self._mask.size
+
+
+class BackgroundMotionEngine(MotionEngine):
+    """The background subtraction motion engine.
+
+    Instead of the last frame, the engine compares every frame with a
+    background model, which is the running average of the grayscale images.
+    Lighting flicker and compression artifacts come and go between frames,
+    so they are averaged out of the background and cause much less false
+    motion than frame differencing. A still object is also detected as long
+    as it differs from the background, and it is absorbed into the
+    background gradually.
+
+    The learning rate is adaptive: the background is the plain average of the
+    first frames, so it converges quickly, and then it learns at the given
+    rate. The background can be updated once every several frames to save
+    the update cost, so the effective learning rate per frame is reduced by
+    the same factor. The background is kept in a preallocated float buffer.
+
+    The moving area is measured and filtered from the difference like
+    `MotionEngine`, with the same scale and block size options.
+    """
+
+    def __init__(self,
+                 pixel_threshold=25,
+                 scale=1,
+                 block_size=0,
+                 learning_rate=0.05,
+                 update_interval=1):
+        """Create a new `BackgroundMotionEngine`.
+
+        Args:
+          pixel_threshold (int): The threshold of the difference of a pixel,
+            or the mean difference of a block, from the background to be
+            moving. Defaults to 25.
+          scale (int): The factor to downscale the image before
+            differencing. Defaults to 1.
+          block_size (int): The size of blocks of the block method. If
+            block_size <= 0, the pixel method is used. Defaults to 0.
+          learning_rate (float): The weight of a new image to update the
+            background, range from 0 to 1. Defaults to 0.05.
+          update_interval (int): The interval (in frames) to update the
+            background. Defaults to 1.
+        """
+        MotionEngine.__init__(self,
+                              pixel_threshold=pixel_threshold,
+                              scale=scale,
+                              block_size=block_size)
+        self._learning_rate = learning_rate
+        self._update_interval = max(1, int(update_interval))
+        self._frame_count = 0
+        self._update_count = 0
+
+    @property
+    def learning_rate(self):
+        """float: The weight of a new image to update the background."""
+        return self._learning_rate
+
+    @property
+    def update_interval(self):
+        """int: The interval (in frames) to update the background."""
+        return self._update_interval
+
+    @property
+    def background(self):
+        """`numpy.ndarray`: The float background image, which is downscaled
+        by the scale, or None before the first frame."""
+        return self._background if self._has_last else None
+
+    def _allocate(self, shape):
+        MotionEngine._allocate(self, shape)
+        self._background = np.empty(self._current.shape, dtype=np.float32)
+        self._background_image = np.empty_like(self._current)
+
+    def update(self, image):
+        """Update the engine with the image of a new frame.
+
+        Args:
+          image (`numpy.ndarray`): The BGR image, whose type is uint8 and
+            shape is (height, width, 3).
+
+        Returns:
+          float: The percentage (range from 0 to 100) of the moving area from
+            the background, or None if it is the first frame.
+        """
+        self._convert(image)
+
+        if not self._has_last:
+            np.copyto(self._background, self._current)
+            self._has_last = True
+            self._frame_count = 1
+            self._update_count = 1
+            return None
+
+        cv2.convertScaleAbs(self._background, dst=self._background_image)
+        cv2.absdiff(self._background_image, self._current, dst=self._diff)
+        percentage = self._measure()
+
+        if self._frame_count % self._update_interval == 0:
+            self._update_count += 1
+            # Average the first frames, then learn at the learning rate.
+            rate = max(self._learning_rate, 1.0 / self._update_count)
+            cv2.accumulateWeighted(self._current, self._background, rate)
+        self._frame_count += 1
+
+        return percentage
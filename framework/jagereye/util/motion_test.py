@@ -0,0 +1,231 @@
+"""Tests for motion detection utilities."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from jagereye.util.motion import BackgroundMotionEngine
+from jagereye.util.motion import MotionEngine
+
+
+def _gen_clip(density, width=320, height=240, length=12, seed=0):
+    """Generate a noisy clip in which squares covering a density of the frame
+    move on a textured background."""
+    rng = np.random.RandomState(seed)
+    background = cv2.GaussianBlur(
+        rng.randint(0, 256, (height, width, 3)).astype(np.uint8), (5, 5), 0)
+    side = int(np.sqrt(density * width * height / 2))
+    positions = [(rng.randint(0, height - side), rng.randint(0, width - side))
+                 for _ in range(2)]
+    clip = []
+    for i in range(length):
+        frame = background.astype(np.int16)
+        for y, x in positions:
+            x = (x + 4 * i) % (width - side)
+            frame[y:y + side, x:x + side] = 255
+        frame += rng.randint(-6, 7, frame.shape)
+        clip.append(np.clip(frame, 0, 255).astype(np.uint8))
+    return clip
+
+
+def _reference_percentages(clip):
+    """Measure the percentages of the moving area of a clip by the original
+    per-pixel algorithm of the motion detection module."""
+    percentages = [None]
+    last_gray_image = cv2.cvtColor(clip[0], cv2.COLOR_BGR2GRAY)
+    for image in clip[1:]:
+        cur_gray_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        res = cv2.absdiff(last_gray_image, cur_gray_image)
+        res = cv2.blur(res, (5, 5))
+        res = cv2.morphologyEx(res, cv2.MORPH_OPEN, None)
+        res = cv2.morphologyEx(res, cv2.MORPH_CLOSE, None)
+        _, res = cv2.threshold(res, 10, 255, cv2.THRESH_BINARY_INV)
+        num_black = np.count_nonzero(res == 0)
+        percentages.append(num_black * 100.0 / res.size)
+        last_gray_image = cur_gray_image
+    return percentages
+
+
+def _flicker(image, rng):
+    """Add lighting flicker, noise and JPEG artifacts to an image."""
+    image = image.astype(np.int16) + rng.randint(-8, 9) + \
+            rng.randint(-4, 5, image.shape)
+    image = np.clip(image, 0, 255).astype(np.uint8)
+    _, buf = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 60])
+    return cv2.imdecode(buf, cv2.IMREAD_COLOR)
+
+
+class TestMotionEngine(object):
+    """Tests for MotionEngine class."""
+
+    def test_first_frame(self):
+        clip = _gen_clip(0.05)
+        engine = MotionEngine()
+        assert engine.update(clip[0]) is None
+        assert engine.update(clip[1]) > 0
+        engine.reset()
+        assert engine.update(clip[2]) is None
+
+    def test_static_clip(self):
+        image = _gen_clip(0.05)[0]
+        for block_size in [0, 4]:
+            engine = MotionEngine(scale=2, block_size=block_size)
+            engine.update(image)
+            assert engine.update(image.copy()) == 0.0
+
+    def test_shape_change(self):
+        engine = MotionEngine(block_size=4)
+        engine.update(_gen_clip(0.05)[0])
+        assert engine.update(_gen_clip(0.05, width=160, height=120)[0]) is None
+
+    def test_foreground_box(self):
+        background = np.zeros((120, 160, 3), dtype=np.uint8)
+        image = background.copy()
+        image[40:60, 80:100] = 255
+        for scale, block_size in [(1, 0), (2, 4)]:
+            engine = MotionEngine(scale=scale, block_size=block_size)
+            engine.update(background)
+            assert engine.foreground_box is None
+            engine.update(image)
+            xmin, ymin, xmax, ymax = engine.foreground_box
+            assert 72 <= xmin <= 80 and 100 <= xmax <= 108
+            assert 32 <= ymin <= 40 and 60 <= ymax <= 68
+            engine.update(image)
+            assert engine.foreground_box is None
+
+    def test_mask(self):
+        clip = _gen_clip(0.05)
+        for scale, block_size in [(1, 0), (2, 4)]:
+            engine = MotionEngine(scale=scale, block_size=block_size)
+            engine.update(clip[0])
+            percentage = engine.update(clip[1])
+            mask = engine.mask
+            assert mask.dtype == np.uint8
+            assert set(np.unique(mask)) <= {0, 255}
+            assert np.count_nonzero(mask) * 100.0 / mask.size == percentage
+
+    def test_pixel_method_matches_reference(self):
+        for density in [0.0, 0.01, 0.05, 0.2]:
+            clip = _gen_clip(density)
+            engine = MotionEngine()
+            percentages = [engine.update(image) for image in clip]
+            assert percentages == _reference_percentages(clip)
+
+    def test_fast_methods_agree_with_reference(self):
+        threshold = 1.0
+        # The effective block is 4x4 pixels of the original image.
+        for scale, block_size in [(1, 4), (2, 2)]:
+            agreed = 0
+            total = 0
+            for density in [0.0, 0.005, 0.02, 0.05, 0.2]:
+                clip = _gen_clip(density, seed=int(density * 1000))
+                engine = MotionEngine(scale=scale, block_size=block_size)
+                percentages = [engine.update(image) for image in clip]
+                references = _reference_percentages(clip)
+                for percentage, reference in zip(percentages[1:],
+                                                 references[1:]):
+                    assert abs(percentage - reference) <= \
+                        max(0.5, 0.3 * reference)
+                    agreed += (percentage >= threshold) == \
+                              (reference >= threshold)
+                    total += 1
+            assert agreed >= 0.9 * total
+
+    def test_coarse_methods_detect_motion(self):
+        for scale, block_size in [(2, 4), (1, 8), (3, 3)]:
+            for density, moved in [(0.0, False), (0.2, True)]:
+                clip = _gen_clip(density)
+                engine = MotionEngine(scale=scale, block_size=block_size)
+                percentages = [engine.update(image) for image in clip]
+                assert all((percentage >= 1.0) == moved
+                           for percentage in percentages[1:])
+
+    def test_no_allocation_per_frame(self):
+        clip = _gen_clip(0.05)
+        engine = MotionEngine(scale=2, block_size=4)
+        engine.update(clip[0])
+        engine.update(clip[1])
+        tracemalloc.start()
+        try:
+            for image in clip[2:]:
+                engine.update(image)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        # Far less than a grayscale image of the clip.
+        assert peak < clip[0].shape[0] * clip[0].shape[1] // 4
+
+
+class TestBackgroundMotionEngine(object):
+    """Tests for BackgroundMotionEngine class."""
+
+    def test_flicker(self):
+        rng = np.random.RandomState(0)
+        background = _gen_clip(0.0, length=1)[0]
+        clip = [_flicker(background, rng) for _ in range(30)]
+        engine = MotionEngine()
+        assert max(engine.update(image) or 0.0 for image in clip) >= 1.0
+        for block_size, update_interval in [(0, 1), (4, 3)]:
+            engine = BackgroundMotionEngine(block_size=block_size,
+                                            update_interval=update_interval)
+            assert engine.update(clip[0]) is None
+            assert all(engine.update(image) == 0.0 for image in clip[1:])
+
+    def test_moving_object(self):
+        rng = np.random.RandomState(0)
+        background = _gen_clip(0.0, length=1)[0]
+        engine = BackgroundMotionEngine()
+        for _ in range(10):
+            engine.update(_flicker(background, rng))
+        image = background.copy()
+        image[100:140, 50:90] = 255
+        assert engine.update(_flicker(image, rng)) >= 1.0
+        xmin, ymin, xmax, ymax = engine.foreground_box
+        assert 40 <= xmin <= 50 and 90 <= xmax <= 100
+        assert 90 <= ymin <= 100 and 140 <= ymax <= 150
+
+    def test_adaptive_learning_rate(self):
+        dark = np.full((8, 8, 3), 0, dtype=np.uint8)
+        bright = np.full((8, 8, 3), 100, dtype=np.uint8)
+        engine = BackgroundMotionEngine(learning_rate=0.3)
+        assert engine.background is None
+        engine.update(dark)
+        engine.update(bright)
+        engine.update(bright)
+        # The background is the average of the first 3 frames.
+        np.testing.assert_allclose(engine.background, 200.0 / 3, rtol=1e-5)
+        engine.update(bright)
+        # The rate 1/4 is smaller than the learning rate.
+        np.testing.assert_allclose(engine.background,
+                                   200.0 / 3 + (100.0 - 200.0 / 3) * 0.3,
+                                   rtol=1e-5)
+
+    def test_update_interval(self):
+        dark = np.full((8, 8, 3), 0, dtype=np.uint8)
+        bright = np.full((8, 8, 3), 100, dtype=np.uint8)
+        engine = BackgroundMotionEngine(update_interval=3)
+        engine.update(dark)
+        engine.update(bright)
+        engine.update(bright)
+        np.testing.assert_allclose(engine.background, 0.0)
+        engine.update(bright)
+        np.testing.assert_allclose(engine.background, 50.0)
+
+    def test_no_allocation_per_frame(self):
+        clip = _gen_clip(0.05)
+        engine = BackgroundMotionEngine(block_size=4)
+        engine.update(clip[0])
+        engine.update(clip[1])
+        tracemalloc.start()
+        try:
+            for image in clip[2:]:
+                engine.update(image)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        assert peak < clip[0].shape[0] * clip[0].shape[1] // 4